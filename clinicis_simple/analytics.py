@@ -0,0 +1,365 @@
+"""Management reports over appointments, computed on columnar views.
+
+``Analytics(store)`` keeps one row per appointment in parallel typed
+columns (doctor, patient, status and time, with ids encoded as small
+ints) and answers grouped aggregates over them: doctor utilization,
+cancellation / no-show rates per specialty and completed visits per patient
+cohort. The Clinic reports every mutation to it (``Clinic.subscribe``), so
+a report only re-encodes the appointments that changed since the last one;
+a load or reset, which swaps in new containers, rebuilds the columns.
+
+NumPy is optional. With it the aggregates are vectorized (bincount and
+friends); without it the columns are array.array and the same aggregates
+run as plain loops over them.
+
+Print a report from the command line: ``python analytics.py --days 7``
+"""
+import argparse
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set
+
+from models import STATUS_CODES, Appointment
+from schedule import MINUTES_PER_DAY, parse_datetime, parse_time_of_day, to_minutes
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DELETED = -1  # status code of a free row
+SCHEDULED, CANCELLED, COMPLETED = (STATUS_CODES[name] for name in ("scheduled", "cancelled", "completed"))
+_NUMPY_TYPES = {"b": "int8", "i": "int32", "q": "int64"}
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class DoctorUtilization(NamedTuple):
+    doctor_id: str
+    specialty: str
+    booked: int  # appointments in the window that were not cancelled
+    booked_minutes: int
+    capacity_minutes: int
+    utilization: float
+
+
+class SpecialtyRates(NamedTuple):
+    specialty: str
+    appointments: int
+    cancelled: int
+    no_shows: int  # still "scheduled" although their time has passed
+    cancellation_rate: float
+    no_show_rate: float
+
+
+class CohortVisits(NamedTuple):
+    cohort: str  # "YYYY-MM" of the patients' first appointment
+    patients: int
+    completed: int
+    per_patient: float
+
+
+class _Codes:
+    """Small-int codes for ids, in order of first appearance."""
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _Column:
+    """A growable typed column: a NumPy array with spare capacity, or an array.array."""
+
+    def __init__(self, typecode: str, values: Sequence[int] = ()) -> None:
+        self.typecode = typecode
+        if np is not None:
+            self.data = np.array(values, dtype=_NUMPY_TYPES[typecode])
+        else:
+            self.data = array(typecode, values)
+
+    def __setitem__(self, row: int, value: int) -> None:
+        if row < len(self.data):
+            self.data[row] = value
+        elif np is None:
+            self.data.append(value)
+        else:
+            grown = np.zeros(max(2 * len(self.data), 1024), dtype=self.data.dtype)
+            grown[: len(self.data)] = self.data
+            self.data = grown
+            self.data[row] = value
+
+
+class AppointmentColumns:
+    """One row per appointment; deleted rows are marked DELETED and reused."""
+
+    def __init__(self, appointments: Sequence[Appointment] = ()) -> None:
+        self.doctors = _Codes()
+        self.patients = _Codes()
+        self._free: List[int] = []
+        rows = [self._encode(appt) for appt in appointments]
+        self.row_of: Dict[str, int] = {appt.appt_id: row for row, appt in enumerate(appointments)}
+        self.size = len(rows)
+        self.doctor = _Column("i", [row[0] for row in rows])
+        self.patient = _Column("i", [row[1] for row in rows])
+        self.status = _Column("b", [row[2] for row in rows])
+        self.when = _Column("q", [row[3] for row in rows])
+
+    def _encode(self, appt: Appointment) -> tuple:
+        key = appt.slot_key
+        # times that are not a date/time are kept as -1 and left out of time windows
+        when = key if isinstance(key, int) else -1
+        return self.doctors.code(appt.doctor_id), self.patients.code(appt.patient_id), STATUS_CODES[appt.status], when
+
+    def put(self, appt: Appointment) -> None:
+        row = self.row_of.get(appt.appt_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row, self.size = self.size, self.size + 1
+            self.row_of[appt.appt_id] = row
+        values = self._encode(appt)
+        for column, value in zip((self.doctor, self.patient, self.status, self.when), values):
+            column[row] = value
+
+    def delete(self, appt_id: str) -> None:
+        row = self.row_of.pop(appt_id, None)
+        if row is not None:
+            self.status[row] = DELETED
+            self._free.append(row)
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+
+class Analytics:
+    def __init__(self, store) -> None:
+        self.store = store
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._source = None  # the AppointmentStore the columns were built from
+        self.columns = AppointmentColumns()
+        store.subscribe(self._on_changes)
+
+    def close(self) -> None:
+        self.store.unsubscribe(self._on_changes)
+
+    def _on_changes(self, changes: Sequence[List[Any]]) -> None:
+        for change in changes:
+            if change[0] == "appt":
+                appt_id = change[1]["appt_id"]
+            elif change[0] == "appt_del":
+                appt_id = change[1]
+            else:
+                continue
+            with self._lock:
+                self._pending.add(appt_id)
+
+    def refresh(self) -> int:
+        """Bring the columns up to date; return how many rows were re-encoded."""
+        with self.store.lock:
+            appointments = self.store.appointments
+            with self._lock:
+                pending, self._pending = self._pending, set()
+            if appointments is not self._source:
+                self.columns = AppointmentColumns(list(appointments))
+                self._source = appointments
+                return len(self.columns)
+            for appt_id in pending:
+                appt = appointments.get(appt_id)
+                if appt is None:
+                    self.columns.delete(appt_id)
+                else:
+                    self.columns.put(appt)
+            return len(pending)
+
+    def doctor_utilization(
+        self, start: str, end: str, day_start: str = "08:00", day_end: str = "17:00"
+    ) -> List[DoctorUtilization]:
+        """Booked share of each doctor's working minutes in [start, end), busiest first."""
+        self.refresh()
+        low, high = _minutes(start), _minutes(end)
+        days = -(-(high - low) // MINUTES_PER_DAY)
+        capacity = days * (parse_time_of_day(day_end) - parse_time_of_day(day_start))
+        columns = self.columns
+        booked = self._count(columns.doctor, len(columns.doctors), low, high, exclude=CANCELLED)
+        report = []
+        for doctor in self.store.doctors.values():
+            code = columns.doctors.get(doctor.pid)
+            count = booked[code] if code is not None else 0
+            minutes = count * doctor.slot_minutes
+            report.append(
+                DoctorUtilization(doctor.pid, doctor.specialty, count, minutes, capacity, minutes / capacity if capacity else 0.0)
+            )
+        report.sort(key=lambda row: (-row.utilization, row.doctor_id))
+        return report
+
+    def cancellation_rates(
+        self, start: Optional[str] = None, end: Optional[str] = None, now: Optional[str] = None
+    ) -> List[SpecialtyRates]:
+        """Cancelled and no-show shares per doctor specialty, by specialty name."""
+        self.refresh()
+        low, high = _minutes_or_none(start), _minutes_or_none(end)
+        moment = _minutes(now) if now else to_minutes(datetime.now())
+        columns = self.columns
+        n = len(columns.doctors)
+        total = self._count(columns.doctor, n, low, high)
+        cancelled = self._count(columns.doctor, n, low, high, status=CANCELLED)
+        no_shows = self._count(columns.doctor, n, low, min(high, moment) if high is not None else moment, status=SCHEDULED)
+        sums: Dict[str, List[int]] = {}
+        for code, doctor_id in enumerate(columns.doctors.values):
+            doctor = self.store.doctors.get(doctor_id)
+            row = sums.setdefault(doctor.specialty if doctor else "(unknown doctor)", [0, 0, 0])
+            row[0] += total[code]
+            row[1] += cancelled[code]
+            row[2] += no_shows[code]
+        return [
+            SpecialtyRates(name, count, gone, missed, gone / count if count else 0.0, missed / count if count else 0.0)
+            for name, (count, gone, missed) in sorted(sums.items())
+        ]
+
+    def visits_by_cohort(self) -> List[CohortVisits]:
+        """Completed visits per patient, grouped by the month of each patient's first appointment."""
+        self.refresh()
+        columns = self.columns
+        size = columns.size
+        patient, status, when = (column.data[:size] for column in (columns.patient, columns.status, columns.when))
+        n = len(columns.patients)
+        if np is not None:
+            dated = (status != DELETED) & (when >= 0)
+            first = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(first, patient[dated], when[dated])
+            seen = first != np.iinfo(np.int64).max
+            cohort = np.full(n, -1, dtype=np.int64)
+            days = first[seen] // MINUTES_PER_DAY - _EPOCH_ORDINAL
+            cohort[seen] = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+            visits = np.bincount(patient[status == COMPLETED], minlength=n)
+            keep = cohort >= 0
+            months, index = np.unique(cohort[keep], return_inverse=True)
+            patients = np.bincount(index).tolist()
+            completed = np.bincount(index, weights=visits[keep]).astype(np.int64).tolist()
+            labels = [_month_label(int(month)) for month in months]
+        else:
+            first_of: Dict[int, int] = {}
+            visits = [0] * n
+            for code, state, minutes in zip(patient, status, when):
+                if state == DELETED:
+                    continue
+                if minutes >= 0 and minutes < first_of.get(code, minutes + 1):
+                    first_of[code] = minutes
+                if state == COMPLETED:
+                    visits[code] += 1
+            groups: Dict[int, List[int]] = {}
+            for code, minutes in first_of.items():
+                moment = date.fromordinal(minutes // MINUTES_PER_DAY)
+                group = groups.setdefault((moment.year - 1970) * 12 + moment.month - 1, [0, 0])
+                group[0] += 1
+                group[1] += visits[code]
+            labels = [_month_label(month) for month in sorted(groups)]
+            patients = [groups[month][0] for month in sorted(groups)]
+            completed = [groups[month][1] for month in sorted(groups)]
+        return [CohortVisits(label, count, done, done / count) for label, count, done in zip(labels, patients, completed)]
+
+    def _count(
+        self,
+        codes: _Column,
+        length: int,
+        low: Optional[int],
+        high: Optional[int],
+        status: Optional[int] = None,
+        exclude: Optional[int] = None,
+    ) -> List[int]:
+        """Live rows per code of ``codes`` in [low, high), optionally of one status or without one."""
+        columns = self.columns
+        size = columns.size
+        keys, states, when = codes.data[:size], columns.status.data[:size], columns.when.data[:size]
+        if np is not None:
+            mask = states != DELETED
+            if status is not None:
+                mask &= states == status
+            if exclude is not None:
+                mask &= states != exclude
+            if low is not None:
+                mask &= when >= low
+            if high is not None:
+                mask &= (when < high) & (when >= 0)
+            return np.bincount(keys[mask], minlength=length).tolist()
+        counts = [0] * length
+        for key, state, minutes in zip(keys, states, when):
+            if state == DELETED or (status is not None and state != status) or (exclude is not None and state == exclude):
+                continue
+            if (low is not None and minutes < low) or (high is not None and not 0 <= minutes < high):
+                continue
+            counts[key] += 1
+        return counts
+
+
+def _minutes(text: str) -> int:
+    parsed = parse_datetime(text)
+    if parsed is None:
+        raise ValueError(f"unrecognised date/time {text!r}")
+    return to_minutes(parsed)
+
+
+def _minutes_or_none(text: Optional[str]) -> Optional[int]:
+    return None if text is None else _minutes(text)
+
+
+def _month_label(months_since_1970: int) -> str:
+    year, month = divmod(months_since_1970, 12)
+    return f"{1970 + year:04d}-{month + 1:02d}"
+
+
+def print_report(analytics: Analytics, start: str, end: str) -> None:
+    print(f"Doctor utilization {start} .. {end}")
+    print(f"{'doctor':>10}  {'specialty':>14}  {'booked':>6}  {'utilization':>11}")
+    for row in analytics.doctor_utilization(start, end):
+        print(f"{row.doctor_id:>10}  {row.specialty:>14}  {row.booked:>6}  {row.utilization:>10.1%}")
+    print(f"\nCancellations and no-shows {start} .. {end}")
+    print(f"{'specialty':>14}  {'appointments':>12}  {'cancelled':>9}  {'no-shows':>8}")
+    for row in analytics.cancellation_rates(start, end, now=end):
+        print(f"{row.specialty:>14}  {row.appointments:>12}  {row.cancellation_rate:>9.1%}  {row.no_show_rate:>8.1%}")
+    print("\nCompleted visits per patient, by month of first appointment")
+    print(f"{'cohort':>8}  {'patients':>8}  {'visits':>7}  {'per patient':>11}")
+    for row in analytics.visits_by_cohort():
+        print(f"{row.cohort:>8}  {row.patients:>8}  {row.completed:>7}  {row.per_patient:>11.2f}")
+
+
+def main() -> None:
+    from clinic import DATA_FORMATS, Clinic
+
+    parser = argparse.ArgumentParser(description="Print doctor utilization, cancellation and cohort reports")
+    parser.add_argument("--data-dir", type=Path, default=None, help="defaults to ./data next to this script")
+    parser.add_argument("--format", choices=DATA_FORMATS, default="json")
+    parser.add_argument("--days", type=int, default=1, help="report on the whole days before today")
+    parser.add_argument("--start", default=None, help='instead of --days: "YYYY-MM-DD HH:MM"')
+    parser.add_argument("--end", default=None)
+    args = parser.parse_args()
+
+    today = datetime.combine(date.today(), datetime.min.time())
+    start = args.start or (today - timedelta(days=args.days)).strftime("%Y-%m-%d %H:%M")
+    end = args.end or today.strftime("%Y-%m-%d %H:%M")
+    store = Clinic(data_dir=args.data_dir, data_format=args.format)
+    store.load_from_files()
+    try:
+        print_report(Analytics(store), start, end)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
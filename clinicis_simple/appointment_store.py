@@ -0,0 +1,135 @@
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from models import Appointment
+from schedule import datetime_key
+
+# (patient_id or doctor_id, Appointment.slot_key)
+SlotKey = Tuple[str, Union[int, str]]
+
+
+class AppointmentStore:
+    """Appointments keyed by id, with hash indexes on patient and doctor (and their slots).
+
+    Iteration keeps insertion order, so code that used to walk the plain list
+    (GUI listbox, save_to_files) sees the same sequence as before.
+    """
+
+    def __init__(self, appointments: Iterable[Appointment] = ()) -> None:
+        self._by_id: Dict[str, Appointment] = {}
+        self._by_patient_slot: Dict[SlotKey, Set[str]] = {}
+        self._by_doctor_slot: Dict[SlotKey, Set[str]] = {}
+        # insertion-ordered id sets (dicts with None values) per patient / doctor
+        self._by_patient: Dict[str, Dict[str, None]] = {}
+        self._by_doctor: Dict[str, Dict[str, None]] = {}
+        # a dirty.DirtyTracker set by Clinic: additions and removals are reported to it
+        self.tracker = None
+        for appt in appointments:
+            self.add(appt)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Appointment]:
+        return iter(self._by_id.values())
+
+    def __contains__(self, appt_id: object) -> bool:
+        return appt_id in self._by_id
+
+    def __getitem__(self, index: int) -> Appointment:
+        # positional access is kept for list-style callers; prefer get(appt_id)
+        size = len(self._by_id)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("appointment index out of range")
+        return next(islice(self._by_id.values(), index, None))
+
+    def get(self, appt_id: str) -> Optional[Appointment]:
+        return self._by_id.get(appt_id)
+
+    def add(self, appt: Appointment) -> None:
+        if appt.appt_id in self._by_id:
+            self.remove(appt.appt_id)
+        self._by_id[appt.appt_id] = appt
+        self._by_patient.setdefault(appt.patient_id, {})[appt.appt_id] = None
+        self._by_doctor.setdefault(appt.doctor_id, {})[appt.appt_id] = None
+        self._index(appt)
+        if self.tracker is not None:
+            appt._tracker = self.tracker
+            self.tracker.mark("appointments", appt.appt_id)
+
+    append = add
+
+    def remove(self, appt_id: str) -> Optional[Appointment]:
+        appt = self._by_id.pop(appt_id, None)
+        if appt is not None:
+            if self.tracker is not None:
+                appt._tracker = None
+                self.tracker.mark("appointments", appt_id)
+            self._unindex(appt)
+            for index, key in ((self._by_patient, appt.patient_id), (self._by_doctor, appt.doctor_id)):
+                ids = index[key]
+                del ids[appt_id]
+                if not ids:
+                    del index[key]
+        return appt
+
+    def reschedule(self, appt: Appointment, new_datetime: str) -> None:
+        """Move an appointment to a new time, keeping the slot indexes in sync."""
+        self._unindex(appt)
+        appt.reschedule(new_datetime)
+        self._index(appt)
+
+    def set_time(self, appt: Appointment, when: Union[int, str]) -> None:
+        """Put an appointment back at ``when`` (a slot_key) without the reschedule audit event."""
+        self._unindex(appt)
+        appt.datetime_str = when
+        self._index(appt)
+
+    def clear(self) -> None:
+        if self.tracker is not None:
+            self.tracker.mark_full(("appointments",))
+        self._by_id.clear()
+        self._by_patient_slot.clear()
+        self._by_doctor_slot.clear()
+        self._by_patient.clear()
+        self._by_doctor.clear()
+
+    def patient_has_slot(self, patient_id: str, datetime_str: str, exclude: Optional[str] = None) -> bool:
+        ids = self._by_patient_slot.get((patient_id, datetime_key(datetime_str)), ())
+        return any(appt_id != exclude for appt_id in ids)
+
+    def at_doctor_slot(self, doctor_id: str, datetime_str: str) -> List[Appointment]:
+        ids = self._by_doctor_slot.get((doctor_id, datetime_key(datetime_str)), ())
+        return [self._by_id[appt_id] for appt_id in ids]
+
+    def for_patient(self, patient_id: str) -> List[Appointment]:
+        return [self._by_id[appt_id] for appt_id in self._by_patient.get(patient_id, ())]
+
+    def for_doctor(self, doctor_id: str) -> List[Appointment]:
+        return [self._by_id[appt_id] for appt_id in self._by_doctor.get(doctor_id, ())]
+
+    def doctor_ids(self) -> List[str]:
+        """Doctors with at least one appointment."""
+        return list(self._by_doctor)
+
+    def patient_ids(self) -> List[str]:
+        """Patients with at least one appointment."""
+        return list(self._by_patient)
+
+    def _index(self, appt: Appointment) -> None:
+        self._by_patient_slot.setdefault((appt.patient_id, appt.slot_key), set()).add(appt.appt_id)
+        self._by_doctor_slot.setdefault((appt.doctor_id, appt.slot_key), set()).add(appt.appt_id)
+
+    def _unindex(self, appt: Appointment) -> None:
+        for index, key in (
+            (self._by_patient_slot, (appt.patient_id, appt.slot_key)),
+            (self._by_doctor_slot, (appt.doctor_id, appt.slot_key)),
+        ):
+            ids = index.get(key)
+            if ids is None:
+                continue
+            ids.discard(appt.appt_id)
+            if not ids:
+                del index[key]
@@ -0,0 +1,121 @@
+"""Filtered, sorted list of appointment ids for the GUI's virtualized list.
+
+The view keeps only ids and sort keys; the GUI asks for the handful of rows it
+shows with ``window()``. After an action the GUI calls ``update(appt_id)``,
+which moves that one row instead of rebuilding the whole list.
+"""
+import re
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models import Appointment
+
+COLUMNS = ("appt_id", "patient_id", "doctor_id", "datetime_str", "status")
+# filters served by an id index of the store; any other column is checked per row
+INDEXED_FILTERS = ("patient_id", "doctor_id")
+_DIGITS = re.compile(r"(\d+)")
+
+
+def natural_key(text: str) -> Tuple[Any, ...]:
+    """Sort key that puts "a9" before "a10"."""
+    parts = _DIGITS.split(text)
+    return tuple(int(part) if i % 2 else part for i, part in enumerate(parts))
+
+
+class AppointmentView:
+    def __init__(self, appointments: Any, sort_column: Optional[str] = None, descending: bool = False) -> None:
+        # appointments: AppointmentStore or SqliteAppointmentStore
+        self.appointments = appointments
+        self.sort_column = sort_column
+        self.descending = descending
+        self.filters: Dict[str, str] = {}
+        self._rows: List[Tuple[Any, str]] = []  # (sort key, appt_id), ascending
+        self._key_of: Dict[str, Any] = {}
+        self._next_ordinal = 0
+        self.rebuild()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def set_sort(self, column: Optional[str], descending: bool = False) -> None:
+        """Sort by ``column``, or keep store (insertion) order when it is None."""
+        if column is not None and column not in COLUMNS:
+            raise ValueError(f"Unknown column {column!r}")
+        self.sort_column = column
+        self.descending = descending
+        self.rebuild()
+
+    def set_filters(self, **filters: Optional[str]) -> None:
+        """Show only rows whose columns equal the given values; empty values are ignored."""
+        for column in filters:
+            if column not in COLUMNS:
+                raise ValueError(f"Unknown column {column!r}")
+        self.filters = {column: value for column, value in filters.items() if value}
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        self._next_ordinal = 0
+        rows = [(self._sort_key(appt), appt.appt_id) for appt in self._candidates() if self.matches(appt)]
+        rows.sort()
+        self._rows = rows
+        self._key_of = dict((appt_id, key) for key, appt_id in rows)
+
+    def matches(self, appt: Appointment) -> bool:
+        return all(getattr(appt, column) == value for column, value in self.filters.items())
+
+    def window(self, offset: int, count: int) -> List[Appointment]:
+        """The appointments at display positions ``offset .. offset + count``."""
+        size = len(self._rows)
+        if self.descending:
+            positions: Iterable[int] = range(size - 1 - offset, max(size - 1 - offset - count, -1), -1)
+        else:
+            positions = range(offset, min(offset + count, size))
+        result = []
+        for i in positions:
+            appt = self.appointments.get(self._rows[i][1])
+            if appt is not None:
+                result.append(appt)
+        return result
+
+    def position(self, appt_id: str) -> Optional[int]:
+        key = self._key_of.get(appt_id)
+        if key is None:
+            return None
+        i = bisect_left(self._rows, (key, appt_id))
+        return len(self._rows) - 1 - i if self.descending else i
+
+    def update(self, appt_id: str) -> None:
+        """Re-place one appointment after it was added, changed or removed."""
+        old_key = self._key_of.pop(appt_id, None)
+        if old_key is not None:
+            del self._rows[bisect_left(self._rows, (old_key, appt_id))]
+        appt = self.appointments.get(appt_id)
+        if appt is None or not self.matches(appt):
+            return
+        if self.sort_column is None and old_key is not None:
+            key = old_key  # a changed row keeps its place in store order
+        else:
+            key = self._sort_key(appt)
+        self._key_of[appt_id] = key
+        insort(self._rows, (key, appt_id))
+
+    def _candidates(self) -> Iterable[Appointment]:
+        for column in INDEXED_FILTERS:
+            value = self.filters.get(column)
+            if value:
+                finder = self.appointments.for_patient if column == "patient_id" else self.appointments.for_doctor
+                return finder(value)
+        return self.appointments
+
+    def _sort_key(self, appt: Appointment) -> Any:
+        column = self.sort_column
+        if column is None:
+            self._next_ordinal += 1
+            return self._next_ordinal
+        if column == "datetime_str":
+            when = appt.slot_key
+            # unparsed legacy strings sort after the real dates
+            return (0, when, "") if isinstance(when, int) else (1, 0, when)
+        if column == "status":
+            return appt.status
+        return natural_key(getattr(appt, column))
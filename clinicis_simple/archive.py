@@ -0,0 +1,154 @@
+"""Read-only monthly partitions of old appointments.
+
+``Clinic.archive()`` moves completed and cancelled appointments older than a
+cutoff out of the live store into ``data_dir/archive/YYYY-MM.snap``, one
+binary_snapshot file per month holding only appointments. The live files
+then hold just the active window, so loading and saving no longer grow with
+the years of history. Partitions are opened only by the queries that need
+their months (``Clinic.appointment_history``) and filtered column-wise
+before any Appointment object is built.
+
+A month that already has a partition is merged by appointment id when more
+of it is archived, so running an archive twice (or again after a crash
+between writing a partition and saving the live files) never duplicates rows.
+
+Archive from the command line: ``python archive.py --keep-days 365``, with the
+same ``--format`` / ``--journaled`` / ``--db`` the data folder was written with.
+"""
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from binary_snapshot import SnapshotReader, encode
+from fileio import atomic_write_bytes
+from models import Appointment
+from schedule import MINUTES_PER_DAY, from_minutes, parse_datetime, to_minutes
+
+ARCHIVE_DIR = "archive"
+PARTITION_SUFFIX = ".snap"
+ARCHIVED_STATUSES = ("completed", "cancelled")
+DEFAULT_KEEP_DAYS = 365
+
+
+def month_of(minutes: int) -> str:
+    moment = from_minutes(minutes)
+    return f"{moment.year:04d}-{moment.month:02d}"
+
+
+def archivable(appt: Appointment, cutoff: int) -> bool:
+    """Finished before ``cutoff`` (schedule minutes); times that are not a date/time stay live."""
+    key = appt.slot_key
+    return isinstance(key, int) and key < cutoff and appt.status in ARCHIVED_STATUSES
+
+
+def cutoff_minutes(keep_days: int = DEFAULT_KEEP_DAYS, now: Optional[str] = None) -> int:
+    moment = parse_datetime(now) if now else datetime.now()
+    if moment is None:
+        raise ValueError(f"unrecognised date/time {now!r}")
+    return to_minutes(moment) // MINUTES_PER_DAY * MINUTES_PER_DAY - keep_days * MINUTES_PER_DAY
+
+
+class AppointmentArchive:
+    def __init__(self, data_dir: Path, compression: str = "zlib", fsync: bool = True) -> None:
+        self.directory = Path(data_dir) / ARCHIVE_DIR
+        self.compression = compression
+        self.fsync = fsync
+
+    def months(self) -> List[str]:
+        return sorted(path.stem for path in self.directory.glob(f"*{PARTITION_SUFFIX}"))
+
+    def path(self, month: str) -> Path:
+        return self.directory / f"{month}{PARTITION_SUFFIX}"
+
+    def reset(self) -> None:
+        for path in self.directory.glob(f"*{PARTITION_SUFFIX}"):
+            path.unlink()
+
+    def add(self, appointments: Iterable[Appointment]) -> Dict[str, int]:
+        """Write ``appointments`` into their month partitions; return rows per month written."""
+        by_month: Dict[str, List[Appointment]] = {}
+        for appt in appointments:
+            by_month.setdefault(month_of(appt.slot_key), []).append(appt)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for month, rows in by_month.items():
+            path = self.path(month)
+            if path.exists():
+                new_ids = {appt.appt_id for appt in rows}
+                kept = [appt for appt in self.read(month) if appt.appt_id not in new_ids]
+                rows = kept + rows
+            rows.sort(key=lambda appt: (appt.slot_key, appt.appt_id))
+            atomic_write_bytes(path, encode((), (), rows, self.compression), fsync=self.fsync)
+        return {month: len(rows) for month, rows in by_month.items()}
+
+    def read(self, month: str) -> List[Appointment]:
+        with SnapshotReader(self.path(month)) as reader:
+            return list(reader.appointments())
+
+    def query(
+        self,
+        patient_id: Optional[str] = None,
+        doctor_id: Optional[str] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Iterator[Appointment]:
+        """Archived appointments matching every given filter (times in schedule minutes, end exclusive)."""
+        first = month_of(start) if start is not None else None
+        last = month_of(end - 1) if end is not None else None
+        for month in self.months():
+            if (first is not None and month < first) or (last is not None and month > last):
+                continue
+            with SnapshotReader(self.path(month)) as reader:
+                rows = range(reader.appointment_count)
+                for column, value in (("apt.pat", patient_id), ("apt.doc", doctor_id)):
+                    if value is None:
+                        continue
+                    code = reader.code_of(value)
+                    if code is None:
+                        rows = range(0)
+                        break
+                    values = reader.column(column)
+                    rows = [row for row in rows if values[row] == code]
+                if start is not None or end is not None:
+                    when = reader.column("apt.when")
+                    low = start if start is not None else 0
+                    high = end if end is not None else 1 << 62
+                    rows = [row for row in rows if low <= when[row] < high]
+                for row in rows:
+                    yield reader.appointment(row)
+
+    def appointment_ids(self) -> Iterator[str]:
+        for month in self.months():
+            with SnapshotReader(self.path(month)) as reader:
+                strings = reader.strings()
+                yield from [strings[code] for code in reader.column("apt.id")]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from clinic import DATA_FORMATS, Clinic
+    from sqlite_storage import SqliteStorage
+
+    parser = argparse.ArgumentParser(description="Move old finished appointments into monthly archive partitions")
+    parser.add_argument("--data-dir", type=Path, default=None, help="defaults to ./data next to this script")
+    parser.add_argument("--format", choices=DATA_FORMATS, default="json")
+    parser.add_argument("--journaled", action="store_true", help="data dir uses the journaled mode")
+    parser.add_argument("--db", type=Path, default=None, help="archive from an SQLite database instead")
+    parser.add_argument("--keep-days", type=int, default=DEFAULT_KEEP_DAYS)
+    parser.add_argument("--now", default=None, help='archive relative to this time ("YYYY-MM-DD HH:MM")')
+    args = parser.parse_args(argv)
+    if args.format != "json" and (args.journaled or args.db):
+        parser.error(f"--format {args.format} cannot be combined with --journaled or --db")
+
+    storage = SqliteStorage(args.db) if args.db else None
+    store = Clinic(data_dir=args.data_dir, data_format=args.format, journaled=args.journaled, storage=storage)
+    if storage is None:
+        store.load_from_files()
+    try:
+        moved = store.archive(keep_days=args.keep_days, now=args.now)
+        live = len(store.appointments)
+    finally:
+        store.close()
+    print(f"Archived {moved} appointments; {live} stay live")
+
+if __name__ == "__main__":
+    main()
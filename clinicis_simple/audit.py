@@ -0,0 +1,276 @@
+"""Audit trail for appointment changes, with pluggable sinks.
+
+Models report events through ``emit``; where they end up depends on the
+installed sink (``set_sink``):
+
+- PrintSink: one ``[AUDIT] ...`` line on stdout per event (the default)
+- NullSink: drops events
+- MemorySink: keeps the last N events in a ring buffer (tests, the GUI)
+- JsonlFileSink: appends JSON lines to a size-rotated file
+- QueueSink: hands events to another sink from a background thread, in
+  batches, so the caller only pays for a deque append
+
+Events travel as plain ``(ts, action, entity, details)`` tuples, which are
+the cheapest thing to build; AuditEvent gives them names when they are read
+back, and their text is only formatted by sinks that print it.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+MESSAGES = {
+    "rescheduled": "Rescheduled {entity}: {old} -> {new}",
+    "cancelled": "Cancelled {entity}",
+    "completed": "Completed {entity} with summary",
+}
+
+# (ts, action, entity, details), as emit() builds it
+RawEvent = Tuple[float, str, str, Dict[str, Any]]
+
+DEFAULT_MAX_BYTES = 16 << 20
+DEFAULT_BACKUPS = 5
+
+
+class AuditEvent(NamedTuple):
+    ts: float  # time.time() when it happened
+    action: str  # "rescheduled", "cancelled", "completed", ...
+    entity: str  # id of the changed object
+    details: Dict[str, Any]
+
+    @property
+    def message(self) -> str:
+        return event_message(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return event_dict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AuditEvent":
+        details = {k: v for k, v in data.items() if k not in ("ts", "action", "entity")}
+        return cls(data["ts"], data["action"], data["entity"], details)
+
+
+# sinks receive raw tuples, so these work on any (ts, action, entity, details) tuple
+
+
+def event_message(event: RawEvent) -> str:
+    _, action, entity, details = event
+    template = MESSAGES.get(action)
+    if template is None:
+        return f"{action} {entity} {details}" if details else f"{action} {entity}"
+    return template.format(entity=entity, **details)
+
+
+def event_dict(event: RawEvent) -> Dict[str, Any]:
+    ts, action, entity, details = event
+    return {"ts": ts, "action": action, "entity": entity, **details}
+
+
+class AuditSink:
+    """Base sink: ``write`` takes a batch of events; ``emit`` is the one-event shortcut."""
+
+    def emit(self, event: RawEvent) -> None:
+        self.write((event,))
+
+    def write(self, events: Iterable[RawEvent]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class NullSink(AuditSink):
+    def emit(self, event: RawEvent) -> None:
+        pass
+
+    def write(self, events: Iterable[RawEvent]) -> None:
+        pass
+
+
+class PrintSink(AuditSink):
+    def __init__(self, stream=None) -> None:
+        self.stream = stream  # None: whatever sys.stdout is at the time
+
+    def write(self, events: Iterable[RawEvent]) -> None:
+        stream = self.stream or sys.stdout
+        stream.write("".join(f"[AUDIT] {event_message(event)}\n" for event in events))
+
+
+class MemorySink(AuditSink):
+    def __init__(self, capacity: int = 10_000) -> None:
+        self._events: Deque[RawEvent] = deque(maxlen=capacity)
+
+    def emit(self, event: RawEvent) -> None:
+        self._events.append(event)
+
+    def write(self, events: Iterable[RawEvent]) -> None:
+        self._events.extend(events)
+
+    def events(self, entity: Optional[str] = None, action: Optional[str] = None) -> List[AuditEvent]:
+        return [AuditEvent(*e) for e in list(self._events) if _matches(e, entity, action)]
+
+    def clear(self) -> None:
+        self._events.clear()
+
+
+class JsonlFileSink(AuditSink):
+    """JSON lines in ``path``; past ``max_bytes`` it moves to path.1 (path.1 to path.2, ...)."""
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES, backups: int = DEFAULT_BACKUPS) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        # one encoder for every line: json.dumps with options builds a new one per call
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, events: Iterable[RawEvent]) -> None:
+        encode = self._encode
+        data = "".join([encode(event_dict(event)) + "\n" for event in events])
+        if not data:
+            return
+        with self._lock:
+            if self._file.tell() + len(data) > self.max_bytes and self._file.tell():
+                self._rotate()
+            self._file.write(data)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for n in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{n}")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{n + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+
+class QueueSink(AuditSink):
+    """Collects events in a deque; a background thread writes them to ``target`` in batches.
+
+    ``flush()`` writes everything queued so far before returning. When more
+    than ``max_pending`` events are waiting, the emitting thread writes them
+    itself instead of letting the queue grow without bound.
+    """
+
+    def __init__(
+        self, target: AuditSink, batch_size: int = 1024, interval: float = 0.5, max_pending: int = 100_000
+    ) -> None:
+        self.target = target
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self._queue: Deque[RawEvent] = deque()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        # the writer is a daemon thread, so write out the tail when the interpreter exits
+        atexit.register(self.close)
+
+    def emit(self, event: RawEvent) -> None:
+        queue = self._queue
+        queue.append(event)
+        if len(queue) >= self.batch_size:
+            if len(queue) > self.max_pending:
+                self.flush()
+            elif not self._wake.is_set():
+                self._wake.set()
+
+    def write(self, events: Iterable[RawEvent]) -> None:
+        self._queue.extend(events)
+        self._wake.set()
+
+    def flush(self) -> None:
+        self._drain()
+        self.target.flush()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self._drain()
+        self.target.close()
+        atexit.unregister(self.close)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._drain()
+
+    def _drain(self) -> None:
+        queue = self._queue
+        with self._write_lock:
+            while queue:
+                batch = []
+                try:
+                    for _ in range(self.batch_size):
+                        batch.append(queue.popleft())
+                except IndexError:
+                    pass
+                self.target.write(batch)
+
+
+def read_events(path: Path, entity: Optional[str] = None, action: Optional[str] = None) -> Iterator[AuditEvent]:
+    """Events from a JsonlFileSink file and its rotated backups, oldest first."""
+    path = Path(path)
+    backups = [p for p in path.parent.glob(f"{path.name}.*") if p.suffix[1:].isdigit()]
+    backups.sort(key=lambda p: int(p.suffix[1:]), reverse=True)
+    for file in backups + [path]:
+        if not file.exists():
+            continue
+        with open(file, "r", encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                event = AuditEvent.from_dict(json.loads(line))
+                if _matches(event, entity, action):
+                    yield event
+
+
+def _matches(event: RawEvent, entity: Optional[str], action: Optional[str]) -> bool:
+    return (entity is None or event[2] == entity) and (action is None or event[1] == action)
+
+
+_sink: AuditSink = PrintSink()
+
+
+def get_sink() -> AuditSink:
+    return _sink
+
+
+def set_sink(sink: AuditSink) -> AuditSink:
+    """Install ``sink`` for all audit events; returns the previous one."""
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def emit(action: str, entity: str, **details: Any) -> None:
+    _sink.emit((time.time(), action, entity, details))
@@ -0,0 +1 @@
+"""Micro-benchmarks for Clinic; run each module with ``python -m benchmarks.<name>``."""
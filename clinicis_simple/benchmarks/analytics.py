@@ -0,0 +1,109 @@
+"""Management reports: loops over Clinic.appointments vs. the columnar Analytics views.
+
+Times the three reports (doctor utilization, cancellation rates per
+specialty, completed visits per cohort) both ways on generated data, the
+first Analytics build, and a refresh after a batch of cancellations; the
+results of both ways are checked to agree.
+Run from the project folder: ``python -m benchmarks.analytics``
+"""
+import argparse
+import time
+from typing import Any, Dict, List, Tuple
+
+import analytics
+import audit
+from analytics import Analytics
+from audit import NullSink
+from benchmarks.generator import generate
+from clinic import Clinic
+from schedule import MINUTES_PER_DAY, format_minutes, from_minutes
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+
+
+def naive_reports(store: Clinic, start: int, end: int, now: int) -> Tuple[Dict[str, int], Dict[str, List[int]], Dict[str, List[int]]]:
+    """The reports as a dict-joining loop: (booked per doctor, [total, cancelled, no-shows] per specialty, [patients, visits] per cohort)."""
+    booked: Dict[str, int] = {}
+    rates: Dict[str, List[int]] = {}
+    first: Dict[str, int] = {}
+    visits: Dict[str, int] = {}
+    for appt in store.appointments:
+        when, status = appt.slot_key, appt.status
+        in_window = isinstance(when, int) and start <= when < end
+        if in_window and status != "cancelled":
+            booked[appt.doctor_id] = booked.get(appt.doctor_id, 0) + 1
+        doctor = store.doctors.get(appt.doctor_id)
+        row = rates.setdefault(doctor.specialty if doctor else "(unknown doctor)", [0, 0, 0])
+        row[0] += 1
+        row[1] += status == "cancelled"
+        row[2] += status == "scheduled" and isinstance(when, int) and when < now
+        if isinstance(when, int) and when < first.get(appt.patient_id, when + 1):
+            first[appt.patient_id] = when
+        if status == "completed":
+            visits[appt.patient_id] = visits.get(appt.patient_id, 0) + 1
+    cohorts: Dict[str, List[int]] = {}
+    for patient_id, when in first.items():
+        moment = from_minutes(when)
+        row = cohorts.setdefault(f"{moment.year:04d}-{moment.month:02d}", [0, 0])
+        row[0] += 1
+        row[1] += visits.get(patient_id, 0)
+    return booked, rates, cohorts
+
+
+def columnar_reports(engine: Analytics, start: str, end: str, now: str) -> Tuple[Any, Any, Any]:
+    booked = {row.doctor_id: row.booked for row in engine.doctor_utilization(start, end) if row.booked}
+    rates = {row.specialty: [row.appointments, row.cancelled, row.no_shows] for row in engine.cancellation_rates(now=now)}
+    cohorts = {row.cohort: [row.patients, row.completed] for row in engine.visits_by_cohort()}
+    return booked, rates, cohorts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--mutations", type=int, default=1000)
+    parser.add_argument("--no-numpy", action="store_true", help="use the array.array fallback")
+    args = parser.parse_args()
+    audit.set_sink(NullSink())
+    if args.no_numpy:
+        analytics.np = None
+    print(f"aggregates: {'numpy' if analytics.np is not None else 'array.array loops'}")
+
+    print(f"{'appointments':>12}  {'loop s':>7}  {'build s':>7}  {'reports ms':>10}  {'refresh ms':>10}  {'speedup':>7}")
+    for size in args.sizes:
+        data = generate(max(100, size // 5), max(8, size // 2000), size)
+        store = data.store
+        # a week of appointments just before "now"
+        end_minutes = data.now // MINUTES_PER_DAY * MINUTES_PER_DAY
+        start, end, now = (format_minutes(m) for m in (end_minutes - 7 * MINUTES_PER_DAY, end_minutes, data.now))
+
+        started = time.perf_counter()
+        expected = naive_reports(store, end_minutes - 7 * MINUTES_PER_DAY, end_minutes, data.now)
+        loop = time.perf_counter() - started
+
+        engine = Analytics(store)
+        started = time.perf_counter()
+        engine.refresh()
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        got = columnar_reports(engine, start, end, now)
+        reports = time.perf_counter() - started
+        if got != expected:
+            raise SystemExit("columnar reports differ from the loop")
+
+        upcoming = [a.appt_id for a in store.appointments if a.status == "scheduled" and a.slot_key >= data.now]
+        for appt_id in upcoming[: args.mutations]:
+            store.cancel_appointment(appt_id)
+        started = time.perf_counter()
+        engine.refresh()
+        refresh = time.perf_counter() - started
+        if columnar_reports(engine, start, end, now) != naive_reports(store, end_minutes - 7 * MINUTES_PER_DAY, end_minutes, data.now):
+            raise SystemExit("reports differ after the refresh")
+        engine.close()
+        print(
+            f"{size:>12}  {loop:>7.2f}  {build:>7.2f}  {reports * 1e3:>10.1f}  {refresh * 1e3:>10.2f}"
+            f"  {loop / reports:>6.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Load, save and booking cost with the full history live vs. after archiving it.
+
+Builds a store whose history is all completed appointments, saves it, then
+archives everything but the newest ``--active`` rows and repeats the
+measurements; also times a patient's full history query, which has to open
+every monthly partition.
+Run from the project folder: ``python -m benchmarks.archive``
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import audit
+from audit import NullSink
+from benchmarks.booking import HISTORY_START, build_clinic, slot_time, time_bookings
+from clinic import DATA_FORMATS, Clinic
+
+
+def measure(data_dir: Path, data_format: str, bookings: int) -> tuple:
+    """(load s, full save s, us per booking, live appointments) of the files in ``data_dir``."""
+    store = Clinic(data_dir=data_dir, data_format=data_format, fsync=False)
+    started = time.perf_counter()
+    store.load_from_files()
+    load = time.perf_counter() - started
+    live = len(store.appointments)
+    store._dirty.mark_full()
+    started = time.perf_counter()
+    store.save_to_files()
+    save = time.perf_counter() - started
+    booking = time_bookings(store, bookings)
+    store.close()
+    return load, save, booking * 1e6, live
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--active", type=int, default=20_000, help="newest appointments that stay live")
+    parser.add_argument("--bookings", type=int, default=1000)
+    parser.add_argument("--format", choices=DATA_FORMATS, default="json")
+    args = parser.parse_args()
+    audit.set_sink(NullSink())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        store = Clinic(data_dir=data_dir, data_format=args.format, fsync=False, fresh_start=True)
+        source = build_clinic(args.size)
+        store.patients, store.doctors, store.appointments = source.patients, source.doctors, source.appointments
+        store.save_to_files()
+        store.close()
+
+        print(f"{args.size} appointments, {args.format} format")
+        print(f"{'':>9}  {'live':>9}  {'load s':>7}  {'save s':>7}  {'us/booking':>10}")
+        load, save, booking, live = measure(data_dir, args.format, args.bookings)
+        print(f"{'all live':>9}  {live:>9}  {load:>7.2f}  {save:>7.2f}  {booking:>10.2f}")
+
+        store = Clinic(data_dir=data_dir, data_format=args.format, fsync=False)
+        store.load_from_files()
+        # the cutoff is whole days before "now", so keep_days=0 archives up to midnight
+        now = slot_time(HISTORY_START, args.size - args.active)
+        started = time.perf_counter()
+        moved = store.archive(keep_days=0, now=now)
+        took = time.perf_counter() - started
+        store.close()
+        months = len(store.appointment_archive.months())
+        print(f"archived {moved} appointments into {months} partitions in {took:.2f} s")
+
+        load, save, booking, live = measure(data_dir, args.format, args.bookings)
+        print(f"{'archived':>9}  {live:>9}  {load:>7.2f}  {save:>7.2f}  {booking:>10.2f}")
+
+        store = Clinic(data_dir=data_dir, data_format=args.format, fsync=False)
+        store.load_from_files()
+        started = time.perf_counter()
+        full = store.appointment_history(patient_id="p0")
+        everything = time.perf_counter() - started
+        started = time.perf_counter()
+        recent = store.appointment_history(patient_id="p0", start=slot_time(HISTORY_START, args.size - 2 * args.active))
+        window = time.perf_counter() - started
+        store.close()
+        print(f"history of p0: {len(full)} rows in {everything * 1e3:.1f} ms, recent {len(recent)} in {window * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
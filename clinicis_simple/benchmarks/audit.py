@@ -0,0 +1,107 @@
+"""Cost of audited appointment changes per audit sink, against the old print() path.
+
+Each run reschedules, cancels or completes ``--events`` appointments (one
+audit event each). Output goes to a file or os.devnull, so these numbers
+are a lower bound for print(): a terminal is far slower.
+Run from the project folder: ``python -m benchmarks.audit``
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import audit
+from audit import JsonlFileSink, MemorySink, NullSink, PrintSink, QueueSink
+from benchmarks.booking import BOOKING_START, slot_time
+from models import Appointment
+
+
+def make_appointments(count: int) -> List[Tuple[Appointment, str]]:
+    """Appointments with the time each reschedule moves them to (computed up front, not timed)."""
+    return [
+        (Appointment(f"a{i}", f"p{i % 1000}", f"d{i % 50}", slot_time(BOOKING_START, i)), slot_time(BOOKING_START, i + 1))
+        for i in range(count)
+    ]
+
+
+def changes(appointments: List[Tuple[Appointment, str]]) -> None:
+    for i, (appt, new) in enumerate(appointments):
+        kind = i % 3
+        if kind == 0:
+            appt.reschedule(new)
+        elif kind == 1:
+            appt.cancel()
+        else:
+            appt.complete("Routine check")
+
+
+def legacy_print(appointments: List[Tuple[Appointment, str]]) -> None:
+    """The same work with AuditableMixin's old synchronous print() per event."""
+    for i, (appt, new) in enumerate(appointments):
+        kind = i % 3
+        if kind == 0:
+            old = appt.datetime_str
+            appt.datetime_str = new
+            print(f"[AUDIT] Rescheduled {appt.appt_id}: {old} -> {new}")
+        elif kind == 1:
+            appt.status = "cancelled"
+            print(f"[AUDIT] Cancelled {appt.appt_id}")
+        else:
+            appt.status = "completed"
+            appt.summary = "Routine check"
+            print(f"[AUDIT] Completed {appt.appt_id} with summary")
+
+
+def timed(run: Callable[[], None]) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100_000)
+    args = parser.parse_args()
+    n = args.events
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        out_file = open(Path(tmp) / "stdout.txt", "w")
+        for label, stream in (("print() to devnull", devnull), ("print() to a file", out_file)):
+            appointments = make_appointments(n)
+            with contextlib.redirect_stdout(stream):
+                rows.append((label, timed(lambda: legacy_print(appointments)), None))
+        out_file.close()
+
+        previous = audit.get_sink()
+        try:
+            sinks = [
+                ("NullSink", NullSink()),
+                ("MemorySink", MemorySink(capacity=n)),
+                ("PrintSink to devnull", PrintSink(devnull)),
+                ("JsonlFileSink", JsonlFileSink(Path(tmp) / "direct.jsonl")),
+                ("QueueSink -> JSONL", QueueSink(JsonlFileSink(Path(tmp) / "queued.jsonl"))),
+            ]
+            for label, sink in sinks:
+                appointments = make_appointments(n)
+                audit.set_sink(sink)
+                caller = timed(lambda: changes(appointments))
+                total = caller + timed(sink.close)
+                rows.append((label, caller, total))
+            written = sum(1 for _ in audit.read_events(Path(tmp) / "queued.jsonl"))
+        finally:
+            audit.set_sink(previous)
+
+    print(f"{n} audited changes")
+    print(f"{'sink':>22}  {'caller us/op':>12}  {'incl. flush us/op':>17}")
+    for label, caller, total in rows:
+        flushed = f"{total / n * 1e6:>17.2f}" if total is not None else f"{'':>17}"
+        print(f"{label:>22}  {caller / n * 1e6:>12.2f}  {flushed}")
+    print(f"events read back from the queued JSONL file: {written}")
+
+
+if __name__ == "__main__":
+    main()
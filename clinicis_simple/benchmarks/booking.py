@@ -0,0 +1,63 @@
+"""Booking cost against appointment history size.
+
+Run from the project folder: ``python -m benchmarks.booking``
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Optional
+
+from clinic import Clinic
+from models import Appointment, Doctor, Patient
+from schedule import format_minutes, parse_datetime, to_minutes
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+HISTORY_START = to_minutes(parse_datetime("2020-01-01 08:00"))
+BOOKING_START = to_minutes(parse_datetime("2030-06-01 08:00"))
+
+
+def slot_time(start: int, i: int) -> str:
+    """The i-th half-hour slot after ``start`` (in schedule minutes)."""
+    return format_minutes(start + 30 * i)
+
+
+def build_clinic(
+    n_appointments: int, n_patients: int = 1000, n_doctors: int = 50, data_dir: Optional[Path] = None
+) -> Clinic:
+    store = Clinic(data_dir=data_dir)
+    for i in range(n_patients):
+        store.add_patient(Patient(f"p{i}", f"Patient {i}", f"050-{i:07d}"))
+    for i in range(n_doctors):
+        store.add_doctor(Doctor(f"d{i}", f"Dr. {i}", f"03-{i:07d}", "GP"))
+    for i in range(n_appointments):
+        # historical rows go straight into the store; only new bookings use the public API
+        store.appointments.add(
+            Appointment(f"h{i}", f"p{i % n_patients}", f"d{i % n_doctors}", slot_time(HISTORY_START, i), status="completed")
+        )
+    return store
+
+
+def time_bookings(store: Clinic, count: int) -> float:
+    """Return the mean seconds per schedule_appointment call."""
+    n_doctors = len(store.doctors)
+    start = time.perf_counter()
+    for i in range(count):
+        store.schedule_appointment(f"b{i}", f"p{i % len(store.patients)}", f"d{i % n_doctors}", slot_time(BOOKING_START, i))
+    return (time.perf_counter() - start) / count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--bookings", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'appointments':>12}  {'us/booking':>10}")
+    for size in args.sizes:
+        store = build_clinic(size)
+        per_call = time_bookings(store, args.bookings)
+        print(f"{size:>12}  {per_call * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Concurrent bookings: a double-booking stress check and throughput per worker count.
+
+The stress check lets many threads fight over the same few doctors' slots
+(booking, rescheduling and cancelling) and then verifies that no doctor or
+patient ended up double booked, in memory and after replaying the journal.
+The scaling run books non-conflicting slots from 1..N threads on a journaled
+store, once with Clinic's own per-key locking and once with every call behind
+one global lock. Run from the project folder: ``python -m benchmarks.concurrency``
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import audit
+from audit import NullSink
+from benchmarks.booking import BOOKING_START, slot_time
+from clinic import Clinic
+from models import Doctor, Patient
+from schedule import format_minutes, parse_datetime, to_minutes
+
+
+def build_clinic(n_patients: int, n_doctors: int, data_dir: Path, journaled: bool = True) -> Clinic:
+    store = Clinic(fresh_start=True, data_dir=data_dir, journaled=journaled)
+    with store.batch():
+        for i in range(n_patients):
+            store.add_patient(Patient(f"p{i}", f"Patient {i}", f"050-{i:07d}"))
+        for i in range(n_doctors):
+            store.add_doctor(Doctor(f"d{i}", f"Dr. {i}", f"03-{i:07d}", "GP"))
+    return store
+
+
+def run_threads(workers: int, target: Callable[[int], None]) -> float:
+    threads = [threading.Thread(target=target, args=(w,)) for w in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def double_bookings(store: Clinic) -> List[str]:
+    """Every invariant violation found: overlapping doctor slots, patient clashes, stale schedules."""
+    problems = []
+    by_doctor: Dict[str, List[int]] = defaultdict(list)
+    by_patient: Dict[str, List[str]] = defaultdict(list)
+    for appt in store.appointments:
+        if appt.status == "scheduled":
+            by_doctor[appt.doctor_id].append(to_minutes(parse_datetime(appt.datetime_str)))
+            by_patient[appt.patient_id].append(appt.datetime_str)
+    for doctor in store.doctors.values():
+        starts = sorted(by_doctor.get(doctor.pid, []))
+        for a, b in zip(starts, starts[1:]):
+            if b - a < doctor.slot_minutes:
+                problems.append(f"{doctor.pid}: overlapping appointments at minute {a} and {b}")
+        if sorted(doctor.to_dict()["schedule"]) != [format_minutes(start) for start in starts]:
+            problems.append(f"{doctor.pid}: schedule does not match its scheduled appointments")
+    for pid, times in by_patient.items():
+        if len(times) != len(set(times)):
+            problems.append(f"{pid}: two appointments at the same time")
+    return problems
+
+
+def stress(args: argparse.Namespace) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = build_clinic(args.threads * 2, args.hot_doctors, Path(tmp))
+        slots = [(f"d{d}", slot_time(BOOKING_START, s)) for d in range(args.hot_doctors) for s in range(args.hot_slots)]
+        booked = [0] * args.threads
+
+        def worker(w: int) -> None:
+            rng = random.Random(args.seed + w)
+            mine: List[str] = []
+            for i in range(args.attempts):
+                roll = rng.random()
+                if roll < 0.6 or not mine:
+                    doctor_id, when = rng.choice(slots)
+                    # two threads share each patient, so patient clashes are contended as well
+                    patient_id = f"p{rng.randrange(args.threads * 2)}"
+                    if store.schedule_appointment(f"t{w}-{i}", patient_id, doctor_id, when):
+                        mine.append(f"t{w}-{i}")
+                        booked[w] += 1
+                elif roll < 0.85:
+                    store.reschedule_appointment(rng.choice(mine), rng.choice(slots)[1])
+                else:
+                    store.cancel_appointment(mine.pop(rng.randrange(len(mine))))
+
+        elapsed = run_threads(args.threads, worker)
+        problems = double_bookings(store)
+        live = {a.appt_id: a.to_dict() for a in store.appointments}
+        store.close()
+
+        reloaded = Clinic(data_dir=Path(tmp), journaled=True)
+        reloaded.load_from_files()
+        problems += [f"after replay: {p}" for p in double_bookings(reloaded)]
+        if {a.appt_id: a.to_dict() for a in reloaded.appointments} != live:
+            problems.append("journal replay does not reproduce the in-memory appointments")
+        reloaded.close()
+
+    print(
+        f"stress: {args.threads} threads x {args.attempts} operations on {len(slots)} contended slots"
+        f" in {elapsed:.2f} s, {sum(booked)} bookings accepted"
+    )
+    for problem in problems[:20]:
+        print(f"  FAIL {problem}")
+    print("  no double bookings" if not problems else f"  {len(problems)} problems")
+    return not problems
+
+
+def throughput(store: Clinic, workers: int, bookings: int, global_lock: bool) -> float:
+    n_doctors = len(store.doctors)
+    n_patients = len(store.patients)
+
+    def worker(w: int) -> None:
+        for n in range(w, bookings, workers):
+            # booking n: its own doctor/slot pair, so no attempt is rejected
+            args = (f"b{n}", f"p{n % n_patients}", f"d{n % n_doctors}", slot_time(BOOKING_START, n // n_doctors))
+            if global_lock:
+                with store.lock:
+                    store.schedule_appointment(*args)
+            else:
+                store.schedule_appointment(*args)
+
+    elapsed = run_threads(workers, worker)
+    if len(store.appointments) != bookings:
+        raise RuntimeError(f"expected {bookings} bookings, got {len(store.appointments)}")
+    return bookings / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16, help="threads in the stress check")
+    parser.add_argument("--attempts", type=int, default=2000, help="operations per stress thread")
+    parser.add_argument("--hot-doctors", type=int, default=4)
+    parser.add_argument("--hot-slots", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--bookings", type=int, default=4000)
+    parser.add_argument("--no-fsync", action="store_true", help="journal without fsync (CPU bound)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    audit.set_sink(NullSink())
+
+    ok = stress(args)
+
+    print(f"\nbookings/s on a journaled store (fsync {'off' if args.no_fsync else 'on'})")
+    print(f"{'workers':>7}  {'per-key locks':>13}  {'global lock':>11}")
+    for workers in args.workers:
+        rates = []
+        for global_lock in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                store = build_clinic(1000, 50, Path(tmp))
+                if args.no_fsync:
+                    store.journal.fsync = False
+                rates.append(throughput(store, workers, args.bookings, global_lock))
+                store.close()
+        print(f"{workers:>7}  {rates[0]:>13.0f}  {rates[1]:>11.0f}")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Cost of save_to_files after a single change, per data format.
+
+The first save of each store writes everything (what every save did before
+dirty tracking); after that each mutation is followed by one save, which
+only rewrites the files or shards holding what changed.
+Run from the project folder: ``python -m benchmarks.dirty_save``
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import audit
+from audit import NullSink
+from benchmarks.booking import BOOKING_START, build_clinic, slot_time
+from clinic import DATA_FORMATS, Clinic
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--mutations", type=int, default=20)
+    parser.add_argument("--formats", nargs="+", choices=DATA_FORMATS, default=list(DATA_FORMATS))
+    parser.add_argument("--shards", type=int, default=256)
+    args = parser.parse_args()
+    audit.set_sink(NullSink())
+
+    source = build_clinic(args.size)
+    print(f"{args.size} appointments, {args.mutations} mutations per format")
+    print(f"{'format':>8}  {'full save s':>11}  {'cancel + save ms':>16}  {'booking + save ms':>17}")
+    for n, data_format in enumerate(args.formats):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = Clinic(data_dir=Path(tmp), data_format=data_format, shards=args.shards, fresh_start=True)
+            store.patients, store.doctors, store.appointments = source.patients, source.doctors, source.appointments
+            started = time.perf_counter()
+            store.save_to_files()
+            full = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for i in range(args.mutations):
+                store.cancel_appointment(f"h{i * 7919 % args.size}")
+                store.save_to_files()
+            cancel = (time.perf_counter() - started) / args.mutations
+
+            n_patients, n_doctors = len(store.patients), len(store.doctors)
+            started = time.perf_counter()
+            for i in range(args.mutations):
+                # the formats share the source objects, so each books its own slots
+                when = slot_time(BOOKING_START, n * args.mutations + i)
+                if not store.schedule_appointment(f"{data_format}{i}", f"p{i % n_patients}", f"d{i % n_doctors}", when):
+                    raise SystemExit(f"booking {i} failed")
+                store.save_to_files()
+            booking = (time.perf_counter() - started) / args.mutations
+            store.close()
+        print(f"{data_format:>8}  {full:>11.2f}  {cancel * 1e3:>16.1f}  {booking * 1e3:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
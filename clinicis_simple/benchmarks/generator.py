@@ -0,0 +1,90 @@
+"""Seeded synthetic clinic data: patients, doctors across specialties and a realistic appointment mix.
+
+The same arguments and seed always give the same store. Appointments fill
+each doctor's half-hour slots of 08:00-16:00, day after day, so no doctor or
+patient is double-booked; the first ``past_share`` of them lie before ``now`` and are
+mostly completed, the rest are mostly upcoming.
+"""
+import random
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Set
+
+from appointment_store import AppointmentStore
+from benchmarks.search import make_names
+from clinic import Clinic
+from models import Appointment, Doctor, Patient
+from schedule import MINUTES_PER_DAY, format_minutes, parse_datetime, to_minutes
+
+SPECIALTIES = ["GP", "Pediatrics", "Cardiology", "Dermatology", "Orthopedics", "Gynecology", "ENT", "Ophthalmology"]
+# (status, weight) before and after "now"; past no-shows stay "scheduled"
+PAST_STATUSES = (("completed", 85), ("cancelled", 10), ("scheduled", 5))
+FUTURE_STATUSES = (("scheduled", 92), ("cancelled", 8))
+NOTES = ["Routine check", "Blood test ordered", "Prescription renewed", "Referred to specialist", "Follow-up in 3 months"]
+FIRST_DAY = to_minutes(parse_datetime("2024-01-01 00:00"))
+DAY_START = 8 * 60
+SLOTS_PER_DAY = 16
+SLOT_MINUTES = 30
+
+
+class SyntheticClinic(NamedTuple):
+    store: Clinic
+    now: int  # schedule minutes; appointments before it are history
+    free_from: int  # the first day on which no doctor has any appointment
+
+
+def slot_minutes(slot: int) -> int:
+    """Start (schedule minutes) of a doctor's ``slot``-th working slot."""
+    day, index = divmod(slot, SLOTS_PER_DAY)
+    return FIRST_DAY + day * MINUTES_PER_DAY + DAY_START + index * SLOT_MINUTES
+
+
+def generate(
+    patients: int,
+    doctors: int,
+    appointments: int,
+    seed: int = 1,
+    past_share: float = 0.85,
+    data_dir: Optional[Path] = None,
+    **clinic_options,
+) -> SyntheticClinic:
+    rng = random.Random(seed)
+    first_names = make_names(rng, 3_000, 2)
+    last_names = make_names(rng, 30_000, 3)
+    patient_rows: Dict[str, Patient] = {}
+    doctor_rows: Dict[str, Doctor] = {}
+    appointment_rows = AppointmentStore()
+    for i in range(patients):
+        name = f"{rng.choice(first_names)} {rng.choice(last_names)}"
+        patient_rows[f"p{i}"] = Patient(f"p{i}", name, f"05{rng.randrange(10**8):08d}")
+    for i in range(doctors):
+        specialty = SPECIALTIES[i % len(SPECIALTIES)]
+        doctor_rows[f"d{i}"] = Doctor(f"d{i}", f"Dr. {rng.choice(last_names)}", f"03{rng.randrange(10**7):07d}", specialty)
+
+    past_statuses, past_weights = zip(*PAST_STATUSES)
+    future_statuses, future_weights = zip(*FUTURE_STATUSES)
+    slots = -(-appointments // doctors)
+    now = slot_minutes(int(slots * past_share))
+    booked: Set[int] = set()  # patients already seen at the current time
+    for i in range(appointments):
+        when = slot_minutes(i // doctors)
+        if i % doctors == 0:
+            booked.clear()
+        patient = rng.randrange(patients)
+        # nobody is in two rooms at once, as long as there are more patients than doctors
+        while patient in booked and len(booked) < patients:
+            patient = rng.randrange(patients)
+        booked.add(patient)
+        doctor = doctor_rows[f"d{i % doctors}"]
+        if when < now:
+            status = rng.choices(past_statuses, past_weights)[0]
+        else:
+            status = rng.choices(future_statuses, future_weights)[0]
+        summary = rng.choice(NOTES) if status == "completed" else ""
+        appointment_rows.add(Appointment(f"a{i}", f"p{patient}", doctor.pid, when, status, summary))
+        if status != "cancelled":
+            doctor.schedule.add(format_minutes(when))
+    # new containers, as a load would build them; the first save writes them in full
+    store = Clinic(data_dir=data_dir, **clinic_options)
+    store.patients, store.doctors, store.appointments = patient_rows, doctor_rows, appointment_rows
+    free_from = FIRST_DAY + (slots // SLOTS_PER_DAY + 1) * MINUTES_PER_DAY
+    return SyntheticClinic(store, now, free_from)
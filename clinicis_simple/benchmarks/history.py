@@ -0,0 +1,118 @@
+"""Visit histories: notes inside patients.json vs. the memory-mapped visits.log.
+
+Reports peak memory of load_from_files (each in a fresh interpreter), the
+cost of reading one patient's latest page and of completing an appointment.
+Run from the project folder: ``python -m benchmarks.history``
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import audit
+from audit import NullSink
+from benchmarks.booking import BOOKING_START, slot_time
+from benchmarks.load_memory import peak_memory_mb
+from clinic import Clinic
+from jsonstream import iter_records, write_records
+from models import Doctor, Patient
+
+DEFAULT_VISITS = [10, 100]
+NOTE = "Routine check, blood pressure normal, follow-up in 3 months ({})"
+
+
+def write_legacy_files(data_dir: Path, patients: int, visits: int) -> None:
+    """patients.json with every note inline, as save_to_files wrote it before visits.log."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    rows = (
+        {"pid": f"p{i}", "name": f"Patient {i}", "phone": f"050-{i:07d}", "visits": [NOTE.format(v) for v in range(visits)]}
+        for i in range(patients)
+    )
+    write_records(data_dir / "patients.json", rows, indent=None, fsync=False)
+    write_records(data_dir / "doctors.json", [Doctor("d0", "Dr. 0", "03-0000000", "GP").to_dict()], fsync=False)
+    write_records(data_dir / "appointments.json", [], fsync=False)
+
+
+def child(mode: str, data_dir: Path) -> None:
+    if mode == "inline":
+        # the old model: every note is a str on its Patient
+        patients = {p["pid"]: Patient.from_dict(p) for p in iter_records(data_dir / "patients.json")}
+    else:
+        store = Clinic(data_dir=data_dir, fsync=False)
+        store.load_from_files()
+        patients = store.patients
+    print(json.dumps({"peak_mb": peak_memory_mb(), "patients": len(patients)}))
+
+
+def measure(mode: str, data_dir: Path) -> float:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.history", "--child", mode, str(data_dir)],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).resolve().parent.parent,
+    ).stdout
+    return json.loads(out.splitlines()[-1])["peak_mb"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--visits", type=int, nargs="+", default=DEFAULT_VISITS, help="notes per patient")
+    parser.add_argument("--completions", type=int, default=1000)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DATA_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], Path(args.child[1]))
+        return
+    audit.set_sink(NullSink())
+
+    print(
+        f"{'notes':>9}  {'inline peak MB':>14}  {'log peak MB':>11}  {'log file MB':>11}"
+        f"  {'page of 10 us':>13}  {'complete us':>11}  {'+fsync us':>9}"
+    )
+    for visits in args.visits:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_dir = Path(tmp)
+            write_legacy_files(data_dir, args.patients, visits)
+            inline = measure("inline", data_dir)
+            # the first load moves the notes into visits.log; the save drops them from patients.json
+            store = Clinic(data_dir=data_dir, fsync=False)
+            store.load_from_files()
+            store.save_to_files()
+            store.close()
+            mapped = measure("history", data_dir)
+            log_mb = (data_dir / "visits.log").stat().st_size / 2**20
+
+            store = Clinic(data_dir=data_dir, fsync=False)
+            store.load_from_files()
+            started = time.perf_counter()
+            for i in range(args.completions):
+                patient = store.patients[f"p{i * 7919 % args.patients}"]
+                patient.get_history(max(len(patient.visits) - 10, 0), 10)
+            page = (time.perf_counter() - started) / args.completions
+
+            per_complete = []
+            for fsync in (False, True):
+                store.history.fsync = fsync
+                ids = [f"x{fsync:d}{i}" for i in range(args.completions)]
+                first_slot = fsync * args.completions
+                for i, appt_id in enumerate(ids):
+                    when = slot_time(BOOKING_START, first_slot + i)
+                    store.schedule_appointment(appt_id, f"p{i % args.patients}", "d0", when)
+                started = time.perf_counter()
+                for appt_id in ids:
+                    store.complete_appointment(appt_id, "Routine check")
+                per_complete.append((time.perf_counter() - started) / len(ids))
+            store.close()
+        print(
+            f"{args.patients * visits:>9}  {inline:>14.1f}  {mapped:>11.1f}  {log_mb:>11.1f}"
+            f"  {page * 1e6:>13.1f}  {per_complete[0] * 1e6:>11.1f}  {per_complete[1] * 1e6:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
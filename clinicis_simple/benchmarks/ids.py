@@ -0,0 +1,67 @@
+"""Appointment id allocation: the old max-scan vs. Clinic.next_appt_id.
+
+Also checks that several processes sharing one data directory never get
+the same id. Run from the project folder: ``python -m benchmarks.ids``
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks.booking import build_clinic
+from clinic import Clinic
+from id_allocator import max_numbered_id
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def scan_next_id(store: Clinic) -> str:
+    """What ClinicGUI._next_appt_id did: parse every id, take the max."""
+    return f"a{max_numbered_id((a.appt_id for a in store.appointments), 'a') + 1}"
+
+
+def allocate(data_dir: str, count: int) -> List[str]:
+    store = Clinic(data_dir=Path(data_dir))
+    ids = [store.next_appt_id() for _ in range(count)]
+    store.close()
+    return ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--per-process", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'appointments':>12}  {'scan us/id':>10}  {'allocator us/id':>15}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = build_clinic(size, data_dir=Path(tmp))
+            started = time.perf_counter()
+            for _ in range(args.calls):
+                scan_next_id(store)
+            scan = (time.perf_counter() - started) / args.calls
+            store.next_appt_id()  # first call seeds the counter file from the existing ids
+            started = time.perf_counter()
+            for _ in range(args.calls * 100):
+                store.next_appt_id()
+            allocator = (time.perf_counter() - started) / (args.calls * 100)
+            store.close()
+        print(f"{size:>12}  {scan * 1e6:>10.1f}  {allocator * 1e6:>15.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with multiprocessing.Pool(args.processes) as pool:
+            batches = pool.starmap(allocate, [(tmp, args.per_process)] * args.processes)
+    ids = [appt_id for batch in batches for appt_id in batch]
+    duplicates = len(ids) - len(set(ids))
+    print(f"\n{args.processes} processes x {args.per_process} ids on one data directory: {duplicates} duplicates")
+    if duplicates:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
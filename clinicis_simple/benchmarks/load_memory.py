@@ -0,0 +1,89 @@
+"""Peak memory of load_from_files: whole-file json.loads vs. the streaming loader.
+
+Each measurement runs in a fresh interpreter so peaks do not mix.
+Run from the project folder: ``python -m benchmarks.load_memory``
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from appointment_store import AppointmentStore
+from benchmarks.booking import build_clinic
+from clinic import Clinic
+from models import Appointment, Doctor, Patient
+
+DEFAULT_SIZES = [10_000, 100_000, 300_000]
+
+
+def peak_memory_mb() -> float:
+    """Peak RSS of this process (VmHWM); the Python heap peak where /proc is missing."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return tracemalloc.get_traced_memory()[1] / 2**20
+
+
+def load_whole_file(store: Clinic) -> None:
+    """The pre-streaming loader: file text, parsed list and objects all alive at once."""
+    data_dir = store.data_dir
+    patients = json.loads((data_dir / "patients.json").read_text(encoding="utf-8"))
+    store.patients = {p["pid"]: Patient(**p) for p in patients}
+    doctors = json.loads((data_dir / "doctors.json").read_text(encoding="utf-8"))
+    store.doctors = {d["pid"]: Doctor(**d) for d in doctors}
+    appts = json.loads((data_dir / "appointments.json").read_text(encoding="utf-8"))
+    store.appointments = AppointmentStore(Appointment.from_dict(a) for a in appts)
+
+
+def child(mode: str, data_dir: Path) -> None:
+    if not Path("/proc/self/status").exists():
+        tracemalloc.start()
+    store = Clinic(data_dir=data_dir)
+    if mode == "whole":
+        load_whole_file(store)
+    elif mode == "stream":
+        store.load_from_files()
+    print(json.dumps({"peak_mb": peak_memory_mb(), "appointments": len(store.appointments)}))
+
+
+def measure(mode: str, data_dir: Path) -> float:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.load_memory", "--child", mode, str(data_dir)],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).resolve().parent.parent,
+    ).stdout
+    return json.loads(out.splitlines()[-1])["peak_mb"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DATA_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], Path(args.child[1]))
+        return
+
+    print(f"{'appointments':>12}  {'file MB':>8}  {'whole-file MB':>13}  {'streaming MB':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_dir = Path(tmp)
+            build_clinic(size, data_dir=data_dir).save_to_files()
+            file_mb = sum(p.stat().st_size for p in data_dir.glob("*.json")) / 2**20
+            baseline = measure("none", data_dir)
+            whole = measure("whole", data_dir) - baseline
+            stream = measure("stream", data_dir) - baseline
+            print(f"{size:>12}  {file_mb:>8.1f}  {whole:>13.1f}  {stream:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
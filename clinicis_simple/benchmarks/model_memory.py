@@ -0,0 +1,68 @@
+"""Memory held by 1M appointments: __dict__ objects vs. slotted Appointment vs. AppointmentTable.
+
+Run from the project folder: ``python -m benchmarks.model_memory``
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Callable, Iterator, Tuple
+
+from benchmarks.booking import HISTORY_START, slot_time
+from models import Appointment, AppointmentTable
+
+DEFAULT_COUNT = 1_000_000
+
+
+class DictAppointment:
+    """The pre-slots Appointment layout: a per-instance __dict__ and plain strings."""
+
+    def __init__(self, appt_id, patient_id, doctor_id, datetime_str, status="scheduled", summary=""):
+        self.appt_id = appt_id
+        self.patient_id = patient_id
+        self.doctor_id = doctor_id
+        self.datetime_str = datetime_str
+        self.status = status
+        self.summary = summary
+        self.patient_obj = None
+        self.doctor_obj = None
+
+
+def rows(count: int) -> Iterator[Tuple[str, str, str, str, str]]:
+    # every string is built fresh per row, as it would be when parsed from a file
+    for i in range(count):
+        yield f"a{i}", f"p{i % 10_000}", f"d{i % 200}", slot_time(HISTORY_START, i), "".join("completed")
+
+
+def measure(build: Callable[[], object]) -> Tuple[float, float]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    held = build()
+    elapsed = time.perf_counter() - started
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return current / 2**20, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT)
+    args = parser.parse_args()
+
+    count = args.count
+    layouts = [
+        ("__dict__ objects", lambda: [DictAppointment(*row) for row in rows(count)]),
+        ("slotted Appointment", lambda: [Appointment(*row) for row in rows(count)]),
+        ("AppointmentTable", lambda: AppointmentTable(Appointment(*row) for row in rows(count))),
+    ]
+    print(f"{count} appointments")
+    print(f"{'layout':>20}  {'MB':>8}  {'bytes/appt':>10}  {'build s':>8}")
+    for name, build in layouts:
+        mb, elapsed = measure(build)
+        print(f"{name:>20}  {mb:>8.1f}  {mb * 2**20 / count:>10.0f}  {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Bulk jobs (double-booking validation, schedule rebuild, agenda export) by number of pool workers.
+
+Each job runs once per worker count on the same generated store; the
+results must be identical for every count. Speedup is relative to one
+worker, which runs in-process without a pool.
+Run from the project folder: ``python -m benchmarks.parallel``
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import audit
+from audit import NullSink
+from benchmarks.generator import generate
+
+
+def main() -> None:
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, cores}))
+    args = parser.parse_args()
+    audit.set_sink(NullSink())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = generate(max(100, args.size // 5), max(8, args.size // 2000), args.size, data_dir=Path(tmp), fsync=False)
+        store = data.store
+        store.save_to_files()  # so rebuild_schedules only saves the doctors it changes
+        jobs = {
+            "validate": lambda workers: store.validate_appointments(workers),
+            "schedules": lambda workers: store.rebuild_schedules(workers),
+            "agendas": lambda workers: store.export_agendas(Path(tmp) / "agendas", workers),
+        }
+        print(f"{args.size} appointments, {len(store.doctors)} doctors, {cores} cores")
+        print(f"{'job':>10}  {'workers':>7}  {'seconds':>8}  {'speedup':>7}")
+        for name, job in jobs.items():
+            baseline = expected = None
+            for workers in args.workers:
+                started = time.perf_counter()
+                result = job(workers)
+                took = time.perf_counter() - started
+                if expected is None:
+                    baseline, expected = took, result
+                elif result != expected:
+                    raise SystemExit(f"{name} with {workers} workers gave a different result")
+                print(f"{name:>10}  {workers:>7}  {took:>8.2f}  {baseline / took:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Per-mutation write cost: full JSON rewrite vs. journaled append.
+
+Run from the project folder: ``python -m benchmarks.persistence``
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.booking import BOOKING_START, build_clinic, slot_time
+from clinic import Clinic
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def time_mutations(store: Clinic, count: int) -> float:
+    """Return mean seconds per schedule_appointment + save_to_files, the GUI's click path."""
+    n_patients, n_doctors = len(store.patients), len(store.doctors)
+    start = time.perf_counter()
+    for i in range(count):
+        store.schedule_appointment(f"b{i}", f"p{i % n_patients}", f"d{i % n_doctors}", slot_time(BOOKING_START, i))
+        store.save_to_files()
+    return (time.perf_counter() - start) / count
+
+
+def run(size: int, count: int, journaled: bool, fsync: bool) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        build_clinic(size, data_dir=Path(tmp)).save_to_files()
+        store = Clinic(data_dir=Path(tmp), journaled=journaled, fsync=fsync)
+        store.load_from_files()
+        try:
+            return time_mutations(store, count)
+        finally:
+            store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--mutations", type=int, default=50)
+    parser.add_argument("--no-fsync", action="store_true", help="skip fsync on journal appends")
+    args = parser.parse_args()
+
+    print(f"{'appointments':>12}  {'rewrite ms':>10}  {'journal ms':>10}")
+    for size in args.sizes:
+        rewrite = run(size, args.mutations, journaled=False, fsync=not args.no_fsync)
+        journal = run(size, args.mutations, journaled=True, fsync=not args.no_fsync)
+        print(f"{size:>12}  {rewrite * 1e3:>10.3f}  {journal * 1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
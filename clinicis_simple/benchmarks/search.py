@@ -0,0 +1,86 @@
+"""Patient search latency: search index vs. the old linear casefold scan.
+
+Every prefix of each query is searched, the way search-as-you-type sends them.
+Run from the project folder: ``python -m benchmarks.search``
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import List
+
+from clinic import Clinic
+from models import Patient
+
+SYLLABLES = ["ba", "ko", "ri", "na", "el", "sha", "mi", "to", "da", "lev", "yo", "ra", "av", "im", "gal", "or"]
+
+
+def make_names(rng: random.Random, count: int, syllables: int) -> List[str]:
+    return sorted({"".join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize() for _ in range(count)})
+
+
+def build_clinic(n_patients: int, seed: int = 1) -> Clinic:
+    rng = random.Random(seed)
+    first = make_names(rng, 3_000, 2)
+    last = make_names(rng, 30_000, 3)
+    store = Clinic()
+    for i in range(n_patients):
+        name = f"{rng.choice(first)} {rng.choice(last)}"
+        store.add_patient(Patient(f"p{i}", name, f"05{rng.randrange(10**8):08d}"))
+    return store
+
+
+def linear_search(store: Clinic, query: str) -> List[Patient]:
+    """What ClinicGUI._on_search did before: exact id, else a scan for the exact full name."""
+    patient = store.patients.get(query)
+    if patient:
+        return [patient]
+    q = query.casefold()
+    return [p for p in store.patients.values() if p.name.casefold() == q]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    store = build_clinic(args.patients)
+    sample = [store.patients[f"p{i}"] for i in range(0, args.patients, max(1, args.patients // 20))]
+
+    started = time.perf_counter()
+    store.search_patients("warm up")
+    print(f"{args.patients} patients, index built in {time.perf_counter() - started:.2f} s")
+
+    typo = {}
+    for patient in sample:
+        first, last = patient.name.split()
+        typo[patient.pid] = f"{first} {last[:2]}{last[3]}{last[2]}{last[4:]}"  # swapped letters
+    cases = {
+        "typing a full name": [p.name for p in sample],
+        "typing a last name": [p.name.split()[1] for p in sample],
+        "typo in last name": list(typo.values()),
+        "phone number": [p.phone for p in sample],
+    }
+    for label, queries in cases.items():
+        timings = []
+        for query in queries:
+            for end in range(1, len(query) + 1):
+                started = time.perf_counter()
+                store.search_patients(query[:end])
+                timings.append((time.perf_counter() - started) * 1000)
+        print(
+            f"{label:>20}: {len(timings)} keystrokes, median {statistics.median(timings):.2f} ms,"
+            f" p99 {sorted(timings)[int(len(timings) * 0.99)]:.2f} ms, max {max(timings):.2f} ms"
+        )
+    found = sum(hit.pid == pid for pid, query in typo.items() for hit in store.search_patients(query))
+    print(f"typo queries that still find their patient: {found}/{len(typo)}")
+
+    started = time.perf_counter()
+    for patient in sample:
+        linear_search(store, patient.name)
+    per_query = (time.perf_counter() - started) / len(sample) * 1000
+    print(f"old linear full-name scan: {per_query:.1f} ms per query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Load generator for service.py: requests per second and p50/p99 latency.
+
+Starts a local service on a temporary data directory, then runs keep-alive
+clients that mix reads (search, free slots, appointment lookups) with
+bookings. Run from the project folder: ``python -m benchmarks.service_load``
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.booking import BOOKING_START, slot_time
+from clinic import Clinic
+from models import Doctor, Patient
+
+SPECIALTIES = ["GP", "Derm", "Cardio", "Ortho"]
+
+
+def prepare(data_dir: Path, n_patients: int, n_doctors: int) -> None:
+    store = Clinic(data_dir=data_dir)
+    for i in range(n_patients):
+        store.add_patient(Patient(f"p{i}", f"Patient {i}", f"050-{i:07d}"))
+    for i in range(n_doctors):
+        store.add_doctor(Doctor(f"d{i}", f"Dr. {i}", f"03-{i:07d}", SPECIALTIES[i % len(SPECIALTIES)]))
+    store.save_to_files()
+
+
+async def request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, path: str, body: Optional[dict] = None
+) -> Tuple[int, object]:
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(
+    worker: int, port: int, deadline: float, args: argparse.Namespace, latencies: Dict[str, List[float]]
+) -> None:
+    rng = random.Random(args.seed + worker)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    booked: List[str] = []
+    n = 0
+    while time.perf_counter() < deadline:
+        roll = rng.random()
+        if roll < args.write_ratio:
+            kind = "book"
+            n += 1
+            appt_id = f"w{worker}-{n}"
+            body = {
+                "appt_id": appt_id,
+                "patient_id": f"p{rng.randrange(args.patients)}",
+                "doctor_id": f"d{rng.randrange(args.doctors)}",
+                "datetime": slot_time(BOOKING_START, rng.randrange(20_000)),
+            }
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, "POST", "/appointments", body)
+            if status == 201:
+                booked.append(appt_id)
+        else:
+            kind = rng.choice(["search", "free-slots", "lookup"])
+            if kind == "search":
+                path = f"/patients/search?q=Patient+{rng.randrange(args.patients)}&limit=5"
+            elif kind == "free-slots":
+                path = f"/free-slots?specialty={rng.choice(SPECIALTIES)}&count=5&start=2030-06-01+08:00&days=14"
+            else:
+                path = f"/appointments/{rng.choice(booked) if booked else 'missing'}"
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, "GET", path)
+        latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+    writer.close()
+
+
+async def run_load(port: int, args: argparse.Namespace) -> Tuple[Dict[str, List[float]], float]:
+    latencies: Dict[str, List[float]] = {}
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    await asyncio.gather(*(client(i, port, deadline, args, latencies) for i in range(args.clients)))
+    return latencies, time.perf_counter() - started
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["json", "journal", "sqlite"], default="journal")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--doctors", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parent.parent
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        prepare(data_dir, args.patients, args.doctors)
+        command = [sys.executable, "service.py", "--port", "0", "--data-dir", str(data_dir)]
+        if args.mode == "journal":
+            command.append("--journaled")
+        elif args.mode == "sqlite":
+            migrate = [sys.executable, "sqlite_storage.py", "--data-dir", str(data_dir), "--db", str(data_dir / "clinic.db")]
+            subprocess.run(migrate, cwd=root, check=True, capture_output=True)
+            command += ["--db", str(data_dir / "clinic.db")]
+        server = subprocess.Popen(command, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            port = int(server.stdout.readline().rsplit(":", 1)[1])
+            # keep draining the service's output so it never blocks on a full pipe
+            threading.Thread(target=server.stdout.read, daemon=True).start()
+            latencies, elapsed = asyncio.run(run_load(port, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"mode={args.mode} clients={args.clients} write ratio={args.write_ratio}")
+    print(f"{total} requests in {elapsed:.1f} s: {total / elapsed:.0f} req/s")
+    print(f"{'request':>12}  {'count':>7}  {'p50 ms':>7}  {'p99 ms':>7}")
+    for kind, values in sorted(latencies.items()):
+        print(f"{kind:>12}  {len(values):>7}  {statistics.median(values):>7.2f}  {percentile(values, 0.99):>7.2f}")
+    everything = [value for values in latencies.values() for value in values]
+    print(f"{'all':>12}  {len(everything):>7}  {statistics.median(everything):>7.2f}  {percentile(everything, 0.99):>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Data files on disk: the JSON files vs. the binary snapshot, per compression.
+
+For each size reports file size, save time, the time to open the file and
+read one appointment, and the time for a full load_from_files.
+Run from the project folder: ``python -m benchmarks.snapshot``
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.booking import build_clinic
+from binary_snapshot import COMPRESSION, SNAPSHOT_FILE, SnapshotReader
+from clinic import Clinic
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def timed(run: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def open_json(data_dir: Path) -> None:
+    """The JSON files have no index: reading one appointment means parsing them."""
+    store = Clinic(data_dir=data_dir)
+    store.load_from_files()
+    next(iter(store.appointments))
+
+
+def open_snapshot(path: Path) -> None:
+    with SnapshotReader(path) as reader:
+        reader.appointment(reader.appointment_count // 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    print(f"{'appointments':>12}  {'format':>12}  {'size MB':>8}  {'save s':>7}  {'open ms':>8}  {'load s':>7}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = build_clinic(size)
+            data_dir = Path(tmp) / "json"
+            store = Clinic(data_dir=data_dir, fresh_start=True)
+            store.patients, store.doctors, store.appointments = source.patients, source.doctors, source.appointments
+            save = timed(store.save_to_files)
+            mb = sum(p.stat().st_size for p in data_dir.glob("*.json")) / 2**20
+            opened = timed(lambda: open_json(data_dir))
+            loaded = timed(Clinic(data_dir=data_dir).load_from_files)
+            print(f"{size:>12}  {'json':>12}  {mb:>8.1f}  {save:>7.2f}  {opened * 1e3:>8.1f}  {loaded:>7.2f}")
+
+            for compression in COMPRESSION:
+                data_dir = Path(tmp) / compression
+                store = Clinic(data_dir=data_dir, data_format="binary", compression=compression, fresh_start=True)
+                store.patients, store.doctors, store.appointments = source.patients, source.doctors, source.appointments
+                save = timed(store.save_to_files)
+                mb = (data_dir / SNAPSHOT_FILE).stat().st_size / 2**20
+                opened = timed(lambda: open_snapshot(data_dir / SNAPSHOT_FILE))
+                reader = Clinic(data_dir=data_dir, data_format="binary", compression=compression)
+                loaded = timed(reader.load_from_files)
+                if len(reader.appointments) != size:
+                    raise SystemExit(f"{compression}: loaded {len(reader.appointments)} of {size} appointments")
+                label = f"binary/{compression}"
+                print(f"{size:>12}  {label:>12}  {mb:>8.1f}  {save:>7.2f}  {opened * 1e3:>8.1f}  {loaded:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Timed Clinic scenarios on seeded synthetic data, swept over sizes, with JSON results.
+
+Each size runs in a fresh interpreter on a store from benchmarks.generator.
+Every scenario reports its wall time, the mean per operation and the peak
+RSS reached while it ran (the kernel's peak counter is reset before each
+scenario where Linux allows it; elsewhere the peak is the process's so far).
+``--output`` writes the results as JSON and ``--compare`` checks them
+against an earlier file, exiting with status 1 if a scenario got slower
+than ``--threshold``.
+Run from the project folder: ``python -m benchmarks.suite --output results.json``
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import audit
+from audit import NullSink
+from benchmarks.generator import SLOT_MINUTES, SyntheticClinic, generate
+from benchmarks.load_memory import peak_memory_mb
+from clinic import DATA_FORMATS, Clinic
+from schedule import format_minutes
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+RESULTS_VERSION = 1
+
+
+def reset_peak_memory() -> bool:
+    """Restart the peak RSS counter (VmHWM); False where the kernel does not allow it."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class Scenarios:
+    """The timed operations; each method runs up to ``ops`` of them and returns how many it ran."""
+
+    def __init__(self, data: SyntheticClinic, ops: int, seed: int, data_dir: Path, data_format: str) -> None:
+        self.store = data.store
+        self.data = data
+        self.ops = ops
+        self.rng = random.Random(seed)
+        self.data_dir = data_dir
+        self.data_format = data_format
+        self._fresh = 0
+        # upcoming bookings, split between the reschedule and cancel scenarios
+        self.upcoming = [
+            appt.appt_id for appt in self.store.appointments if appt.status == "scheduled" and appt.slot_key >= data.now
+        ]
+        self.rng.shuffle(self.upcoming)
+
+    def fresh_time(self) -> str:
+        """A time no doctor or patient has anything at yet."""
+        self._fresh += 1
+        return format_minutes(self.data.free_from + self._fresh * SLOT_MINUTES)
+
+    def setup(self, name: str) -> Callable[[], int]:
+        """Prepare the scenario's inputs untimed and return the timed part."""
+        return getattr(self, f"_{name}")()
+
+    def _find(self) -> Callable[[], int]:
+        # about one lookup in ten misses
+        ids = [f"a{self.rng.randrange(len(self.store.appointments) * 11 // 10)}" for _ in range(self.ops)]
+        find = self.store._find
+
+        def run() -> int:
+            for appt_id in ids:
+                find(appt_id)
+            return len(ids)
+
+        return run
+
+    def _search(self) -> Callable[[], int]:
+        names = [patient.name for patient in self.rng.sample(list(self.store.patients.values()), 50)]
+        queries = [name[:length] for name in names for length in (2, 4, 6, len(name))]
+        queries = (queries * (self.ops // len(queries) + 1))[: self.ops]
+        self.store.search_patients("warm-up")  # builds the index
+        search = self.store.search_patients
+
+        def run() -> int:
+            for query in queries:
+                search(query)
+            return len(queries)
+
+        return run
+
+    def _schedule(self) -> Callable[[], int]:
+        patients, doctors = list(self.store.patients), list(self.store.doctors)
+        rows = [(f"s{i}", patients[i % len(patients)], doctors[i % len(doctors)], self.fresh_time()) for i in range(self.ops)]
+
+        def run() -> int:
+            for row in rows:
+                if not self.store.schedule_appointment(*row):
+                    raise SystemExit(f"booking {row} failed")
+            return len(rows)
+
+        return run
+
+    def _reschedule(self) -> Callable[[], int]:
+        moves = [(appt_id, self.fresh_time()) for appt_id in self.upcoming[: min(self.ops, len(self.upcoming) // 2)]]
+
+        def run() -> int:
+            for appt_id, when in moves:
+                if not self.store.reschedule_appointment(appt_id, when):
+                    raise SystemExit(f"rescheduling {appt_id} failed")
+            return len(moves)
+
+        return run
+
+    def _cancel(self) -> Callable[[], int]:
+        half = len(self.upcoming) // 2
+        ids = self.upcoming[half : half + min(self.ops, half)]
+
+        def run() -> int:
+            for appt_id in ids:
+                if not self.store.cancel_appointment(appt_id):
+                    raise SystemExit(f"cancelling {appt_id} failed")
+            return len(ids)
+
+        return run
+
+    def _delete(self) -> Callable[[], int]:
+        ids = [appt.appt_id for appt in self.store.appointments]
+        ids = self.rng.sample(ids, min(self.ops, len(ids)))
+        return lambda: sum(1 for appt_id in ids if self.store.delete_appointment(appt_id))
+
+    def _save(self) -> Callable[[], int]:
+        def run() -> int:
+            # the generated containers were never saved, so this writes everything
+            self.store.save_to_files()
+            return 1
+
+        return run
+
+    def _load(self) -> Callable[[], int]:
+        def run() -> int:
+            store = Clinic(data_dir=self.data_dir, data_format=self.data_format, fsync=False)
+            store.load_from_files()
+            store.close()
+            return 1
+
+        return run
+
+
+SCENARIOS = ["find", "search", "schedule", "reschedule", "cancel", "delete", "save", "load"]
+
+
+def run_size(size: int, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    patients = args.patients or max(100, size // 5)
+    doctors = args.doctors or max(8, size // 2000)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        data = generate(
+            patients, doctors, size, seed=args.seed, data_dir=Path(tmp), data_format=args.format, fsync=False, fresh_start=True
+        )
+        results.append(_result(size, "generate", 1, time.perf_counter() - started, peak_memory_mb()))
+        scenarios = Scenarios(data, args.ops, args.seed, Path(tmp), args.format)
+        for name in args.scenarios:
+            run = scenarios.setup(name)
+            reset_peak_memory()
+            started = time.perf_counter()
+            ops = run()
+            results.append(_result(size, name, ops, time.perf_counter() - started, peak_memory_mb()))
+        data.store.close()
+    return results
+
+
+def _result(size: int, scenario: str, ops: int, seconds: float, peak_mb: float) -> Dict[str, Any]:
+    per_op = seconds / ops * 1e6 if ops else None
+    return {"size": size, "scenario": scenario, "ops": ops, "seconds": seconds, "us_per_op": per_op, "peak_mb": peak_mb}
+
+
+def measure(size: int, argv: List[str]) -> List[Dict[str, Any]]:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", *argv, "--child", str(size)],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).resolve().parent.parent,
+    ).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path, threshold: float) -> List[Tuple[int, str, float]]:
+    """(size, scenario, new/old time per op) of every scenario more than ``threshold`` slower."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    old = {(row["size"], row["scenario"]): row["us_per_op"] for row in baseline["results"]}
+    print(f"\ncompared with {baseline_path} ({baseline.get('created', '?')})")
+    regressions = []
+    for row in results:
+        before: Optional[float] = old.get((row["size"], row["scenario"]))
+        if not before or row["us_per_op"] is None:
+            continue
+        ratio = row["us_per_op"] / before
+        flag = "  SLOWER" if ratio > 1 + threshold else ""
+        print(f"{row['size']:>9}  {row['scenario']:>10}  {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append((row["size"], row["scenario"], ratio))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="appointments")
+    parser.add_argument("--patients", type=int, default=None, help="default: size / 5")
+    parser.add_argument("--doctors", type=int, default=None, help="default: size / 2000")
+    parser.add_argument("--ops", type=int, default=1000, help="operations per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--format", choices=DATA_FORMATS, default="json")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, default=None, help="write the results here as JSON")
+    parser.add_argument("--compare", type=Path, default=None, help="results JSON of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    audit.set_sink(NullSink())
+    if args.child:
+        print(json.dumps(run_size(args.child, args)))
+        return
+
+    argv = sys.argv[1:]
+    results: List[Dict[str, Any]] = []
+    print(f"{'size':>9}  {'scenario':>10}  {'ops':>5}  {'seconds':>8}  {'us/op':>10}  {'peak MB':>8}")
+    for size in args.sizes:
+        for row in measure(size, argv):
+            results.append(row)
+            per_op = f"{row['us_per_op']:>10.1f}" if row["us_per_op"] is not None else f"{'-':>10}"
+            print(f"{size:>9}  {row['scenario']:>10}  {row['ops']:>5}  {row['seconds']:>8.3f}  {per_op}  {row['peak_mb']:>8.1f}")
+
+    if args.output:
+        report = {
+            "version": RESULTS_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "format": args.format,
+            "seed": args.seed,
+            "peak_reset": reset_peak_memory(),  # False: peaks are cumulative per size
+            "results": results,
+        }
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nwrote {args.output}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Commits per second: one write per call vs. transactions vs. group-committed concurrent transactions.
+
+Each unit of work books a fresh appointment, moves it and cancels it
+(three mutations for one patient; completing would add a visit note,
+which visits.log syncs on its own for every transaction). It is persisted three ways on a
+generated store with fsync on: after every call (save_to_files, or one
+journal record per call), as one ``with clinic.transaction()`` per unit,
+and as transactions from ``--threads`` threads at once, whose commits
+share writes (see transactions.GroupCommit).
+Run from the project folder: ``python -m benchmarks.transactions``
+"""
+import argparse
+import itertools
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+import audit
+from audit import NullSink
+from benchmarks.generator import SLOT_MINUTES, generate
+from clinic import DATA_FORMATS
+from schedule import format_minutes
+
+MODES = [*DATA_FORMATS, "journal"]
+
+
+def run_units(units: int, threads: int, unit: Callable[[int], None]) -> float:
+    counter = itertools.count()
+
+    def worker() -> None:
+        for i in iter(lambda: next(counter), None):
+            if i >= units:
+                return
+            unit(i)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def measure(mode: str, args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        options = {"journaled": True} if mode == "journal" else {"data_format": mode}
+        data = generate(args.patients, args.doctors, args.appointments, data_dir=Path(tmp), fresh_start=True, **options)
+        store = data.store
+        # the generated containers count as changed; write them once before timing
+        store.save_to_files()
+        patients, doctors = list(store.patients), list(store.doctors)
+        times = itertools.count()
+
+        def fresh() -> str:
+            return format_minutes(data.free_from + next(times) * SLOT_MINUTES)
+
+        def steps(i: int) -> Tuple[str, str, str, str, str]:
+            return store.next_appt_id(), patients[i % len(patients)], doctors[i % len(doctors)], fresh(), fresh()
+
+        def per_call(i: int) -> None:
+            appt_id, patient_id, doctor_id, first, second = steps(i)
+            for call, call_args in (
+                (store.schedule_appointment, (appt_id, patient_id, doctor_id, first)),
+                (store.reschedule_appointment, (appt_id, second)),
+                (store.cancel_appointment, (appt_id,)),
+            ):
+                if not call(*call_args):
+                    raise SystemExit(f"{call.__name__}{call_args} failed")
+                if mode != "journal":  # a journaled store already wrote (and synced) one record
+                    store.save_to_files()
+
+        def transaction(i: int) -> None:
+            appt_id, patient_id, doctor_id, first, second = steps(i)
+            with store.transaction() as tx:
+                tx.schedule_appointment(appt_id, patient_id, doctor_id, first)
+                tx.reschedule_appointment(appt_id, second)
+                tx.cancel_appointment(appt_id)
+
+        for name, threads, unit in (
+            ("per call", 1, per_call),
+            ("transaction", 1, transaction),
+            (f"{args.threads} threads", args.threads, transaction),
+        ):
+            writes = store._commits.writes
+            seconds = run_units(args.units, threads, unit)
+            writes = store._commits.writes - writes if unit is transaction else 3 * args.units
+            print(f"{mode:>8}  {name:>12}  {args.units / seconds:>9.0f}  {writes:>7}  {seconds / writes * 1e3:>9.2f}")
+        store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["journal", "sharded", "json"])
+    parser.add_argument("--patients", type=int, default=2_000)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--appointments", type=int, default=10_000)
+    parser.add_argument("--units", type=int, default=300, help="units of work (3 mutations each) per run")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    audit.set_sink(NullSink())
+    print(f"{'mode':>8}  {'run':>12}  {'units/s':>9}  {'writes':>7}  {'ms/write':>9}")
+    for mode in args.modes:
+        measure(mode, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""Versioned binary snapshot of a whole clinic in one file.
+
+Layout (little-endian)::
+
+    header     magic "CLINSNAP", u16 version, u8 compression, u8 reserved, u32 section count
+    directory  per section: 8-byte name, 1-byte array typecode, 3 pad bytes,
+               u64 offset, u64 stored length, u64 raw length
+    sections   one typed array each, 8-byte aligned, compressed one by one
+               when the file is compressed
+
+All text lives in one string table (``str.offs`` byte offsets into the UTF-8
+``str.data`` blob), and the entity columns hold codes into it. Times are
+integer minutes; a time that is not a recognised date/time is stored as
+``-1 - code`` of its string, like AppointmentTable does. Variable-length
+fields (visits, doctor schedules) are a flat column plus an offsets column.
+
+An uncompressed file is read through mmap: SnapshotReader only parses the
+header, and columns are zero-copy views that are touched on first use.
+Compressed sections are inflated on first use.
+
+Convert the JSON files of a data folder: ``python binary_snapshot.py --compression zlib``
+"""
+import argparse
+import lzma
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from appointment_store import AppointmentStore
+from fileio import atomic_write_bytes
+from models import STATUS_CODES, STATUS_VALUES, Appointment, Doctor, Patient
+from schedule import Schedule
+
+MAGIC = b"CLINSNAP"
+VERSION = 1
+SNAPSHOT_FILE = "clinic.snap"
+
+_HEADER = struct.Struct("<8sHBxI")
+_ENTRY = struct.Struct("<8sc3xQQQ")
+_ALIGN = 8
+
+COMPRESSION = {"none": 0, "zlib": 1, "lzma": 2}
+_COMPRESS: Dict[int, Callable[[bytes], bytes]] = {1: lambda b: zlib.compress(b, 6), 2: lzma.compress}
+_DECOMPRESS: Dict[int, Callable[[bytes], bytes]] = {1: zlib.decompress, 2: lzma.decompress}
+
+# column typecodes: fixed sizes on every platform CPython supports
+_CODE = "I"  # string table code
+_MINUTES = "q"
+_OFFSET = "Q"
+_BIG_ENDIAN = sys.byteorder == "big"
+
+Column = Union[array, memoryview]
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+        self.offsets = array(_OFFSET, [0])
+        self.data = bytearray()
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.offsets) - 1
+            self.data += value.encode("utf-8")
+            self.offsets.append(len(self.data))
+        return code
+
+
+def encode(
+    patients: Iterable[Patient],
+    doctors: Iterable[Doctor],
+    appointments: Iterable[Appointment],
+    compression: str = "none",
+) -> bytes:
+    """The snapshot file contents for these entities."""
+    if compression not in COMPRESSION:
+        raise ValueError(f"unknown compression {compression!r}; use one of {', '.join(COMPRESSION)}")
+    strings = _StringTable()
+    code = strings.code
+
+    pat_id, pat_name, pat_phone = array(_CODE), array(_CODE), array(_CODE)
+    visit_offs, visits = array(_OFFSET, [0]), array(_CODE)
+    for p in patients:
+        pat_id.append(code(p.pid))
+        pat_name.append(code(p.name))
+        pat_phone.append(code(p.phone))
+        if isinstance(p.visits, list):  # attached histories stay in their HistoryStore file
+            visits.extend(map(code, p.visits))
+        visit_offs.append(len(visits))
+
+    doc_id, doc_name, doc_phone, doc_spec, doc_slot = (array(_CODE) for _ in range(5))
+    start_offs, starts = array(_OFFSET, [0]), array(_MINUTES)
+    legacy_offs, legacy = array(_OFFSET, [0]), array(_CODE)
+    for d in doctors:
+        doc_id.append(code(d.pid))
+        doc_name.append(code(d.name))
+        doc_phone.append(code(d.phone))
+        doc_spec.append(code(d.specialty))
+        doc_slot.append(d.slot_minutes)
+        doctor_starts, doctor_legacy = d.schedule.parts()
+        starts.extend(doctor_starts)
+        start_offs.append(len(starts))
+        legacy.extend(map(code, doctor_legacy))
+        legacy_offs.append(len(legacy))
+
+    apt_id, apt_pat, apt_doc, apt_sum = (array(_CODE) for _ in range(4))
+    apt_when, apt_status = array(_MINUTES), array("B")
+    for a in appointments:
+        apt_id.append(code(a.appt_id))
+        apt_pat.append(code(a.patient_id))
+        apt_doc.append(code(a.doctor_id))
+        key = a.slot_key
+        apt_when.append(key if isinstance(key, int) else -1 - code(key))
+        apt_status.append(STATUS_CODES[a.status])
+        apt_sum.append(code(a.summary))
+
+    sections: List[Tuple[str, str, bytes]] = [("str.data", "B", bytes(strings.data))]
+    columns = [
+        ("str.offs", strings.offsets),
+        ("pat.id", pat_id),
+        ("pat.name", pat_name),
+        ("pat.tel", pat_phone),
+        ("pat.voff", visit_offs),
+        ("pat.vis", visits),
+        ("doc.id", doc_id),
+        ("doc.name", doc_name),
+        ("doc.tel", doc_phone),
+        ("doc.spec", doc_spec),
+        ("doc.slot", doc_slot),
+        ("doc.soff", start_offs),
+        ("doc.beg", starts),
+        ("doc.loff", legacy_offs),
+        ("doc.leg", legacy),
+        ("apt.id", apt_id),
+        ("apt.pat", apt_pat),
+        ("apt.doc", apt_doc),
+        ("apt.when", apt_when),
+        ("apt.stat", apt_status),
+        ("apt.sum", apt_sum),
+    ]
+    for name, column in columns:
+        if _BIG_ENDIAN:
+            column = array(column.typecode, column)
+            column.byteswap()
+        sections.append((name, column.typecode, column.tobytes()))
+    return _assemble(sections, COMPRESSION[compression])
+
+
+def _assemble(sections: List[Tuple[str, str, bytes]], compression: int) -> bytes:
+    compress = _COMPRESS.get(compression)
+    stored = [(name, typecode, compress(raw) if compress else raw, len(raw)) for name, typecode, raw in sections]
+    offset = _pad(_HEADER.size + _ENTRY.size * len(stored))
+    directory, body = [], bytearray()
+    for name, typecode, data, raw_length in stored:
+        if len(name) > 8:
+            raise ValueError(f"section name {name!r} is longer than 8 bytes")
+        directory.append(_ENTRY.pack(name.encode("ascii"), typecode.encode("ascii"), offset, len(data), raw_length))
+        body += data
+        body += bytes(_pad(len(data)) - len(data))
+        offset = _pad(offset + len(data))
+    head = _HEADER.pack(MAGIC, VERSION, compression, len(stored)) + b"".join(directory)
+    return head + bytes(_pad(len(head)) - len(head)) + bytes(body)
+
+
+def _pad(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def write_snapshot(
+    path: Path,
+    patients: Iterable[Patient],
+    doctors: Iterable[Doctor],
+    appointments: Iterable[Appointment],
+    compression: str = "none",
+    fsync: bool = True,
+) -> None:
+    atomic_write_bytes(Path(path), encode(patients, doctors, appointments, compression), fsync=fsync)
+
+
+class SnapshotReader:
+    """Read access to a snapshot file; use as a context manager or call close()."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._fh = open(self.path, "rb")
+        try:
+            self._map = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._fh.close()
+            raise ValueError(f"{self.path} is not a clinic snapshot") from None
+        self._views: List[memoryview] = []
+        self._columns: Dict[str, Column] = {}
+        self._strings: Optional[List[str]] = None
+        self._codes: Optional[Dict[str, int]] = None
+        try:
+            magic, version, self.compression, count = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not a clinic snapshot")
+            if version > VERSION:
+                raise ValueError(f"{self.path} is snapshot version {version}; this code reads up to {VERSION}")
+            if self.compression not in COMPRESSION.values():
+                raise ValueError(f"{self.path} uses unknown compression {self.compression}")
+            self._sections: Dict[str, Tuple[str, int, int, int]] = {}
+            for i in range(count):
+                name, typecode, offset, stored, raw = _ENTRY.unpack_from(self._map, _HEADER.size + i * _ENTRY.size)
+                self._sections[name.rstrip(b"\0").decode("ascii")] = (typecode.decode("ascii"), offset, stored, raw)
+        except (struct.error, ValueError):
+            self.close()
+            raise
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._columns.clear()
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        if not self._map.closed:
+            self._map.close()
+        self._fh.close()
+
+    # -- columns -----------------------------------------------------------------
+
+    def column(self, name: str) -> Column:
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = self._load_column(name)
+        return column
+
+    def _load_column(self, name: str) -> Column:
+        typecode, offset, stored, raw = self._sections[name]
+        if self.compression == 0 and not _BIG_ENDIAN:
+            base = memoryview(self._map)
+            view = base[offset : offset + raw]
+            self._views += [base, view]
+            if typecode == "B":
+                return view
+            cast = view.cast(typecode)
+            self._views.append(cast)
+            return cast
+        data = self._map[offset : offset + stored]
+        if self.compression:
+            data = _DECOMPRESS[self.compression](data)
+        column = array(typecode)
+        column.frombytes(data)
+        if _BIG_ENDIAN:
+            column.byteswap()
+        return column
+
+    def string(self, code: int) -> str:
+        if self._strings is not None:
+            return self._strings[code]
+        offsets = self.column("str.offs")
+        return bytes(self.column("str.data")[offsets[code] : offsets[code + 1]]).decode("utf-8")
+
+    def strings(self) -> List[str]:
+        """The whole string table, decoded once."""
+        if self._strings is None:
+            offsets = self.column("str.offs")
+            text = bytes(self.column("str.data"))
+            self._strings = [text[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+        return self._strings
+
+    def code_of(self, value: str) -> Optional[int]:
+        """String table code of ``value``; None if the file does not contain it."""
+        if self._codes is None:
+            self._codes = {text: code for code, text in enumerate(self.strings())}
+        return self._codes.get(value)
+
+    # -- rows --------------------------------------------------------------------
+
+    @property
+    def patient_count(self) -> int:
+        return len(self.column("pat.id"))
+
+    @property
+    def doctor_count(self) -> int:
+        return len(self.column("doc.id"))
+
+    @property
+    def appointment_count(self) -> int:
+        return len(self.column("apt.id"))
+
+    def patient(self, row: int) -> Patient:
+        s, offs = self.string, self.column("pat.voff")
+        visits = self.column("pat.vis")[offs[row] : offs[row + 1]].tolist()
+        return Patient(
+            s(self.column("pat.id")[row]),
+            s(self.column("pat.name")[row]),
+            s(self.column("pat.tel")[row]),
+            [s(v) for v in visits],
+        )
+
+    def doctor(self, row: int) -> Doctor:
+        s = self.string
+        doctor = Doctor(
+            s(self.column("doc.id")[row]),
+            s(self.column("doc.name")[row]),
+            s(self.column("doc.tel")[row]),
+            s(self.column("doc.spec")[row]),
+            slot_minutes=self.column("doc.slot")[row],
+        )
+        soffs, loffs = self.column("doc.soff"), self.column("doc.loff")
+        doctor.schedule = Schedule.from_parts(
+            self.column("doc.beg")[soffs[row] : soffs[row + 1]].tolist(),
+            [s(c) for c in self.column("doc.leg")[loffs[row] : loffs[row + 1]].tolist()],
+            doctor.slot_minutes,
+        )
+        return doctor
+
+    def appointment(self, row: int) -> Appointment:
+        s = self.string
+        when = self.column("apt.when")[row]
+        return Appointment(
+            s(self.column("apt.id")[row]),
+            s(self.column("apt.pat")[row]),
+            s(self.column("apt.doc")[row]),
+            when if when >= 0 else s(-1 - when),
+            STATUS_VALUES[self.column("apt.stat")[row]],
+            s(self.column("apt.sum")[row]),
+        )
+
+    def patients(self) -> Iterator[Patient]:
+        for row in range(self.patient_count):
+            yield self.patient(row)
+
+    def doctors(self) -> Iterator[Doctor]:
+        for row in range(self.doctor_count):
+            yield self.doctor(row)
+
+    def appointments(self) -> Iterator[Appointment]:
+        """All appointments in file order, decoded column-wise (faster than appointment(row) per row)."""
+        strings = self.strings()
+        for appt_id, patient, doctor, when, status, summary in zip(
+            self.column("apt.id"),
+            self.column("apt.pat"),
+            self.column("apt.doc"),
+            self.column("apt.when"),
+            self.column("apt.stat"),
+            self.column("apt.sum"),
+        ):
+            yield Appointment(
+                strings[appt_id],
+                strings[patient],
+                strings[doctor],
+                when if when >= 0 else strings[-1 - when],
+                STATUS_VALUES[status],
+                strings[summary],
+            )
+
+    def load(self) -> Tuple[Dict[str, Patient], Dict[str, Doctor], AppointmentStore]:
+        """Every entity as the in-memory containers Clinic uses."""
+        self.strings()  # decode the table once instead of per field
+        patients = {p.pid: p for p in self.patients()}
+        doctors = {d.pid: d for d in self.doctors()}
+        return patients, doctors, AppointmentStore(self.appointments())
+
+
+def read_snapshot(path: Path) -> Tuple[Dict[str, Patient], Dict[str, Doctor], AppointmentStore]:
+    with SnapshotReader(path) as reader:
+        return reader.load()
+
+
+def main() -> None:
+    from clinic import Clinic
+
+    parser = argparse.ArgumentParser(description="Write the JSON files of a data folder as one binary snapshot")
+    parser.add_argument("--data-dir", type=Path, default=None, help="defaults to ./data next to this script")
+    parser.add_argument("--compression", choices=list(COMPRESSION), default="none")
+    parser.add_argument("--out", type=Path, default=None, help=f"defaults to {SNAPSHOT_FILE} in the data folder")
+    args = parser.parse_args()
+
+    # visits go into the snapshot, wherever --out puts it, and the data folder is only read
+    store = Clinic(data_dir=args.data_dir, visit_log=False)
+    store.load_from_files()
+    out = args.out or store.data_dir / SNAPSHOT_FILE
+    write_snapshot(out, store.patients.values(), store.doctors.values(), store.appointments, args.compression)
+    print(
+        f"Wrote {len(store.patients)} patients, {len(store.doctors)} doctors and "
+        f"{len(store.appointments)} appointments to {out} ({out.stat().st_size} bytes)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Which entities changed since the last save, so a save rewrites only what they touch.
+
+Models report their own changes (``TrackedMixin._changed``) to the tracker
+the Clinic hands them; the Clinic and AppointmentStore report additions and
+deletions. A kind is marked "full" when its file has to be rewritten as a
+whole: before the first load or save, after a failed write, or when code
+swaps in a new container.
+"""
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+KINDS = ("patients", "doctors", "appointments")
+
+
+class DirtyTracker:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.full: Set[str] = set(KINDS)
+        self.changed: Dict[str, Set[str]] = {kind: set() for kind in KINDS}
+
+    def mark(self, kind: str, key: str) -> None:
+        """``key`` (a pid or appt_id) was added, changed or deleted."""
+        self.changed[kind].add(key)
+
+    def mark_full(self, kinds: Optional[Iterable[str]] = None) -> None:
+        with self._lock:
+            self.full.update(KINDS if kinds is None else kinds)
+
+    def clear(self) -> None:
+        self.take()
+
+    def take(self) -> Tuple[Set[str], Dict[str, Set[str]]]:
+        """Return (full kinds, changed keys per kind) and start over with nothing dirty."""
+        with self._lock:
+            full, changed = self.full, self.changed
+            self.full, self.changed = set(), {kind: set() for kind in KINDS}
+        # keys of kinds that are rewritten in full anyway are not needed
+        return full, {kind: set() if kind in full else keys for kind, keys in changed.items()}
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.full) or any(self.changed.values())
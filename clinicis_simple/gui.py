@@ -1,34 +1,187 @@
 import ctypes
 import logging
+import queue
+import threading
 import tkinter as tk
+from itertools import islice
 from tkinter import messagebox, ttk
 
-from models import Doctor, Patient
+from audit import JsonlFileSink, QueueSink, set_sink
+from models import STATUS_VALUES, Doctor, Patient
+from appointment_store import AppointmentStore
+from appointment_view import COLUMNS, AppointmentView
 from clinic import Clinic
+from metrics import enable_from_env, hot_path
+from save_worker import SaveWorker
 
 logger = logging.getLogger(__name__)
 
+# the appointment list only ever holds this many Treeview items
+LIST_ROWS = 12
+SEARCH_RESULTS = 8
+# the doctor / patient pickers list at most this many matches, never every entry
+PICKER_RESULTS = 20
+# keys that move through a picker's list rather than change what it searches for
+NAVIGATION_KEYS = {"Up", "Down", "Left", "Right", "Return", "KP_Enter", "Escape", "Tab", "ISO_Left_Tab"}
+# progress bar steps of the background load (see ClinicGUI._load)
+LOAD_STEPS = 4
+COLUMN_TITLES = {
+    "appt_id": "Appt",
+    "patient_id": "Patient",
+    "doctor_id": "Doctor",
+    "datetime_str": "Time",
+    "status": "Status",
+}
+
+
+class Picker:
+    """Editable Combobox listing the top matches of what was typed instead of every entry.
+
+    ``search(query, limit)`` returns SearchHits (Clinic.search_patients or
+    search_doctors) and ``people()`` the id -> Patient / Doctor mapping.
+    """
+
+    def __init__(self, parent, search, people, width: int = 25) -> None:
+        self.search = search
+        self.people = people
+        self.combo = ttk.Combobox(parent, width=width, postcommand=self._fill)
+        self.combo.bind("<KeyRelease>", self._on_typing)
+
+    @staticmethod
+    def _label(person) -> str:
+        return f"{person.pid} - {person.name}"
+
+    def _picked(self, text: str):
+        """The entry whose label is ``text`` or whose id was typed, else None."""
+        person = self.people().get(text.split(" - ")[0])
+        return person if person is not None and text in (person.pid, self._label(person)) else None
+
+    def _fill(self) -> None:
+        text = self.combo.get().strip()
+        people = self.people()
+        if not text or (" - " in text and self._picked(text) is not None):
+            # nothing typed yet (or a picked label): offer the first few to browse
+            matches = list(islice(people.values(), PICKER_RESULTS))
+        else:
+            matches = [people[hit.pid] for hit in self.search(text, PICKER_RESULTS)]
+        self.combo["values"] = [self._label(person) for person in matches]
+
+    def _on_typing(self, event) -> None:
+        if event.keysym not in NAVIGATION_KEYS:
+            self._fill()
+
+    def selected_id(self) -> str | None:
+        """A picked or typed id, else the only match of the typed text (None if there are several)."""
+        text = self.combo.get().strip()
+        if not text:
+            return None
+        person = self._picked(text)
+        if person is not None:
+            return person.pid
+        hits = self.search(text, 2)
+        return hits[0].pid if len(hits) == 1 else None
+
+    def select(self, pid: str | None) -> None:
+        person = self.people().get(pid) if pid is not None else None
+        self.combo.set(self._label(person) if person is not None else "")
+
 
 class ClinicGUI:
     def __init__(self, root: tk.Tk) -> None:
         self.root = root
         self.root.title("ClinicIS")
-        # Always start fresh: overwrite JSON files each run
-        self.store = Clinic(fresh_start=True)
-        self.store.load_from_files()
-        self._ensure_seed()
+        # the window paints first; _load opens the store on a background thread and
+        # _on_loaded takes over once it is done. Until then the inputs are disabled
+        # and the list shows an empty view.
+        self.store: Clinic | None = None
+        self.audit: QueueSink | None = None
+        self.saver: SaveWorker | None = None
+        self.view = AppointmentView(AppointmentStore())
+        # disk writes run on a background thread; results come back through _poll_saves
+        self._save_results: "queue.Queue[BaseException | None]" = queue.Queue()
+        self._loaded: "queue.Queue[tuple]" = queue.Queue()
+        self._offset = 0
+        self._selected_id: str | None = None
+        self._shown: dict[str, tuple] = {}  # appt_id -> values of the rows now in the Treeview
         self._build_ui()
-        self.refresh_list()
+        self._set_inputs_enabled(False)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        threading.Thread(target=self._load, name="clinic-loader", daemon=True).start()
+        self.root.after(50, self._poll_loading)
+
+    def _load(self) -> None:
+        """Open, load and index the store; runs off the Tk thread and reports through _loaded."""
+        report = self._loaded.put
+        try:
+            report(("progress", 0, "Opening data files..."))
+            # Always start fresh: overwrite JSON files each run
+            store = Clinic(fresh_start=True)
+            report(("progress", 1, "Loading patients, doctors and appointments..."))
+            store.load_from_files()
+            report(("progress", 2, "Indexing patients and doctors..."))
+            store.build_search_indexes()
+            report(("progress", 3, "Sorting appointments..."))
+            view = AppointmentView(store.appointments)
+        except Exception as exc:
+            logger.exception("Loading the clinic data failed")
+            report(("failed", exc))
+            return
+        report(("done", store, view))
+
+    def _poll_loading(self) -> None:
+        while True:
+            try:
+                message = self._loaded.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                self.progress["value"] = message[1]
+                self._set_status(message[2])
+            elif message[0] == "failed":
+                self.progress.grid_remove()
+                self._set_status(f"Loading failed: {message[1]}")
+                self._show_error("Load error", f"Could not load the clinic data: {message[1]}")
+                return
+            else:
+                self._on_loaded(*message[1:])
+                return
+        self.root.after(50, self._poll_loading)
+
+    def _on_loaded(self, store: Clinic, view: AppointmentView) -> None:
+        self.store = store
+        # the audit trail goes to data/audit.jsonl from a background thread
+        self.audit = QueueSink(JsonlFileSink(store.data_dir / "audit.jsonl"))
+        set_sink(self.audit)
+        self.saver = SaveWorker(store, on_done=self._save_results.put)
+        self._ensure_seed()
+        self.view = view
+        self.doctor_picker.select(next(iter(store.doctors), None))
+        self.patient_picker.select(next(iter(store.patients), None))
+        self.progress.grid_remove()
+        self._set_inputs_enabled(True)
+        self._render()
+        self._set_status(f"Ready: {len(store.patients)} patients, {len(store.appointments)} appointments")
+        self.root.after(100, self._poll_saves)
+
+    def _set_inputs_enabled(self, enabled: bool) -> None:
+        state = ["!disabled"] if enabled else ["disabled"]
+        pending = list(self.root.winfo_children())
+        while pending:
+            widget = pending.pop()
+            pending.extend(widget.winfo_children())
+            if isinstance(widget, (ttk.Button, ttk.Entry, ttk.Treeview, ttk.Scrollbar)):
+                widget.state(state)
 
     def _build_ui(self) -> None:
         frm = ttk.Frame(self.root, padding=10)
         frm.pack(fill="both", expand=True)
 
         # Search entry (Event: Enter key)
-        ttk.Label(frm, text="Search Patient ID/Name:").grid(row=0, column=0, sticky="w")
+        ttk.Label(frm, text="Search Patient ID/Name/Phone:").grid(row=0, column=0, sticky="w")
         self.search_entry = ttk.Entry(frm, width=20)
         self.search_entry.grid(row=0, column=1, padx=5, pady=5)
         self.search_entry.bind("<Return>", self._on_search)
+        self.search_entry.bind("<KeyRelease>", self._on_search_typing)
         ttk.Button(frm, text="Search", command=self._on_search).grid(row=0, column=2, padx=5, pady=5)
 
         # Search details panel
@@ -43,19 +196,19 @@ class ClinicGUI:
         ttk.Button(add_btns, text="Add Patient", command=self._open_add_patient_popup).grid(row=0, column=0, padx=2)
         ttk.Button(add_btns, text="Add Doctor", command=self._open_add_doctor_popup).grid(row=0, column=1, padx=2)
 
-        # Combobox doctor (input)
+        # Doctor picker (input; type to search by id, name or phone)
         ttk.Label(frm, text="Doctor:").grid(row=4, column=0, sticky="w")
-        self.doctor_combo = ttk.Combobox(frm, values=self._doctor_values(), state="readonly", width=25)
-        self.doctor_combo.grid(row=4, column=1, padx=5, pady=5)
-        if self.doctor_combo["values"]:
-            self.doctor_combo.current(0)
+        self.doctor_picker = Picker(
+            frm, lambda query, limit: self.store.search_doctors(query, limit), lambda: self.store.doctors
+        )
+        self.doctor_picker.combo.grid(row=4, column=1, padx=5, pady=5)
 
-        # Combobox patient (input)
+        # Patient picker (input)
         ttk.Label(frm, text="Patient:").grid(row=5, column=0, sticky="w")
-        self.patient_combo = ttk.Combobox(frm, values=self._patient_values(), state="readonly", width=25)
-        self.patient_combo.grid(row=5, column=1, padx=5, pady=5)
-        if self.patient_combo["values"]:
-            self.patient_combo.current(0)
+        self.patient_picker = Picker(
+            frm, lambda query, limit: self.store.search_patients(query, limit), lambda: self.store.patients
+        )
+        self.patient_picker.combo.grid(row=5, column=1, padx=5, pady=5)
 
         # Datetime entry
         ttk.Label(frm, text="Date/Time:").grid(row=6, column=0, sticky="w")
@@ -69,11 +222,40 @@ class ClinicGUI:
         self.schedule_btn = ttk.Button(frm, text="קבע תור", command=self._on_schedule)
         self.schedule_btn.grid(row=8, column=0, columnspan=2, sticky="ew", pady=5)
 
-        # Listbox appointments (Event: select)
+        # Appointments list (Event: select). Virtualized: only the visible rows are Treeview items
         ttk.Label(frm, text="Appointments:").grid(row=9, column=0, sticky="w")
-        self.listbox = tk.Listbox(frm, height=6, width=50)
-        self.listbox.grid(row=10, column=0, columnspan=2, sticky="nsew", pady=5)
-        self.listbox.bind("<<ListboxSelect>>", self._on_select)
+        list_frame = ttk.Frame(frm)
+        list_frame.grid(row=10, column=0, columnspan=2, sticky="nsew", pady=5)
+
+        filter_frame = ttk.Frame(list_frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 4))
+        ttk.Label(filter_frame, text="Patient").grid(row=0, column=0, padx=2)
+        self.filter_patient = ttk.Entry(filter_frame, width=10)
+        self.filter_patient.grid(row=0, column=1, padx=2)
+        ttk.Label(filter_frame, text="Doctor").grid(row=0, column=2, padx=2)
+        self.filter_doctor = ttk.Entry(filter_frame, width=10)
+        self.filter_doctor.grid(row=0, column=3, padx=2)
+        ttk.Label(filter_frame, text="Status").grid(row=0, column=4, padx=2)
+        self.filter_status = ttk.Combobox(filter_frame, values=["", *STATUS_VALUES], state="readonly", width=10)
+        self.filter_status.grid(row=0, column=5, padx=2)
+        ttk.Button(filter_frame, text="Filter", command=self._on_filter).grid(row=0, column=6, padx=2)
+        ttk.Button(filter_frame, text="Clear", command=self._on_clear_filter).grid(row=0, column=7, padx=2)
+        for entry in (self.filter_patient, self.filter_doctor):
+            entry.bind("<Return>", self._on_filter)
+        self.filter_status.bind("<<ComboboxSelected>>", self._on_filter)
+
+        self.tree = ttk.Treeview(list_frame, columns=COLUMNS, show="headings", height=LIST_ROWS, selectmode="browse")
+        for col in COLUMNS:
+            self.tree.heading(col, text=COLUMN_TITLES[col], command=lambda c=col: self._on_sort(c))
+            self.tree.column(col, width=140 if col == "datetime_str" else 90, stretch=True)
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self._on_scroll)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_wheel)
+        list_frame.columnconfigure(0, weight=1)
+        list_frame.rowconfigure(1, weight=1)
 
         # Details panel (no popups)
         ttk.Label(frm, text="Appointment Details:").grid(row=11, column=0, sticky="w")
@@ -95,48 +277,46 @@ class ClinicGUI:
         ttk.Button(btn_frame, text="Reschedule", command=self._on_reschedule).grid(row=0, column=3, padx=2)
 
         # Status label (replaces popups)
-        self.status_var = tk.StringVar(value="Ready")
+        self.status_var = tk.StringVar(value="Loading...")
         ttk.Label(frm, textvariable=self.status_var, foreground="gray").grid(
             row=16, column=0, columnspan=2, sticky="w", pady=(6, 0)
         )
+        # shown while the data loads
+        self.progress = ttk.Progressbar(frm, maximum=LOAD_STEPS, mode="determinate")
+        self.progress.grid(row=17, column=0, columnspan=2, sticky="ew", pady=(2, 0))
 
         frm.columnconfigure(1, weight=1)
         frm.rowconfigure(10, weight=1)
 
-    def _doctor_values(self):
-        return [f"{d.pid} - {d.name}" for d in self.store.doctors.values()]
-
-    def _patient_values(self):
-        return [f"{p.pid} - {p.name}" for p in self.store.patients.values()]
-
-    def _refresh_doctor_combo(self, select_id: str | None = None) -> None:
-        values = self._doctor_values()
-        self.doctor_combo["values"] = values
-        if select_id:
-            for i, v in enumerate(values):
-                if v.startswith(f"{select_id} - "):
-                    self.doctor_combo.current(i)
-                    return
-        if values and self.doctor_combo.get() not in values:
-            self.doctor_combo.current(0)
-
-    def _refresh_patient_combo(self, select_id: str | None = None) -> None:
-        values = self._patient_values()
-        self.patient_combo["values"] = values
-        if select_id:
-            for i, v in enumerate(values):
-                if v.startswith(f"{select_id} - "):
-                    self.patient_combo.current(i)
-                    return
-        if values and self.patient_combo.get() not in values:
-            self.patient_combo.current(0)
-
     def _set_status(self, msg: str) -> None:
         self.status_var.set(msg)
 
     def _show_error(self, title: str, msg: str) -> None:
         messagebox.showerror(title, msg)
 
+    def _poll_saves(self) -> None:
+        while True:
+            try:
+                error = self._save_results.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                self._set_status(f"Save failed: {error}")
+        self.root.after(100, self._poll_saves)
+
+    def _on_close(self) -> None:
+        if self.store is None:
+            # still loading: nothing was changed yet
+            self.root.destroy()
+            return
+        self._set_status("Saving...")
+        self.root.update_idletasks()
+        if not self.saver.close(timeout=30):
+            self._show_error("Save error", "Saving did not finish; recent changes may be lost.")
+        self.store.close()
+        self.audit.close()
+        self.root.destroy()
+
     def _open_add_patient_popup(self) -> None:
         win = tk.Toplevel(self.root)
         win.title("Add Patient")
@@ -164,9 +344,10 @@ class ClinicGUI:
             if pid in self.store.patients:
                 self._show_error("Duplicate ID", f"Patient ID {pid} already exists.")
                 return
-            self.store.add_patient(Patient(pid, name, phone))
-            self.store.save_to_files()
-            self._refresh_patient_combo(select_id=pid)
+            with self.store.lock:
+                self.store.add_patient(Patient(pid, name, phone))
+            self.saver.request()
+            self.patient_picker.select(pid)
             self._set_status(f"Patient {pid} added")
             win.destroy()
 
@@ -208,9 +389,10 @@ class ClinicGUI:
             if pid in self.store.doctors:
                 self._show_error("Duplicate ID", f"Doctor ID {pid} already exists.")
                 return
-            self.store.add_doctor(Doctor(pid, name, phone, specialty))
-            self.store.save_to_files()
-            self._refresh_doctor_combo(select_id=pid)
+            with self.store.lock:
+                self.store.add_doctor(Doctor(pid, name, phone, specialty))
+            self.saver.request()
+            self.doctor_picker.select(pid)
             self._set_status(f"Doctor {pid} added")
             win.destroy()
 
@@ -220,19 +402,40 @@ class ClinicGUI:
         ttk.Button(btns, text="Cancel", command=win.destroy).grid(row=0, column=1, padx=4)
         pid_entry.focus_set()
 
+    def _show_search_details(self, lines) -> None:
+        self.search_details_text.configure(state="normal")
+        self.search_details_text.delete("1.0", "end")
+        self.search_details_text.insert("1.0", "\n".join(lines))
+        self.search_details_text.configure(state="disabled")
+
+    def _on_search_typing(self, event=None):
+        # search-as-you-type: list the best matches; Enter opens the top one
+        if event is not None and event.keysym in ("Return", "KP_Enter"):
+            return
+        query = self.search_entry.get().strip()
+        if not query:
+            self._show_search_details([])
+            return
+        hits = self.store.search_patients(query, limit=SEARCH_RESULTS)
+        lines = []
+        for hit in hits:
+            p = self.store.patients[hit.pid]
+            lines.append(f"{p.pid} | {p.name} | {p.phone} ({hit.match})")
+        self._show_search_details(lines)
+        self._set_status(f"{len(hits)} matching patients" if hits else f"No patient matches {query}")
+
+    @hot_path("gui.on_search")
     def _on_search(self, event=None):
         query = self.search_entry.get().strip()
         if not query:
-            self._set_status("Enter a patient ID or name")
+            self._set_status("Enter a patient ID, name or phone")
             return
 
-        patient = self.store.patients.get(query)
-        if not patient:
-            q = query.casefold()
-            patient = next((p for p in self.store.patients.values() if p.name.casefold() == q), None)
+        hits = self.store.search_patients(query, limit=1)
+        patient = self.store.patients[hits[0].pid] if hits else None
 
         if patient:
-            appts = [a for a in self.store.appointments if a.patient_id == patient.pid]
+            appts = self.store.appointments.for_patient(patient.pid)
             details = [
                 f"Patient {patient.pid}",
                 f"Name {patient.name}",
@@ -245,63 +448,53 @@ class ClinicGUI:
                 for a in appts:
                     details.append(f"- {a.appt_id} | {a.doctor_id} | {a.datetime_str} | {a.status}")
 
-            self.search_details_text.configure(state="normal")
-            self.search_details_text.delete("1.0", "end")
-            self.search_details_text.insert("1.0", "\n".join(details))
-            self.search_details_text.configure(state="disabled")
-
-            self.listbox.selection_clear(0, "end")
-            first_idx = None
-            for idx, appt in enumerate(self.store.appointments):
-                if appt.patient_id == patient.pid:
-                    self.listbox.selection_set(idx)
-                    if first_idx is None:
-                        first_idx = idx
-            if first_idx is not None:
-                self.listbox.see(first_idx)
+            self._show_search_details(details)
+
+            # show only this patient's appointments in the list
+            self.filter_patient.delete(0, "end")
+            self.filter_patient.insert(0, patient.pid)
+            self._on_filter()
 
             self._set_status("Ready")
         else:
-            self.search_details_text.configure(state="normal")
-            self.search_details_text.delete("1.0", "end")
-            self.search_details_text.configure(state="disabled")
-            self._set_status(f"No patient with id or name {query}")
-            self._show_error("Not found", f"No patient with id or name {query}.")
+            self._show_search_details([])
+            self._set_status(f"No patient with id, name or phone {query}")
+            self._show_error("Not found", f"No patient with id, name or phone {query}.")
 
     def _on_schedule(self):
-        patient_val = self.patient_combo.get()
-        doctor_val = self.doctor_combo.get()
+        pid = self.patient_picker.selected_id()
+        doctor_id = self.doctor_picker.selected_id()
         dt = self.datetime_entry.get().strip()
-        if not (patient_val and doctor_val and dt):
+        if not (pid and doctor_id and dt):
             self._set_status("Fill patient, doctor, and date/time")
-            self._show_error("Missing data", "Please select patient, doctor, and date/time.")
+            self._show_error("Missing data", "Please pick a patient and a doctor from the lists and enter a date/time.")
             return
-        pid = patient_val.split(" - ")[0]
-        doctor_id = doctor_val.split(" - ")[0]
-        appt_id = self._next_appt_id()
-        appt = self.store.schedule_appointment(appt_id, pid, doctor_id, dt)
+        appt_id = self.store.next_appt_id()
+        with self.store.lock:
+            appt = self.store.schedule_appointment(appt_id, pid, doctor_id, dt)
         if appt:
-            self.store.save_to_files()
-            self.refresh_list()
+            self.saver.request()
+            self._refresh_appt(appt_id)
+            self._scroll_to(appt_id)
             self._set_status(f"Appointment {appt_id} created")
         else:
             self._set_status("Failed to schedule (conflict or invalid)")
             self._show_error("Schedule error", "Unable to schedule. Time conflict or invalid data.")
 
-    def _next_appt_id(self) -> str:
-        max_num = 0
-        for appt in self.store.appointments:
-            appt_id = getattr(appt, "appt_id", "")
-            if isinstance(appt_id, str) and appt_id.startswith("a") and appt_id[1:].isdigit():
-                max_num = max(max_num, int(appt_id[1:]))
-        return f"a{max_num + 1}"
+    def _selected_appt(self):
+        if self._selected_id is None:
+            return None
+        return self.store.appointments.get(self._selected_id)
 
     def _on_select(self, event=None):
-        sel = self.listbox.curselection()
-        if not sel:
+        sel = self.tree.selection()
+        # an empty selection only means the selected row scrolled out of the window
+        if not sel or sel[0] == self._selected_id:
+            return
+        self._selected_id = sel[0]
+        appt = self._selected_appt()
+        if appt is None:
             return
-        idx = sel[0]
-        appt = self.store.appointments[idx]
         details = (
             f"Appt {appt.appt_id}\n"
             f"Patient {appt.patient_id}\n"
@@ -317,48 +510,49 @@ class ClinicGUI:
         self.summary_text.delete("1.0", "end")
 
     def _on_complete(self):
-        sel = self.listbox.curselection()
-        if not sel:
+        appt = self._selected_appt()
+        if appt is None:
             self._set_status("Choose an appointment first")
             return
-        idx = sel[0]
-        appt = self.store.appointments[idx]
         summary = self.summary_text.get("1.0", "end").strip()
         if not summary:
             self._set_status("Add a summary first")
             return
-        if self.store.complete_appointment(appt.appt_id, summary):
-            self.store.save_to_files()
-            self.refresh_list()
+        with self.store.lock:
+            done = self.store.complete_appointment(appt.appt_id, summary)
+        if done:
+            self.saver.request()
+            self._refresh_appt(appt.appt_id)
             self._set_status("Appointment completed")
 
     def _on_cancel(self):
-        sel = self.listbox.curselection()
-        if not sel:
+        appt = self._selected_appt()
+        if appt is None:
             self._set_status("Choose an appointment first")
             return
-        idx = sel[0]
-        appt = self.store.appointments[idx]
-        if self.store.cancel_appointment(appt.appt_id):
-            self.store.save_to_files()
-            self.refresh_list()
+        with self.store.lock:
+            done = self.store.cancel_appointment(appt.appt_id)
+        if done:
+            self.saver.request()
+            self._refresh_appt(appt.appt_id)
             self._set_status("Appointment cancelled")
 
     def _on_delete(self):
-        sel = self.listbox.curselection()
-        if not sel:
+        appt = self._selected_appt()
+        if appt is None:
             self._set_status("Choose an appointment first")
             return
-        idx = sel[0]
-        appt = self.store.appointments[idx]
-        if self.store.delete_appointment(appt.appt_id):
-            self.store.save_to_files()
-            self.refresh_list()
+        with self.store.lock:
+            done = self.store.delete_appointment(appt.appt_id)
+        if done:
+            self.saver.request()
+            self._selected_id = None
+            self._refresh_appt(appt.appt_id)
             self._set_status("Appointment removed")
 
     def _on_reschedule(self):
-        sel = self.listbox.curselection()
-        if not sel:
+        appt = self._selected_appt()
+        if appt is None:
             self._set_status("Choose an appointment first")
             return
 
@@ -368,34 +562,118 @@ class ClinicGUI:
             self._show_error("Missing data", "Please enter a new date/time.")
             return
 
-        idx = sel[0]
-        appt = self.store.appointments[idx]
-        if self.store.reschedule_appointment(appt.appt_id, new_dt):
-            self.store.save_to_files()
-            self.refresh_list()
+        with self.store.lock:
+            done = self.store.reschedule_appointment(appt.appt_id, new_dt)
+        if done:
+            self.saver.request()
+            self._refresh_appt(appt.appt_id)
+            self._scroll_to(appt.appt_id)
             self._set_status("Appointment rescheduled")
         else:
             self._set_status("Failed to reschedule (conflict?)")
             self._show_error("Reschedule error", "Unable to reschedule. Time conflict or invalid data.")
 
-    def refresh_list(self):
-        self.listbox.delete(0, "end")
-        for appt in self.store.appointments:
-            self.listbox.insert("end", f"{appt.appt_id} | {appt.patient_id} | {appt.doctor_id} | {appt.datetime_str} | {appt.status}")
+    def _on_filter(self, event=None):
+        self.view.set_filters(
+            patient_id=self.filter_patient.get().strip(),
+            doctor_id=self.filter_doctor.get().strip(),
+            status=self.filter_status.get(),
+        )
+        self._offset = 0
+        self._render()
+        self._set_status(f"{len(self.view)} appointments shown")
+
+    def _on_clear_filter(self):
+        self.filter_patient.delete(0, "end")
+        self.filter_doctor.delete(0, "end")
+        self.filter_status.set("")
+        self._on_filter()
+
+    def _on_sort(self, column: str):
+        if self.store is None:
+            return
+        descending = self.view.sort_column == column and not self.view.descending
+        self.view.set_sort(column, descending)
+        for col in COLUMNS:
+            arrow = (" \u25bc" if descending else " \u25b2") if col == column else ""
+            self.tree.heading(col, text=COLUMN_TITLES[col] + arrow)
+        self._offset = 0
+        if self._selected_id is not None:
+            self._scroll_to(self._selected_id)
+        else:
+            self._render()
+
+    def _on_scroll(self, *args):
+        if args[0] == "moveto":
+            self._offset = int(float(args[1]) * len(self.view))
+        elif args[0] == "scroll":
+            step = LIST_ROWS if args[2] == "pages" else 1
+            self._offset += int(args[1]) * step
+        self._render()
+
+    def _on_wheel(self, event):
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        self._offset += -3 if up else 3
+        self._render()
+        return "break"
+
+    def _scroll_to(self, appt_id: str) -> None:
+        pos = self.view.position(appt_id)
+        if pos is not None and not self._offset <= pos < self._offset + LIST_ROWS:
+            self._offset = pos - LIST_ROWS // 2
+        self._render()
+
+    def _refresh_appt(self, appt_id: str) -> None:
+        """Re-place one changed appointment and redraw the visible window."""
+        self.view.update(appt_id)
+        self._render()
+
+    @hot_path("gui.render", size=lambda result, gui: len(gui.view))
+    def _render(self) -> None:
+        """Make the Treeview hold exactly the visible rows, touching only those that differ."""
+        total = len(self.view)
+        self._offset = max(0, min(self._offset, total - LIST_ROWS))
+        wanted = {
+            appt.appt_id: (appt.appt_id, appt.patient_id, appt.doctor_id, appt.datetime_str, appt.status)
+            for appt in self.view.window(self._offset, LIST_ROWS)
+        }
+        for iid in list(self._shown):
+            if iid not in wanted:
+                self.tree.delete(iid)
+                del self._shown[iid]
+        for index, (iid, values) in enumerate(wanted.items()):
+            if iid not in self._shown:
+                self.tree.insert("", index, iid=iid, values=values)
+            else:
+                if self._shown[iid] != values:
+                    self.tree.item(iid, values=values)
+                if self.tree.index(iid) != index:
+                    self.tree.move(iid, "", index)
+            self._shown[iid] = values
+        if self._selected_id in wanted:
+            if self.tree.selection() != (self._selected_id,):
+                self.tree.selection_set(self._selected_id)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+        if total:
+            self.scrollbar.set(self._offset / total, min(1.0, (self._offset + LIST_ROWS) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
 
     def _ensure_seed(self):
         changed = False
-        if not self.store.doctors:
-            self.store.add_doctor(Doctor("d1", "Dr. Green", "555-0001", "GP"))
-            self.store.add_doctor(Doctor("d2", "Dr. Blue", "555-0002", "Derm"))
-            changed = True
-        if not self.store.patients:
-            self.store.add_patient(Patient("p1", "Alice", "111"))
-            self.store.add_patient(Patient("p2", "Bob", "222"))
-            changed = True
+        with self.store.lock:
+            if not self.store.doctors:
+                self.store.add_doctor(Doctor("d1", "Dr. Green", "555-0001", "GP"))
+                self.store.add_doctor(Doctor("d2", "Dr. Blue", "555-0002", "Derm"))
+                changed = True
+            if not self.store.patients:
+                self.store.add_patient(Patient("p1", "Alice", "111"))
+                self.store.add_patient(Patient("p2", "Bob", "222"))
+                changed = True
 
         if changed:
-            self.store.save_to_files()
+            self.saver.request()
 
 
 def run_gui():
@@ -408,6 +686,7 @@ def run_gui():
         root.tk.call("tk", "scaling", 2.25)
     except tk.TclError as exc:
         logger.debug("Tk scaling not set: %s", exc)
+    enable_from_env()
     ClinicGUI(root)
     root.mainloop()
 
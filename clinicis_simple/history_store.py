@@ -0,0 +1,336 @@
+"""Append-only, memory-mapped file of patients' visit notes.
+
+Every note is one record appended to ``visits.log``::
+
+    u64 offset of the patient's previous record (0: first visit)
+    u32 pid length, u32 note length, u32 crc32 of pid + note
+    pid (UTF-8), note (UTF-8)
+
+so each patient's records form a chain from the newest one backwards. The
+store keeps only ``pid -> (newest offset, count)`` in memory and reads notes
+through mmap when a history is asked for; adding a visit is one write(),
+or, with ``write_behind``, a queued note that flush() writes later.
+The index is saved to ``visits.idx`` on close, so opening the store only
+scans records appended after that. Appends from several processes are
+serialized with a file lock, and each process catches up on the others'
+records before it writes.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union, overload
+
+from fileio import atomic_write_text
+from id_allocator import file_lock
+
+MAGIC = b"CLINVIST"
+VERSION = 1
+HISTORY_FILE = "visits.log"
+INDEX_FILE = "visits.idx"
+
+_HEADER = struct.Struct("<8sH6x8s")  # magic, version, file id (changes on reset)
+_RECORD = struct.Struct("<QIII")
+
+
+class HistoryStore:
+    def __init__(self, directory: Path, fsync: bool = True) -> None:
+        self.directory = Path(directory)
+        self.path = self.directory / HISTORY_FILE
+        self.index_path = self.directory / INDEX_FILE
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._file_id = b""
+        self._end = 0  # records before this offset are in _index
+        self._index: Dict[str, Tuple[int, int]] = {}  # pid -> (newest record offset, count)
+        # write_behind: appends only queue their notes (readers see them at once) and flush()
+        # writes the queue, so a UI thread never waits for the disk (see save_worker.py)
+        self.write_behind = False
+        self._pending: Dict[str, List[str]] = {}
+        self._pending_lock = threading.Lock()  # never held during I/O
+
+    # the file is opened on first use, so a Clinic that never touches a history never creates it
+
+    def _open(self) -> None:
+        if self._fd is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+        with file_lock(self.path):
+            if os.fstat(self._fd).st_size < _HEADER.size:
+                self._write_header()
+            magic, version, self._file_id = _HEADER.unpack(self._read_at(0, _HEADER.size))
+            if magic != MAGIC or version > VERSION:
+                self._unmap()
+                os.close(self._fd)
+                self._fd = None
+                raise ValueError(f"{self.path} is not a visit history file (version {VERSION} or older)")
+            self._end = _HEADER.size
+            self._index = {}
+            self._load_index()
+            self._catch_up()
+
+    def _write_header(self) -> None:
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, _HEADER.pack(MAGIC, VERSION, os.urandom(8)))
+        if self.fsync:
+            os.fsync(self._fd)
+
+    def _load_index(self) -> None:
+        try:
+            saved = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        # a saved index only counts for the same file, and only up to where it was written
+        if saved.get("file_id") != self._file_id.hex() or saved.get("end", 0) > os.fstat(self._fd).st_size:
+            return
+        self._end = saved["end"]
+        self._index = {pid: (last, count) for pid, (last, count) in saved["patients"].items()}
+
+    def _catch_up(self) -> None:
+        """Index records appended since ``_end`` (by this or another process); call with the file lock held."""
+        size = os.fstat(self._fd).st_size
+        if size <= self._end:
+            return
+        data = self._mapped(size)
+        offset = self._end
+        index = self._index
+        while offset + _RECORD.size <= size:
+            prev, pid_len, note_len, crc = _RECORD.unpack_from(data, offset)
+            body = offset + _RECORD.size
+            end = body + pid_len + note_len
+            if end > size or zlib.crc32(data[body:end]) != crc:
+                break
+            pid = data[body : body + pid_len].decode("utf-8")
+            index[pid] = (offset, index.get(pid, (0, 0))[1] + 1)
+            offset = end
+        if offset < size:
+            # torn tail of a write that never finished (we hold the lock, nobody is writing)
+            os.ftruncate(self._fd, offset)
+            self._unmap()
+        self._end = offset
+
+    def _mapped(self, size: int) -> mmap.mmap:
+        if self._map is None or len(self._map) < size:
+            self._unmap()
+            self._map = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _unmap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _read_at(self, offset: int, length: int) -> bytes:
+        return self._mapped(offset + length)[offset : offset + length]
+
+    # -- writing -----------------------------------------------------------------
+
+    def append(self, pid: str, note: str) -> None:
+        """Add one visit note to the end of ``pid``'s history."""
+        self.extend(pid, (note,))
+
+    def extend(self, pid: str, notes: Iterable[str]) -> None:
+        """Add several notes with a single write (and fsync), or queue them with write_behind."""
+        notes = list(notes)
+        if self.write_behind:
+            if notes:
+                with self._pending_lock:
+                    self._pending.setdefault(pid, []).extend(notes)
+            return
+        with self._lock:
+            self._write([(pid, notes)])
+
+    def flush(self) -> None:
+        """Write every queued note, all patients in one write (and fsync)."""
+        with self._lock:
+            with self._pending_lock:
+                batch = [(pid, list(notes)) for pid, notes in self._pending.items()]
+            if not batch:
+                return
+            self._write(batch)
+            with self._pending_lock:
+                for pid, notes in batch:
+                    queued = self._pending[pid]
+                    del queued[: len(notes)]
+                    if not queued:
+                        del self._pending[pid]
+
+    def _write(self, batch: Iterable[Tuple[str, List[str]]]) -> None:
+        """Append the notes of one or more patients with one write; call with self._lock held."""
+        self._open()
+        with file_lock(self.path):
+            self._catch_up()
+            offset, records = self._end, bytearray()
+            index: Dict[str, Tuple[int, int]] = {}
+            for pid, notes in batch:
+                if not notes:
+                    continue
+                pid_bytes = pid.encode("utf-8")
+                last, count = self._index.get(pid, (0, 0))
+                for note in notes:
+                    note_bytes = note.encode("utf-8")
+                    payload = pid_bytes + note_bytes
+                    records += _RECORD.pack(last, len(pid_bytes), len(note_bytes), zlib.crc32(payload))
+                    records += payload
+                    last, count = offset + len(records) - _RECORD.size - len(payload), count + 1
+                index[pid] = (last, count)
+            if not records:
+                return
+            os.write(self._fd, records)
+            if self.fsync:
+                os.fsync(self._fd)
+            self._index.update(index)
+            self._end += len(records)
+
+    def adopt(self, pid: str, notes: List[str]) -> None:
+        """Move visits kept elsewhere (older data files) into the store, unless it already has some."""
+        if notes:
+            with self._lock:
+                if self.count(pid) == 0:
+                    self.extend(pid, notes)
+
+    def reset(self) -> None:
+        """Drop every history (a new, empty file)."""
+        with self._lock:
+            with self._pending_lock:
+                self._pending.clear()
+            self._open()
+            with file_lock(self.path):
+                self._unmap()
+                self._write_header()
+                self._file_id = self._read_at(0, _HEADER.size)[-8:]
+                self._end = _HEADER.size
+                self._index = {}
+            self.index_path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Write queued notes, save the index for a fast next open and release the file."""
+        with self._lock:
+            self.flush()
+            if self._fd is None:
+                return
+            saved = {
+                "file_id": self._file_id.hex(),
+                "end": self._end,
+                "patients": {pid: list(entry) for pid, entry in self._index.items()},
+            }
+            atomic_write_text(self.index_path, json.dumps(saved, separators=(",", ":")), fsync=self.fsync)
+            self._unmap()
+            os.close(self._fd)
+            self._fd = None
+
+    # -- reading -----------------------------------------------------------------
+
+    def count(self, pid: str) -> int:
+        with self._lock:
+            self._open()
+            with self._pending_lock:
+                queued = len(self._pending.get(pid, ()))
+            return self._index.get(pid, (0, 0))[1] + queued
+
+    def page(self, pid: str, start: int = 0, limit: Optional[int] = None) -> List[str]:
+        """Notes ``start`` .. ``start + limit`` of ``pid``, oldest first.
+
+        Walks the patient's chain from the newest record, so recent pages are
+        the cheapest; nothing but the returned notes is decoded.
+        """
+        with self._lock:
+            self._open()
+            offset, count = self._index.get(pid, (0, 0))
+            with self._pending_lock:
+                queued = list(self._pending.get(pid, ()))  # notes count .. count + len(queued)
+            total = count + len(queued)
+            stop = total if limit is None else min(total, start + limit)
+            if start >= stop:
+                return []
+            notes: List[str] = []
+            if start < count:
+                data = self._mapped(self._end)
+                for position in range(count - 1, start - 1, -1):
+                    prev, pid_len, note_len, _ = _RECORD.unpack_from(data, offset)
+                    if position < stop:
+                        body = offset + _RECORD.size + pid_len
+                        notes.append(data[body : body + note_len].decode("utf-8"))
+                    offset = prev
+                notes.reverse()
+            return notes + queued[max(start - count, 0) : max(stop - count, 0)]
+
+    def history(self, pid: str) -> "PatientHistory":
+        return PatientHistory(self, pid)
+
+
+def read_histories(directory: Path) -> Dict[str, List[str]]:
+    """Every patient's notes in ``directory``'s history file, oldest first, without writing anything there.
+
+    For copying a data folder elsewhere: no file or lock is created, and a
+    torn tail is skipped instead of cut off.
+    """
+    try:
+        data = (Path(directory) / HISTORY_FILE).read_bytes()
+    except FileNotFoundError:
+        return {}
+    if len(data) < _HEADER.size:
+        return {}
+    magic, version, _ = _HEADER.unpack_from(data)
+    if magic != MAGIC or version > VERSION:
+        raise ValueError(f"{Path(directory) / HISTORY_FILE} is not a visit history file (version {VERSION} or older)")
+    histories: Dict[str, List[str]] = {}
+    offset = _HEADER.size
+    while offset + _RECORD.size <= len(data):
+        _, pid_len, note_len, crc = _RECORD.unpack_from(data, offset)
+        body = offset + _RECORD.size
+        end = body + pid_len + note_len
+        if end > len(data) or zlib.crc32(data[body:end]) != crc:
+            break
+        pid = data[body : body + pid_len].decode("utf-8")
+        histories.setdefault(pid, []).append(data[body + pid_len : end].decode("utf-8"))
+        offset = end
+    return histories
+
+
+class PatientHistory(Sequence):
+    """One patient's visits as a read-through, append-only sequence (nothing is cached)."""
+
+    __slots__ = ("store", "pid")
+
+    def __init__(self, store: HistoryStore, pid: str) -> None:
+        self.store = store
+        self.pid = pid
+
+    def __len__(self) -> int:
+        return self.store.count(self.pid)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return self.store.page(self.pid)[index]
+            return self.store.page(self.pid, start, max(stop - start, 0))
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("visit index out of range")
+        return self.store.page(self.pid, index, 1)[0]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.page(self.pid))
+
+    def __repr__(self) -> str:
+        return f"PatientHistory({self.pid!r}, {len(self)} visits)"
+
+    def append(self, note: str) -> None:
+        self.store.append(self.pid, note)
@@ -0,0 +1,118 @@
+"""Sequential ids ("a1", "a2", ...) that stay unique across threads and processes.
+
+The next free number lives in a small counter file in the data directory.
+A process reserves a block of numbers at a time under an OS file lock and
+then hands them out from memory, so an id costs a counter increment; the
+file is only touched once per block. Numbers reserved by a process that
+exits without release() are skipped, never reused.
+"""
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from fileio import atomic_write_text
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_BLOCK = 100
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Exclusive advisory lock on ``path`` (created if missing), held for the block."""
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class IdAllocator:
+    def __init__(
+        self,
+        directory: Path,
+        prefix: str = "a",
+        block: int = DEFAULT_BLOCK,
+        seed: Optional[Callable[[], int]] = None,
+        fsync: bool = True,
+    ) -> None:
+        """``seed`` returns the highest number already in use; it is asked once, when no counter file exists."""
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.block = block
+        self.seed = seed
+        self.fsync = fsync
+        self.counter_path = self.directory / f"{prefix}_ids.next"
+        self.lock_path = self.directory / f"{prefix}_ids.lock"
+        self._lock = threading.Lock()
+        self._next = 0
+        self._limit = 0  # the current block is [_next, _limit)
+
+    def next(self) -> str:
+        with self._lock:
+            if self._next >= self._limit:
+                self._next, self._limit = self._reserve()
+            number = self._next
+            self._next += 1
+        return f"{self.prefix}{number}"
+
+    def release(self) -> None:
+        """Give back the rest of the current block, if no other process reserved after it."""
+        with self._lock:
+            if self._next >= self._limit:
+                return
+            with file_lock(self.lock_path):
+                if self._read_counter() == self._limit:
+                    self._write_counter(self._next)
+            self._next = self._limit = 0
+
+    def reset(self) -> None:
+        """Start again from 1 (fresh start of the data directory)."""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with file_lock(self.lock_path):
+                self.counter_path.unlink(missing_ok=True)
+            self._next = self._limit = 0
+
+    def _reserve(self) -> Tuple[int, int]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.lock_path):
+            start = self._read_counter()
+            if start is None:
+                start = (self.seed() if self.seed is not None else 0) + 1
+            self._write_counter(start + self.block)
+        return start, start + self.block
+
+    def _read_counter(self) -> Optional[int]:
+        try:
+            return int(self.counter_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            raise ValueError(f"corrupt id counter file {self.counter_path}") from None
+
+    def _write_counter(self, value: int) -> None:
+        atomic_write_text(self.counter_path, str(value), fsync=self.fsync)
+
+
+def max_numbered_id(ids: Iterable[str], prefix: str) -> int:
+    """Highest n among ids of the form ``prefix + n`` (0 if there are none)."""
+    best = 0
+    for item in ids:
+        if isinstance(item, str) and item.startswith(prefix) and item[len(prefix):].isdigit():
+            best = max(best, int(item[len(prefix):]))
+    return best
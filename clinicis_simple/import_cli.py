@@ -0,0 +1,73 @@
+"""Bulk import of patients or appointments from CSV or JSON-lines files.
+
+Examples::
+
+    python import_cli.py patients patients.csv
+    python import_cli.py appointments appointments.jsonl --results results.jsonl
+
+CSV files need a header row with the field names (pid,name,phone or
+appt_id,patient_id,doctor_id,datetime_str; appointments without an appt_id
+get a new one). Input is read row by row, and the data files are written
+once when the import is done.
+"""
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from clinic import Clinic, RowResult
+from sqlite_storage import SqliteStorage
+
+
+def read_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(fh)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import into the clinic data files")
+    parser.add_argument("kind", choices=["patients", "appointments"])
+    parser.add_argument("path", type=Path, help="CSV or .jsonl input file")
+    parser.add_argument("--data-dir", type=Path, default=None, help="defaults to ./data next to this script")
+    parser.add_argument("--journaled", action="store_true", help="data dir uses the journaled mode")
+    parser.add_argument("--db", type=Path, default=None, help="import into an SQLite database instead")
+    parser.add_argument("--results", type=Path, default=None, help="write per-row results as JSON lines")
+    args = parser.parse_args()
+
+    storage = SqliteStorage(args.db) if args.db else None
+    store = Clinic(data_dir=args.data_dir, journaled=args.journaled, storage=storage)
+    if storage is None:
+        store.load_from_files()
+
+    counts = {"ok": 0, "failed": 0}
+    out = open(args.results, "w", encoding="utf-8") if args.results else None
+
+    def on_result(result: RowResult) -> None:
+        counts["ok" if result.ok else "failed"] += 1
+        if out is not None:
+            out.write(json.dumps(result._asdict()) + "\n")
+        elif not result.ok:
+            print(f"row {result.row} ({result.key}): {result.error}", file=sys.stderr)
+
+    try:
+        if args.kind == "patients":
+            store.bulk_add_patients(read_rows(args.path), on_result=on_result)
+        else:
+            store.bulk_schedule(read_rows(args.path), on_result=on_result)
+    finally:
+        if out is not None:
+            out.close()
+        store.close()
+    print(f"Imported {counts['ok']} {args.kind}, {counts['failed']} rows rejected")
+    return 0 if counts["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Append-only write-ahead journal for Clinic mutations.
+
+Each Clinic mutation appends one compact JSON line ``{"s": seq, "c": [change, ...]}``
+to the current segment file. Changes carry the resulting state (upserts,
+deletes, set membership), so replaying a record twice gives the same result;
+that keeps recovery correct if a crash hits in the middle of a compaction.
+
+Compaction seals the current segment, folds the sealed segments into the
+snapshot files (patients/doctors/appointments.json) and records the last
+folded sequence number in ``journal.meta``. Only then are the sealed
+segments deleted.
+"""
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from fileio import atomic_write_text, fsync_dir
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "journal.meta"
+SEGMENT_GLOB = "journal-*.log"
+
+# Raw state as loaded from the snapshot files: {"patients": {pid: row}, "doctors": {...}, "appointments": {...}}
+State = Dict[str, Dict[str, Dict[str, Any]]]
+
+
+def apply_change(state: State, change: List[Any]) -> None:
+    kind = change[0]
+    if kind == "patient":
+        state["patients"][change[1]["pid"]] = dict(change[1])
+    elif kind == "doctor":
+        state["doctors"][change[1]["pid"]] = dict(change[1])
+    elif kind == "appt":
+        state["appointments"][change[1]["appt_id"]] = dict(change[1])
+    elif kind == "appt_del":
+        state["appointments"].pop(change[1], None)
+    elif kind in ("slot_add", "slot_del"):
+        doc = state["doctors"].get(change[1])
+        if doc is None:
+            return
+        schedule = doc.setdefault("schedule", [])
+        if kind == "slot_add" and change[2] not in schedule:
+            schedule.append(change[2])
+        elif kind == "slot_del" and change[2] in schedule:
+            schedule.remove(change[2])
+    elif kind == "visit":
+        # ["visit", pid, index, note]: only applies once, at the expected position
+        patient = state["patients"].get(change[1])
+        if patient is not None:
+            visits = patient.setdefault("visits", [])
+            if len(visits) == change[2]:
+                visits.append(change[3])
+    else:
+        logger.warning("Unknown journal change %r", kind)
+
+
+class Journal:
+    def __init__(self, directory: Path, fsync: bool = True) -> None:
+        self.directory = Path(directory)
+        self.fsync = fsync
+        self.pending = 0  # records appended since the last seal
+        self._lock = threading.Lock()
+        self._file = None
+        # group commit: one fsync covers every record written before it started
+        self._sync_cond = threading.Condition()
+        self._synced = 0  # highest seq known to be on disk
+        self._syncing = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.seq = self.snapshot_seq()
+        existing = self.segments()
+        for path in existing:
+            self.seq = max(self.seq, self._last_seq(path))
+        # never append to an older segment: its tail may be torn
+        self._segment_no = self._segment_number(existing[-1]) if existing else 0
+        self._open_next_segment()
+
+    # -- writing -----------------------------------------------------------------
+
+    def append(self, changes: List[List[Any]]) -> int:
+        """Append one record and make it durable; return its sequence number.
+
+        Threads appending at the same time share fsyncs: whoever finds no sync
+        in progress syncs everything written so far, the others wait for it.
+        """
+        with self._lock:
+            self.seq += 1
+            seq = self.seq
+            line = json.dumps({"s": seq, "c": changes}, separators=(",", ":"))
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.pending += 1
+        if self.fsync:
+            self._sync_through(seq)
+        return seq
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            seq = self.seq
+        self._sync_through(seq)
+
+    def _sync_through(self, seq: int) -> None:
+        with self._sync_cond:
+            while self._synced < seq:
+                if self._syncing:
+                    self._sync_cond.wait()
+                    continue
+                self._syncing = True
+                with self._lock:
+                    target = self.seq
+                    fd = self._file.fileno() if self._file is not None else None
+                self._sync_cond.release()
+                try:
+                    if fd is not None:
+                        os.fsync(fd)
+                finally:
+                    self._sync_cond.acquire()
+                    self._syncing = False
+                    self._sync_cond.notify_all()
+                self._synced = max(self._synced, target)
+
+    @contextmanager
+    def _no_sync(self) -> Iterator[None]:
+        """Keep group syncs out while the live file is swapped or closed."""
+        with self._sync_cond:
+            while self._syncing:
+                self._sync_cond.wait()
+            self._syncing = True
+        try:
+            yield
+        finally:
+            with self._sync_cond:
+                self._syncing = False
+                self._sync_cond.notify_all()
+
+    def seal(self) -> List[Path]:
+        """Close the live segment and start a new one; return all sealed segments."""
+        with self._no_sync(), self._lock:
+            self._open_next_segment()
+            self.pending = 0
+            return [p for p in self.segments() if self._segment_number(p) < self._segment_no]
+
+    def commit_snapshot(self, seq: int, sealed: Iterable[Path]) -> None:
+        """Record that the snapshot files include everything up to ``seq``, then drop the folded segments."""
+        atomic_write_text(self.directory / META_FILE, json.dumps({"seq": seq}), fsync=self.fsync)
+        for path in sealed:
+            path.unlink(missing_ok=True)
+        if self.fsync:
+            fsync_dir(self.directory)
+
+    def reset(self) -> None:
+        """Drop every segment and the snapshot marker (used by fresh starts)."""
+        with self._no_sync(), self._lock:
+            self._close_file()
+            for path in self.segments():
+                path.unlink()
+            (self.directory / META_FILE).unlink(missing_ok=True)
+            self.seq = 0
+            self._synced = 0
+            self.pending = 0
+            self._segment_no = 0
+            self._open_next_segment()
+
+    def close(self) -> None:
+        with self._no_sync(), self._lock:
+            self._close_file()
+
+    # -- reading -----------------------------------------------------------------
+
+    def snapshot_seq(self) -> int:
+        try:
+            return int(json.loads((self.directory / META_FILE).read_text(encoding="utf-8"))["seq"])
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return 0
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob(SEGMENT_GLOB), key=self._segment_number)
+
+    def replay_into(self, state: State, segments: Optional[Iterable[Path]] = None) -> int:
+        """Apply every record newer than the snapshot to ``state``; return the last applied seq."""
+        last = self.snapshot_seq()
+        for path in self.segments() if segments is None else segments:
+            for record in self._read_segment(path):
+                if record["s"] <= last:
+                    continue
+                for change in record["c"]:
+                    apply_change(state, change)
+                last = record["s"]
+        return last
+
+    # -- helpers -----------------------------------------------------------------
+
+    @staticmethod
+    def _segment_number(path: Path) -> int:
+        return int(path.stem.split("-", 1)[1])
+
+    @staticmethod
+    def _read_segment(path: Path):
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # torn write at the tail of a segment: the mutation never completed
+                    logger.warning("Ignoring incomplete journal record in %s", path.name)
+                    return
+                yield record
+
+    def _open_next_segment(self) -> None:
+        self._close_file()
+        self._segment_no += 1
+        path = self.directory / f"journal-{self._segment_no:06d}.log"
+        self._file = open(path, "a", encoding="utf-8")
+        if self.fsync:
+            fsync_dir(self.directory)
+
+    def _last_seq(self, path: Path) -> int:
+        last = 0
+        for record in self._read_segment(path):
+            last = record["s"]
+        return last
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+        self._synced = self.seq
@@ -0,0 +1,119 @@
+"""Record-by-record reading and writing of the JSON data files.
+
+``iter_records`` yields one dict at a time from either a JSON array (the
+format of data/*.json) or JSON-lines, without holding the whole file text.
+``write_records`` streams rows out in the same layout ``json.dumps(rows,
+indent=2)`` produces, so the files stay byte-for-byte compatible.
+"""
+import json
+import re
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, TextIO
+
+from fileio import atomic_text_writer
+
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\n\r"
+_SKIP_WS = re.compile(r"[ \t\n\r]*").match
+
+
+def iter_records(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    with open(path, "r", encoding="utf-8") as fh:
+        head = fh.read(1)
+        while head and head in _WHITESPACE:
+            head = fh.read(1)
+        if not head:
+            raise json.JSONDecodeError("Expecting value", "", 0)
+        if head == "[":
+            yield from _iter_array(fh, chunk_size)
+        else:
+            for line in chain([head + fh.readline()], fh):
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _iter_array(fh: TextIO, chunk_size: int) -> Iterator[Any]:
+    """Yield the items of a JSON array whose opening '[' was already consumed."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        more = fh.read(chunk_size)
+        if not more:
+            eof = True
+            return False
+        buf = buf[pos:] + more
+        pos = 0
+        return True
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            pos = _SKIP_WS(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                raise json.JSONDecodeError("Unterminated array", buf, pos)
+
+    if next_char() == "]":
+        return
+    while True:
+        next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # the value is cut off at the end of the buffer
+                if eof or not fill():
+                    raise
+                continue
+            if end == len(buf) and not eof and fill():
+                continue  # a number/literal could continue in the next chunk
+            break
+        pos = end
+        yield value
+        sep = next_char()
+        pos += 1
+        if sep == "]":
+            return
+        if sep != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos - 1)
+
+
+def write_records(
+    path: Path,
+    rows: Iterable[Any],
+    indent: Optional[int] = 2,
+    jsonl: bool = False,
+    fsync: bool = True,
+    batch: int = 1000,
+) -> int:
+    """Stream ``rows`` to ``path`` atomically; return how many were written.
+
+    Rows are encoded ``batch`` at a time: each batch is dumped as a small list
+    and its brackets are stripped, which keeps the exact ``json.dumps`` layout
+    while holding only one batch of text in memory.
+    """
+    count = 0
+    separators = None if indent else (",", ":")
+    it = iter(rows)
+    with atomic_text_writer(path, fsync=fsync) as fh:
+        while True:
+            chunk = list(islice(it, batch))
+            if not chunk:
+                break
+            if jsonl:
+                fh.write("".join(json.dumps(row, separators=(",", ":")) + "\n" for row in chunk))
+            else:
+                text = json.dumps(chunk, indent=indent, separators=separators)
+                # "[\n  {...},\n  {...}\n]" -> the items with their indentation
+                inner = text[2:-2] if indent else text[1:-1]
+                item_sep = ",\n" if indent else ","
+                fh.write(("[\n" if indent else "[") if count == 0 else item_sep)
+                fh.write(inner)
+            count += len(chunk)
+        if not jsonl:
+            fh.write(("\n]" if indent else "]") if count else "[]")
+    return count
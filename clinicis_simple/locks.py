@@ -0,0 +1,118 @@
+"""Locks for concurrent Clinic mutations.
+
+Clinic methods take the store lock in shared mode plus the key locks of the
+doctor, patient and appointment they touch, so bookings for different
+doctors and patients run side by side. ``with store.lock:`` takes the store
+lock exclusively, for anything that must see or change the whole store at
+once (snapshots, batches, loading).
+"""
+import threading
+from contextlib import contextmanager
+from typing import Hashable, Iterator, List
+
+KEY_STRIPES = 1024
+
+
+class SharedLock:
+    """Reentrant exclusive lock that can also be held shared by many threads.
+
+    The exclusive holder may take it shared as well (nested Clinic calls
+    inside ``with store.lock:``). A shared holder cannot upgrade. Waiting
+    exclusive holders go before new shared ones, so a steady stream of
+    mutations cannot starve a snapshot.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._owner = None
+        self._depth = 0
+        self._shared = 0
+        self._waiting = 0
+        self._local = threading.local()
+
+    def acquire(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return
+            if getattr(self._local, "depth", 0):
+                raise RuntimeError("cannot take the lock exclusively while holding it shared")
+            self._waiting += 1
+            try:
+                while self._owner is not None or self._shared:
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            self._owner = me
+            self._depth = 1
+
+    def release(self) -> None:
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("cannot release un-acquired lock")
+            self._depth -= 1
+            if not self._depth:
+                self._owner = None
+                self._cond.notify_all()
+
+    def owned(self) -> bool:
+        """True if the calling thread holds the lock exclusively."""
+        return self._owner == threading.get_ident()
+
+    def __enter__(self) -> "SharedLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        # only this thread can have set _owner to its own id, so reading it unlocked is safe
+        if depth or self._owner == threading.get_ident():
+            local.depth = depth + 1
+            try:
+                yield
+            finally:
+                local.depth = depth
+            return
+        with self._cond:
+            while self._owner is not None or self._waiting:
+                self._cond.wait()
+            self._shared += 1
+        local.depth = 1
+        try:
+            yield
+        finally:
+            local.depth = 0
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+
+class KeyLocks:
+    """A fixed pool of locks, picked by key hash (lock striping).
+
+    Memory stays constant however many patients and doctors there are; two
+    keys that share a stripe just serialize. Stripes are always taken in
+    ascending order, so holders of several keys cannot deadlock.
+    """
+
+    def __init__(self, stripes: int = KEY_STRIPES) -> None:
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    @contextmanager
+    def hold(self, *keys: Hashable) -> Iterator[None]:
+        count = len(self._locks)
+        locks: List[threading.Lock] = [self._locks[i] for i in sorted({hash(key) % count for key in keys})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
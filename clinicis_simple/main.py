@@ -19,15 +19,17 @@ def demo():
     store.add_doctor(d2)
 
     # schedule
-    a1 = store.schedule_appointment("a1", "p1", "d1", "2026-01-15 10:00")
-    a2 = store.schedule_appointment("a2", "p2", "d2", "2026-01-15 11:00")
-
-    # logical methods
-    if a1:
-        store.reschedule_appointment("a1", "2026-01-15 12:00")
-    if a2:
-        store.cancel_appointment("a2")
-    store.complete_appointment("a1", "Routine check complete")
+    a1 = store.schedule_appointment(store.next_appt_id(), "p1", "d1", "2026-01-15 10:00")
+    a2 = store.schedule_appointment(store.next_appt_id(), "p2", "d2", "2026-01-15 11:00")
+
+    # logical methods, as one transaction: all of them are applied and saved together, or none
+    with store.transaction() as tx:
+        if a1:
+            tx.reschedule_appointment(a1.appt_id, "2026-01-15 12:00")
+        if a2:
+            tx.cancel_appointment(a2.appt_id)
+        if a1:
+            tx.complete_appointment(a1.appt_id, "Routine check complete")
 
     p1.add_visit("Follow-up in 3 months")
     print("History p1:", p1.get_history())
@@ -0,0 +1,283 @@
+"""Opt-in call counts, latency histograms and payload sizes for hot paths.
+
+Functions marked ``@hot_path("clinic.schedule_appointment")`` run
+untouched until ``enable()`` is called: only then are they replaced (on
+their class or module) by a timing wrapper, and ``disable()`` puts the
+originals back, so a disabled build pays nothing per call. A ``size``
+callable, given the result and the call's arguments, adds a payload
+histogram (rows loaded, files written, hits returned...).
+
+Results come out as Prometheus text or JSON (``Registry.prometheus_text``,
+``Registry.to_json``, ``Registry.write``), over a local HTTP endpoint
+(``serve``), and from ``GET /metrics`` of service.py. With a
+``profile_rate`` a random share of the instrumented calls also runs under
+cProfile; ``Registry.dump_profile`` writes the combined stats for pstats
+or snakeviz.
+
+The GUI and the service switch this on from the environment:
+
+- ``CLINIC_METRICS=metrics.prom`` (or ``.json``): write the metrics there on exit
+- ``CLINIC_METRICS_PORT=9100``: serve ``/metrics`` and ``/metrics.json`` on localhost
+- ``CLINIC_PROFILE=calls.pstats`` (``CLINIC_PROFILE_RATE``, default 0.01): sample cProfile
+"""
+import atexit
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fileio import atomic_write_text
+
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+SizeFn = Callable[..., int]
+
+# every @hot_path function: (function, metric name, size callable)
+_hot_paths: List[Tuple[Callable[..., Any], str, Optional[SizeFn]]] = []
+# (owner, attribute, original) of each installed wrapper, for disable()
+_installed: List[Tuple[Any, str, Callable[..., Any]]] = []
+_registry: Optional["Registry"] = None
+# cProfile cannot run two profilers at once; a sampled call skips profiling while another is
+_profiling = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else repr(bound)] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class Metric:
+    __slots__ = ("errors", "latency", "size")
+
+    def __init__(self) -> None:
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size: Optional[Histogram] = None
+
+
+class Registry:
+    def __init__(self, profile_rate: float = 0.0) -> None:
+        self.profile_rate = profile_rate
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+        self._profile: Optional[pstats.Stats] = None
+
+    def observe(self, name: str, seconds: float, size: Optional[int] = None, error: bool = False) -> None:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric()
+            metric.latency.observe(seconds)
+            if error:
+                metric.errors += 1
+            if size is not None:
+                if metric.size is None:
+                    metric.size = Histogram(SIZE_BUCKETS)
+                metric.size.observe(size)
+
+    def add_profile(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            if self._profile is None:
+                self._profile = pstats.Stats(profile)
+            else:
+                self._profile.add(profile)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = {
+                name: {
+                    "errors": metric.errors,
+                    "seconds": metric.latency.to_dict(),
+                    "size": metric.size.to_dict() if metric.size is not None else None,
+                }
+                for name, metric in sorted(self._metrics.items())
+            }
+        return {"started": self.started, "uptime": time.time() - self.started, "calls": calls}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def prometheus_text(self) -> str:
+        calls = self.snapshot()["calls"]
+        lines = []
+        for family, key, help_text in (
+            ("clinic_call_seconds", "seconds", "Latency of instrumented calls."),
+            ("clinic_call_payload", "size", "Payload size of instrumented calls (rows, files or hits)."),
+        ):
+            lines += [f"# HELP {family} {help_text}", f"# TYPE {family} histogram"]
+            for name, call in calls.items():
+                histogram = call[key]
+                if histogram is None:
+                    continue
+                for bound, count in histogram["buckets"].items():
+                    lines.append(f'{family}_bucket{{op="{name}",le="{bound}"}} {count}')
+                lines.append(f'{family}_sum{{op="{name}"}} {histogram["sum"]}')
+                lines.append(f'{family}_count{{op="{name}"}} {histogram["count"]}')
+        lines += ["# HELP clinic_call_errors_total Instrumented calls that raised.", "# TYPE clinic_call_errors_total counter"]
+        lines += [f'clinic_call_errors_total{{op="{name}"}} {call["errors"]}' for name, call in calls.items()]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        """Write the metrics to ``path``: JSON for a .json file, Prometheus text otherwise."""
+        path = Path(path)
+        atomic_write_text(path, self.to_json() if path.suffix == ".json" else self.prometheus_text(), fsync=False)
+
+    def dump_profile(self, path: Path) -> bool:
+        """Write the sampled cProfile stats to ``path``; False if nothing was sampled yet."""
+        with self._lock:
+            if self._profile is None:
+                return False
+            self._profile.dump_stats(str(path))
+            return True
+
+
+def hot_path(name: str, size: Optional[SizeFn] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Mark a function or method for instrumentation; it stays the plain function while disabled.
+
+    enable() wraps the hot paths of the modules imported by then.
+    """
+
+    def mark(func: Callable[..., Any]) -> Callable[..., Any]:
+        _hot_paths.append((func, name, size))
+        return func
+
+    return mark
+
+
+def _wrap(func: Callable[..., Any], name: str, size: Optional[SizeFn], registry: Registry) -> Callable[..., Any]:
+    observe = registry.observe
+    clock = time.perf_counter
+
+    @functools.wraps(func)
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        rate = registry.profile_rate
+        if rate and random.random() < rate and _profiling.acquire(blocking=False):
+            try:
+                profile = cProfile.Profile()
+                started = clock()
+                try:
+                    result = profile.runcall(func, *args, **kwargs)
+                except BaseException:
+                    observe(name, clock() - started, error=True)
+                    raise
+            finally:
+                _profiling.release()
+            registry.add_profile(profile)
+        else:
+            started = clock()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                observe(name, clock() - started, error=True)
+                raise
+        seconds = clock() - started
+        observe(name, seconds, size(result, *args, **kwargs) if size is not None else None)
+        return result
+
+    timed.__metric_original__ = func
+    return timed
+
+
+def _owner(func: Callable[..., Any]) -> Tuple[Any, str]:
+    """The class or module holding ``func`` under its name."""
+    owner: Any = sys.modules[func.__module__]
+    *path, attribute = func.__qualname__.split(".")
+    for part in path:
+        owner = getattr(owner, part)
+    return owner, attribute
+
+
+def enable(profile_rate: float = 0.0) -> Registry:
+    """Start recording (again, with a fresh Registry if it was on) and return the registry."""
+    global _registry
+    disable()
+    _registry = Registry(profile_rate)
+    for func, name, size in _hot_paths:
+        owner, attribute = _owner(func)
+        _installed.append((owner, attribute, func))
+        setattr(owner, attribute, _wrap(func, name, size, _registry))
+    return _registry
+
+
+def disable() -> None:
+    global _registry
+    for owner, attribute, original in reversed(_installed):
+        setattr(owner, attribute, original)
+    _installed.clear()
+    _registry = None
+
+
+def registry() -> Optional[Registry]:
+    """The registry being recorded into; None while disabled."""
+    return _registry
+
+
+def serve(registry: Registry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` (Prometheus text) and ``/metrics.json`` from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path == "/metrics":
+                body, kind = registry.prometheus_text(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, kind = registry.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def enable_from_env() -> Optional[Registry]:
+    """enable() as configured by CLINIC_METRICS / CLINIC_METRICS_PORT / CLINIC_PROFILE; None if unset."""
+    out, port, profile = (os.environ.get(name) for name in ("CLINIC_METRICS", "CLINIC_METRICS_PORT", "CLINIC_PROFILE"))
+    if not (out or port or profile):
+        return None
+    rate = float(os.environ.get("CLINIC_PROFILE_RATE", "0.01")) if profile else 0.0
+    current = enable(profile_rate=rate)
+    if port:
+        serve(current, int(port))
+    if out:
+        atexit.register(current.write, Path(out))
+    if profile:
+        atexit.register(current.dump_profile, Path(profile))
+    return current
@@ -1,42 +1,129 @@
-from typing import Any, Dict, List, Optional
+import logging
+import sys
+from array import array
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from audit import emit as emit_audit
+from history_store import HistoryStore, PatientHistory
+from schedule import DEFAULT_SLOT_MINUTES, Schedule, datetime_key, key_to_str
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _public_slots(cls: type) -> Tuple[str, ...]:
+    names: List[str] = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get("__slots__", ()):
+            if not name.startswith("_") and name not in names:
+                names.append(name)
+    return tuple(names)
 
 
 class SerializableMixin:
+    # models use __slots__ (no per-instance __dict__), so fields come from the slot declarations
+    __slots__ = ()
+
     def to_dict(self) -> Dict[str, Any]:
-        return dict(self.__dict__)
+        return {name: getattr(self, name) for name in _public_slots(type(self))}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        return cls(**data)
 
 
 class AuditableMixin:
-    def audit(self, msg: str) -> None:
-        print(f"[AUDIT] {msg}")
+    __slots__ = ()
+
+    def audit(self, action: str, entity: str, **details: Any) -> None:
+        # formatting and output are up to the installed sink (see audit.py)
+        emit_audit(action, entity, **details)
+
+
+class TrackedMixin:
+    """Reports changes to the ``_tracker`` set by the Clinic holding the object (see Clinic._track)."""
+
+    __slots__ = ()
+    _kind = ""  # "patients", "doctors" or "appointments"
+    _key_attr = ""
+
+    def _changed(self) -> None:
+        tracker = self._tracker
+        if tracker is not None:
+            tracker.mark(self._kind, getattr(self, self._key_attr))
 
 
-class Person:
+def track(objects: Iterable[TrackedMixin], tracker) -> None:
+    """Hand ``tracker`` (the holding Clinic's, or None to stop tracking) to every object."""
+    for obj in objects:
+        obj._tracker = tracker
+
+
+class Person(SerializableMixin, TrackedMixin):
+    __slots__ = ("pid", "name", "phone", "_tracker")
+    _key_attr = "pid"
+
     def __init__(self, pid: str, name: str, phone: str) -> None:
         self.pid = pid
         self.name = name
         self.phone = phone
+        self._tracker = None
 
     def update_phone(self, new_phone: str) -> None:
-        self.phone = new_phone
+        old, self.phone = self.phone, new_phone
+        tracker = self._tracker
+        if tracker is not None:
+            tracker.phone_changed(self, old)  # the Clinic's search index looks people up by phone
+        self._changed()
 
     def get_contact(self) -> str:
         return f"Name: {self.name}, Phone: {self.phone}"
 
 
 class Patient(Person):
+    __slots__ = ("visits",)
+    _kind = "patients"
+
     def __init__(self, pid: str, name: str, phone: str, visits: Optional[List[str]] = None) -> None:
         super().__init__(pid, name, phone)
-        self.visits: List[str] = list(visits or [])
+        # a plain list until attach_history() moves the visits into a HistoryStore
+        self.visits: Union[List[str], PatientHistory] = list(visits or [])
 
     def add_visit(self, note: str) -> None:
         self.visits.append(note)
+        if isinstance(self.visits, list):  # an attached history is saved by its HistoryStore
+            self._changed()
+
+    def get_history(self, start: int = 0, limit: Optional[int] = None) -> List[str]:
+        """Visit notes, oldest first; ``start`` and ``limit`` select one page."""
+        stop = None if limit is None else start + limit
+        return list(self.visits[start:stop])
 
-    def get_history(self) -> List[str]:
-        return list(self.visits)
+    def attach_history(self, store: HistoryStore) -> None:
+        """Keep this patient's visits in ``store`` from now on; notes held so far are moved there once."""
+        visits = self.visits
+        if isinstance(visits, PatientHistory):
+            if visits.store is store:
+                return
+            visits = list(visits)
+        store.adopt(self.pid, visits)
+        self.visits = store.history(self.pid)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = super().to_dict()
+        # attached histories live in their own file, not in the patient rows
+        visits = data.pop("visits")
+        if isinstance(visits, list):
+            data["visits"] = list(visits)
+        return data
 
 
 class Doctor(Person):
+    __slots__ = ("specialty", "slot_minutes", "schedule")
+    _kind = "doctors"
+
     def __init__(
         self,
         pid: str,
@@ -44,39 +131,90 @@ class Doctor(Person):
         phone: str,
         specialty: str,
         schedule: Optional[List[str]] = None,
+        slot_minutes: int = DEFAULT_SLOT_MINUTES,
     ) -> None:
         super().__init__(pid, name, phone)
         self.specialty = specialty
-        self.schedule: List[str] = list(schedule or [])
+        self.slot_minutes = slot_minutes
+        self.schedule = Schedule(schedule or [], slot_minutes)
 
     def is_available(self, datetime_str: str) -> bool:
-        return datetime_str not in self.schedule
+        return self.schedule.is_free(datetime_str)
 
     def add_appointment(self, datetime_str: str) -> None:
-        if datetime_str not in self.schedule:
-            self.schedule.append(datetime_str)
+        self.schedule.add(datetime_str)
+        self._changed()
+
+    def remove_appointment(self, datetime_str: str) -> bool:
+        if self.schedule.discard(datetime_str):
+            self._changed()
+            return True
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = super().to_dict()
+        data["schedule"] = self.schedule.to_list()
+        return data
 
 
-class Appointment(SerializableMixin, AuditableMixin):
+class AppointmentStatus(str, Enum):
+    SCHEDULED = "scheduled"
+    CANCELLED = "cancelled"
+    COMPLETED = "completed"
+
+
+def loaded_status(value: str, appt_id: str) -> str:
+    """``value`` if it is a known status, otherwise "scheduled" (as for a row without one), logged."""
+    if value in STATUS_CODES:
+        return value
+    logger.warning("Appointment %s has unknown status %r; loading it as scheduled", appt_id, value)
+    return AppointmentStatus.SCHEDULED.value
+
+
+class Appointment(SerializableMixin, AuditableMixin, TrackedMixin):
+    # the time is kept as integer minutes (see schedule.datetime_key) and the
+    # status as a shared enum member; both are exposed as the usual strings
+    __slots__ = ("appt_id", "patient_id", "doctor_id", "summary", "_when", "_status", "_tracker")
+    _kind = "appointments"
+    _key_attr = "appt_id"
+
     def __init__(
         self,
         appt_id: str,
         patient_id: str,
         doctor_id: str,
-        datetime_str: str,
+        datetime_str: Union[str, int],
         status: str = "scheduled",
         summary: str = "",
-        patient_obj=None,
-        doctor_obj=None,
     ) -> None:
         self.appt_id = appt_id
-        self.patient_id = patient_id
-        self.doctor_id = doctor_id
+        self.patient_id = sys.intern(patient_id)
+        self.doctor_id = sys.intern(doctor_id)
         self.datetime_str = datetime_str
         self.status = status
         self.summary = summary
-        self.patient_obj = patient_obj
-        self.doctor_obj = doctor_obj
+        self._tracker = None
+
+    @property
+    def datetime_str(self) -> str:
+        return key_to_str(self._when)
+
+    @datetime_str.setter
+    def datetime_str(self, value: Union[str, int]) -> None:
+        self._when = value if isinstance(value, int) else datetime_key(value)
+
+    @property
+    def slot_key(self) -> Union[int, str]:
+        """Minutes since year 1 for a recognised time, otherwise the raw string."""
+        return self._when
+
+    @property
+    def status(self) -> str:
+        return self._status.value
+
+    @status.setter
+    def status(self, value: str) -> None:
+        self._status = AppointmentStatus(value)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -95,22 +233,85 @@ class Appointment(SerializableMixin, AuditableMixin):
             data.get("patient_id", ""),
             data.get("doctor_id", ""),
             data.get("datetime_str", ""),
-            data.get("status", "scheduled"),
+            loaded_status(data.get("status", "scheduled"), data.get("appt_id", "")),
             data.get("summary", ""),
-            patient_obj=None,
-            doctor_obj=None,
         )
 
     def reschedule(self, new_datetime: str) -> None:
         old = self.datetime_str
         self.datetime_str = new_datetime
-        self.audit(f"Rescheduled {self.appt_id}: {old} -> {new_datetime}")
+        self._changed()
+        self.audit("rescheduled", self.appt_id, old=old, new=new_datetime)
 
     def cancel(self) -> None:
         self.status = "cancelled"
-        self.audit(f"Cancelled {self.appt_id}")
+        self._changed()
+        self.audit("cancelled", self.appt_id)
 
     def complete(self, summary: str) -> None:
         self.status = "completed"
         self.summary = summary
-        self.audit(f"Completed {self.appt_id} with summary")
+        self._changed()
+        self.audit("completed", self.appt_id)
+
+
+STATUS_VALUES = [status.value for status in AppointmentStatus]
+STATUS_CODES = {value: code for code, value in enumerate(STATUS_VALUES)}
+
+
+class AppointmentTable:
+    """Appointments stored column-wise in typed arrays.
+
+    Patient/doctor ids and summaries are codes into one shared string table
+    (appointment ids are unique, so they are kept as a plain list), statuses
+    are one byte and times are integer minutes. A time that is not a recognised
+    date/time is stored as ``-1 - code`` of its string. Rows are turned back
+    into Appointment objects only when read.
+    """
+
+    def __init__(self, appointments: Iterable[Appointment] = ()) -> None:
+        self.strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self.appt_ids: List[str] = []
+        self.patient_ids = array("L")
+        self.doctor_ids = array("L")
+        self.when = array("q")
+        self.status = array("B")
+        self.summaries = array("L")
+        for appt in appointments:
+            self.append(appt)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def append(self, appt: Appointment) -> None:
+        key = appt.slot_key
+        self.appt_ids.append(appt.appt_id)
+        self.patient_ids.append(self.code(appt.patient_id))
+        self.doctor_ids.append(self.code(appt.doctor_id))
+        self.when.append(key if isinstance(key, int) else -1 - self.code(key))
+        self.status.append(STATUS_CODES[appt.status])
+        self.summaries.append(self.code(appt.summary))
+
+    def __len__(self) -> int:
+        return len(self.appt_ids)
+
+    def __getitem__(self, row: int) -> Appointment:
+        strings = self.strings
+        when = self.when[row]
+        return Appointment(
+            self.appt_ids[row],
+            strings[self.patient_ids[row]],
+            strings[self.doctor_ids[row]],
+            when if when >= 0 else strings[-1 - when],
+            STATUS_VALUES[self.status[row]],
+            strings[self.summaries[row]],
+        )
+
+    def __iter__(self) -> Iterator[Appointment]:
+        for row in range(len(self)):
+            yield self[row]
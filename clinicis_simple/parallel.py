@@ -0,0 +1,208 @@
+"""Bulk jobs over all appointments, fanned out to a process pool by doctor (or patient).
+
+The owners (doctor or patient ids) are split into shards by a stable hash
+(shards.shard_of), each shard is handled by one task of a
+``concurrent.futures`` process pool, and the per-owner results are merged
+in owner order, so the outcome does not depend on the number of workers or
+on which task finishes first.
+
+Where the platform can fork, the workers inherit the parent's store and
+read each owner's appointments straight from its indexes; nothing but owner
+ids and results is pickled. Elsewhere, and for a store on a storage backend
+(whose database connection a forked child must not use), each shard's
+appointments are shipped as an AppointmentTable (a few typed arrays and one
+string table).
+
+Jobs:
+
+- ``doctor_conflicts`` / ``patient_conflicts``: active appointments that
+  overlap for one doctor (by the doctor's slot length) or that put one
+  patient in two places at the same time
+- ``schedules``: each doctor's booked starts, rebuilt from the appointments
+- ``agendas``: one CSV per doctor with their non-cancelled appointments
+"""
+import csv
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from fileio import atomic_write_text
+from models import Appointment, AppointmentTable
+from schedule import DEFAULT_SLOT_MINUTES, Schedule
+from shards import shard_of
+
+SHARDS_PER_WORKER = 4  # more, smaller tasks even out doctors of very different sizes
+ACTIVE_STATUSES = ("scheduled", "completed")
+
+# the store a forked worker inherited from its parent; set only around a fork pool's lifetime
+_inherited = None
+
+
+class Conflict(NamedTuple):
+    kind: str  # "doctor" or "patient"
+    owner: str
+    first: str  # appointment ids, the earlier one first
+    second: str
+    datetime_str: str  # when the second one starts
+
+
+class _Owner(NamedTuple):
+    """What a worker needs to know about a doctor besides the appointments."""
+
+    pid: str
+    slot_minutes: int
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _doctor_conflicts(owner: _Owner, appts: List[Appointment], options: Dict[str, Any]) -> List[Conflict]:
+    active = [a for a in appts if a.status in ACTIVE_STATUSES]
+    timed = sorted((a for a in active if isinstance(a.slot_key, int)), key=lambda a: (a.slot_key, a.appt_id))
+    found = []
+    # the appointment that keeps the doctor busy longest so far, and until when
+    holder: Optional[Appointment] = None
+    busy_until = 0
+    for appt in timed:
+        if holder is not None and appt.slot_key < busy_until:
+            found.append(Conflict("doctor", owner.pid, holder.appt_id, appt.appt_id, appt.datetime_str))
+        if holder is None or appt.slot_key + owner.slot_minutes > busy_until:
+            holder, busy_until = appt, appt.slot_key + owner.slot_minutes
+    # unrecognised times only clash with the very same string
+    return found + _same_time(owner, [a for a in active if not isinstance(a.slot_key, int)], "doctor")
+
+
+def _patient_conflicts(owner: _Owner, appts: List[Appointment], options: Dict[str, Any]) -> List[Conflict]:
+    return _same_time(owner, [a for a in appts if a.status in ACTIVE_STATUSES], "patient")
+
+
+def _same_time(owner: _Owner, appts: List[Appointment], kind: str) -> List[Conflict]:
+    first_at: Dict[Any, str] = {}
+    found = []
+    for appt in sorted(appts, key=lambda a: (_sort_key(a), a.appt_id)):
+        other = first_at.setdefault(appt.slot_key, appt.appt_id)
+        if other != appt.appt_id:
+            found.append(Conflict(kind, owner.pid, other, appt.appt_id, appt.datetime_str))
+    return found
+
+
+def _schedule_parts(owner: _Owner, appts: List[Appointment], options: Dict[str, Any]) -> Tuple[List[int], List[str]]:
+    starts, legacy = set(), set()
+    for appt in appts:
+        if appt.status in ACTIVE_STATUSES:
+            key = appt.slot_key
+            (starts if isinstance(key, int) else legacy).add(key)
+    return sorted(starts), sorted(legacy)
+
+
+def _agenda(owner: _Owner, appts: List[Appointment], options: Dict[str, Any]) -> int:
+    rows = sorted((a for a in appts if a.status != "cancelled"), key=lambda a: (_sort_key(a), a.appt_id))
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["datetime", "appt_id", "patient_id", "status", "summary"])
+    for appt in rows:
+        writer.writerow([appt.datetime_str, appt.appt_id, appt.patient_id, appt.status, appt.summary])
+    atomic_write_text(Path(options["directory"]) / f"{owner.pid}.csv", out.getvalue(), fsync=options.get("fsync", True))
+    return len(rows)
+
+
+# name -> (owner kind, per-owner function)
+JOBS: Dict[str, Tuple[str, Callable[[_Owner, List[Appointment], Dict[str, Any]], Any]]] = {
+    "doctor_conflicts": ("doctor", _doctor_conflicts),
+    "patient_conflicts": ("patient", _patient_conflicts),
+    "schedules": ("doctor", _schedule_parts),
+    "agendas": ("doctor", _agenda),
+}
+
+
+def _sort_key(appt: Appointment) -> Tuple[int, Any]:
+    # unrecognised times (str keys) after every real one
+    key = appt.slot_key
+    return (0, key) if isinstance(key, int) else (1, key)
+
+
+def _run_shard(
+    job: str, owners: Sequence[_Owner], table: Optional[AppointmentTable], options: Dict[str, Any]
+) -> List[Tuple[str, Any]]:
+    """Worker entry point: (owner id, result) for every owner of one shard."""
+    kind, func = JOBS[job]
+    if table is None:
+        index = _inherited.appointments.for_doctor if kind == "doctor" else _inherited.appointments.for_patient
+        return [(owner.pid, func(owner, index(owner.pid), options)) for owner in owners]
+    grouped: Dict[str, List[Appointment]] = {owner.pid: [] for owner in owners}
+    field = "doctor_id" if kind == "doctor" else "patient_id"
+    for appt in table:
+        grouped[getattr(appt, field)].append(appt)
+    return [(owner.pid, func(owner, grouped[owner.pid], options)) for owner in owners]
+
+
+def run(store, job: str, workers: Optional[int] = None, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run ``job`` for every owner with appointments; return {owner id: result} in owner order.
+
+    The caller holds the store lock, so the appointments cannot change while
+    the workers read them. ``workers=1`` runs in this process.
+    """
+    global _inherited
+    kind, _ = JOBS[job]
+    options = options or {}
+    workers = workers or default_workers()
+    owners = _owners(store, kind)
+    if workers == 1 or len(owners) < 2:
+        _inherited = store
+        try:
+            return dict(_run_shard(job, owners, None, options))
+        finally:
+            _inherited = None
+
+    count = workers * SHARDS_PER_WORKER
+    shards: List[List[_Owner]] = [[] for _ in range(count)]
+    for owner in owners:
+        shards[shard_of(owner.pid, count)].append(owner)
+    shards = [shard for shard in shards if shard]
+    # a database connection must not be used from a forked child, so a storage backend's
+    # appointments are shipped as tables
+    forking = store.storage is None and "fork" in multiprocessing.get_all_start_methods()
+    if forking:
+        tables: List[Optional[AppointmentTable]] = [None] * len(shards)
+    else:
+        tables = _tables(store, kind, shards)
+    context = multiprocessing.get_context("fork" if forking else "spawn")
+
+    _inherited = store if forking else None
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=context) as pool:
+            parts = list(pool.map(_run_shard, [job] * len(shards), shards, tables, [options] * len(shards)))
+    finally:
+        _inherited = None
+    merged = {pid: result for part in parts for pid, result in part}
+    return {owner.pid: merged[owner.pid] for owner in owners}
+
+
+def _owners(store, kind: str) -> List[_Owner]:
+    appointments = store.appointments
+    ids = appointments.doctor_ids() if kind == "doctor" else appointments.patient_ids()
+    owners = []
+    for pid in sorted(ids):
+        doctor = store.doctors.get(pid) if kind == "doctor" else None
+        owners.append(_Owner(pid, doctor.slot_minutes if doctor else DEFAULT_SLOT_MINUTES))
+    return owners
+
+
+def _tables(store, kind: str, shards: List[List[_Owner]]) -> List[AppointmentTable]:
+    position = {owner.pid: i for i, shard in enumerate(shards) for owner in shard}
+    tables = [AppointmentTable() for _ in shards]
+    for appt in store.appointments:
+        tables[position[appt.doctor_id if kind == "doctor" else appt.patient_id]].append(appt)
+    return tables
+
+
+def schedules_from(parts: Dict[str, Tuple[List[int], List[str]]], doctors: Iterable) -> Dict[str, Schedule]:
+    """Schedules for ``doctors`` from the ``schedules`` job's results (empty for doctors without appointments)."""
+    return {
+        doctor.pid: Schedule.from_parts(*parts.get(doctor.pid, ((), ())), slot_minutes=doctor.slot_minutes)
+        for doctor in doctors
+    }
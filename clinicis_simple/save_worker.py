@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from clinic import Clinic
+
+logger = logging.getLogger(__name__)
+
+
+class SaveWorker:
+    """Persist a Clinic on a background thread.
+
+    ``request()`` only marks the state dirty; the thread waits until no new
+    request arrived for ``delay`` seconds and then saves once, so a burst of
+    clicks costs one write. Visit notes are queued by the store's HistoryStore
+    (write_behind) and written with the save as well. ``on_done`` is called
+    from the worker thread with ``None`` or the exception that made the save
+    fail.
+    """
+
+    def __init__(
+        self,
+        store: Clinic,
+        delay: float = 0.5,
+        on_done: Optional[Callable[[Optional[BaseException]], None]] = None,
+    ) -> None:
+        self.store = store
+        self.delay = delay
+        self.on_done = on_done
+        if store.history is not None:
+            store.history.write_behind = True
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._saving = False
+        self._closed = False
+        self._last_request = 0.0
+        self._thread = threading.Thread(target=self._run, name="clinic-saver", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> bool:
+        with self._cond:
+            return self._dirty or self._saving
+
+    def request(self) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SaveWorker is closed")
+            self._dirty = True
+            self._last_request = time.monotonic()
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Save now if anything is pending and wait for it; False on timeout."""
+        with self._cond:
+            self._last_request = 0.0  # skip the rest of the debounce delay
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not (self._dirty or self._saving), timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Flush pending changes and stop the thread."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return flushed
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if not self._dirty:
+                    return
+                # debounce: keep waiting while requests keep coming in
+                while not self._closed:
+                    remaining = self._last_request + self.delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._dirty = False
+                self._saving = True
+            error: Optional[BaseException] = None
+            try:
+                self._save()
+            except Exception as exc:
+                logger.exception("Background save failed")
+                error = exc
+            with self._cond:
+                self._saving = False
+                self._cond.notify_all()
+            if self.on_done is not None:
+                self.on_done(error)
+
+    def _save(self) -> None:
+        store = self.store
+        if store.history is not None:
+            store.history.flush()
+        if store.storage is None and store.journal is None:
+            # copy under the lock, write without it
+            store.write_snapshot(store.snapshot())
+        else:
+            # journal/storage saves are short flushes of data already recorded
+            with store.lock:
+                store.save_to_files()
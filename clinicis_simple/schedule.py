@@ -0,0 +1,254 @@
+"""Doctor schedules as sorted time intervals.
+
+Times are kept as integer minutes (``to_minutes``) in a sorted list, so
+availability, overlap and free-slot queries are bisects instead of list scans.
+Every booking of a doctor lasts that doctor's ``slot_minutes``.
+
+For searches across many doctors each Schedule also keeps a per-day occupancy
+bitmap (one bit per ``CELL_MINUTES`` cell, bit 0 = 00:00), built on first use
+and dropped again when a booking on that day changes.
+"""
+import re
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+CANONICAL_FORMAT = "%Y-%m-%d %H:%M"
+DEFAULT_SLOT_MINUTES = 30
+MINUTES_PER_DAY = 24 * 60
+CELL_MINUTES = 5
+CELLS_PER_DAY = MINUTES_PER_DAY // CELL_MINUTES
+
+# "2026-01-15 10:00" (main.py / saved files) and "15-01-2026/10:00" (the GUI's advertised format)
+_ISO_RE = re.compile(r"^\s*(\d{4})-(\d{1,2})-(\d{1,2})[ T](\d{1,2}):(\d{2})\s*$")
+_GUI_RE = re.compile(r"^\s*(\d{1,2})-(\d{1,2})-(\d{4})/(\d{1,2}):(\d{2})\s*$")
+
+
+@lru_cache(maxsize=1 << 16)
+def parse_datetime(text: str) -> Optional[datetime]:
+    """Parse either supported format; return None for anything else.
+
+    A booking parses the same string several times (normalize, conflict
+    checks, schedule update), hence the cache.
+    """
+    match = _ISO_RE.match(text)
+    if match:
+        year, month, day, hour, minute = map(int, match.groups())
+    else:
+        match = _GUI_RE.match(text)
+        if not match:
+            return None
+        day, month, year, hour, minute = map(int, match.groups())
+    try:
+        return datetime(year, month, day, hour, minute)
+    except ValueError:
+        return None
+
+
+def normalize_datetime(text: str) -> str:
+    """Canonical "YYYY-MM-DD HH:MM" for parseable input; other strings are kept as typed."""
+    parsed = parse_datetime(text)
+    return parsed.strftime(CANONICAL_FORMAT) if parsed else text.strip()
+
+
+def parse_time_of_day(text: str) -> int:
+    """Minutes after midnight for "HH:MM"."""
+    hour, _, minute = text.strip().partition(":")
+    value = int(hour) * 60 + int(minute or 0)
+    if not 0 <= value <= MINUTES_PER_DAY:
+        raise ValueError(f"invalid time of day: {text!r}")
+    return value
+
+
+def cells(minutes: int) -> int:
+    """Number of occupancy cells needed to cover ``minutes`` (rounded up)."""
+    return -(-minutes // CELL_MINUTES)
+
+
+def slot_start_mask(busy: int, open_cell: int, close_cell: int, slot_cells: int, step_cells: int) -> int:
+    """Cells of one day where a free run of ``slot_cells`` starts inside working hours.
+
+    ``busy`` is a day bitmap from Schedule.day_mask. Starts are on a grid of
+    ``step_cells`` counted from ``open_cell`` and the whole slot must end by
+    ``close_cell``. Every doctor is checked with a handful of integer shifts
+    instead of a string comparison per candidate time.
+    """
+    last_start = close_cell - slot_cells
+    if last_start < open_cell:
+        return 0
+    free = ~busy & (((1 << close_cell) - 1) ^ ((1 << open_cell) - 1))
+    if not free:
+        return 0
+    fits = free
+    for k in range(1, slot_cells):
+        fits &= free >> k
+    return fits & _grid_mask(open_cell, last_start, step_cells)
+
+
+@lru_cache(maxsize=None)
+def _grid_mask(first: int, last: int, step: int) -> int:
+    mask = 0
+    for cell in range(first, last + 1, step):
+        mask |= 1 << cell
+    return mask
+
+
+def datetime_key(text: str) -> Union[int, str]:
+    """Compact slot key: minutes for a recognised date/time, else the stripped string."""
+    parsed = parse_datetime(text)
+    return to_minutes(parsed) if parsed else text.strip()
+
+
+def key_to_str(key: Union[int, str]) -> str:
+    return format_minutes(key) if isinstance(key, int) else key
+
+
+def to_minutes(value: datetime) -> int:
+    return value.toordinal() * MINUTES_PER_DAY + value.hour * 60 + value.minute
+
+
+def from_minutes(minutes: int) -> datetime:
+    day, rest = divmod(minutes, MINUTES_PER_DAY)
+    return datetime.fromordinal(day) + timedelta(minutes=rest)
+
+
+@lru_cache(maxsize=1 << 16)
+def format_minutes(minutes: int) -> str:
+    return from_minutes(minutes).strftime(CANONICAL_FORMAT)
+
+
+class Schedule:
+    """Booked intervals ``[start, start + slot_minutes)`` of one doctor.
+
+    Strings that are not a recognised date/time (older data files contain
+    entries like "12:30") are kept in a side set and only match exactly.
+    """
+
+    def __init__(self, entries: Iterable[str] = (), slot_minutes: int = DEFAULT_SLOT_MINUTES) -> None:
+        self.slot_minutes = slot_minutes
+        self._starts: List[int] = []
+        self._legacy: Set[str] = set()
+        self._day_masks: Dict[int, int] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return len(self._starts) + len(self._legacy)
+
+    def __iter__(self) -> Iterator[str]:
+        for start in self._starts:
+            yield format_minutes(start)
+        yield from sorted(self._legacy)
+
+    def __contains__(self, datetime_str: object) -> bool:
+        if not isinstance(datetime_str, str):
+            return False
+        start = self._key(datetime_str)
+        if start is None:
+            return datetime_str.strip() in self._legacy
+        i = bisect_left(self._starts, start)
+        return i < len(self._starts) and self._starts[i] == start
+
+    def __repr__(self) -> str:
+        return f"Schedule({self.to_list()!r})"
+
+    def to_list(self) -> List[str]:
+        return list(self)
+
+    def parts(self) -> Tuple[List[int], List[str]]:
+        """Booked starts in minutes and the unrecognised entries, for compact serialization."""
+        return list(self._starts), sorted(self._legacy)
+
+    @classmethod
+    def from_parts(
+        cls, starts: Iterable[int], legacy: Iterable[str] = (), slot_minutes: int = DEFAULT_SLOT_MINUTES
+    ) -> "Schedule":
+        """Inverse of parts(), without parsing every entry again."""
+        schedule = cls((), slot_minutes)
+        schedule._starts = sorted(set(starts))
+        schedule._legacy = set(legacy)
+        return schedule
+
+    def add(self, datetime_str: str) -> None:
+        """Book a slot; booking the same start twice is a no-op."""
+        start = self._key(datetime_str)
+        if start is None:
+            self._legacy.add(datetime_str.strip())
+        else:
+            self.add_minutes(start)
+
+    def add_minutes(self, start: int) -> None:
+        i = bisect_left(self._starts, start)
+        if i == len(self._starts) or self._starts[i] != start:
+            self._starts.insert(i, start)
+            self._forget_days(start)
+
+    def remove(self, datetime_str: str) -> None:
+        if not self.discard(datetime_str):
+            raise ValueError(f"{datetime_str!r} is not booked")
+
+    def discard(self, datetime_str: str) -> bool:
+        start = self._key(datetime_str)
+        if start is None:
+            if datetime_str.strip() in self._legacy:
+                self._legacy.remove(datetime_str.strip())
+                return True
+            return False
+        i = bisect_left(self._starts, start)
+        if i < len(self._starts) and self._starts[i] == start:
+            del self._starts[i]
+            self._forget_days(start)
+            return True
+        return False
+
+    def is_free(self, datetime_str: str) -> bool:
+        start = self._key(datetime_str)
+        if start is None:
+            return datetime_str.strip() not in self._legacy
+        return not self.overlapping(start, start + self.slot_minutes)
+
+    def overlapping(self, start: int, end: int) -> List[int]:
+        """Starts of booked intervals that intersect ``[start, end)``."""
+        i = bisect_left(self._starts, start - self.slot_minutes + 1)
+        j = bisect_left(self._starts, end, lo=i)
+        return self._starts[i:j]
+
+    def free_slots(self, start: int, end: int, step: Optional[int] = None) -> Iterator[int]:
+        """Free slot starts in ``[start, end)``, stepping by ``step`` (default: the slot length)."""
+        step = step or self.slot_minutes
+        i = bisect_left(self._starts, start - self.slot_minutes + 1)
+        t = start
+        while t + self.slot_minutes <= end:
+            # skip bookings that end before t
+            while i < len(self._starts) and self._starts[i] + self.slot_minutes <= t:
+                i += 1
+            if i < len(self._starts) and self._starts[i] < t + self.slot_minutes:
+                # jump past the blocking booking, staying on the step grid
+                blocked_until = self._starts[i] + self.slot_minutes
+                t += -(-(blocked_until - t) // step) * step
+                continue
+            yield t
+            t += step
+
+    def day_mask(self, day: int) -> int:
+        """Occupancy bitmap of ``day`` (a date ordinal)."""
+        mask = self._day_masks.get(day)
+        if mask is None:
+            mask = 0
+            day_start = day * MINUTES_PER_DAY
+            for start in self.overlapping(day_start, day_start + MINUTES_PER_DAY):
+                first = max(start - day_start, 0) // CELL_MINUTES
+                last = cells(min(start + self.slot_minutes - day_start, MINUTES_PER_DAY))
+                mask |= ((1 << (last - first)) - 1) << first
+            self._day_masks[day] = mask
+        return mask
+
+    def _forget_days(self, start: int) -> None:
+        for day in range(start // MINUTES_PER_DAY, (start + self.slot_minutes - 1) // MINUTES_PER_DAY + 1):
+            self._day_masks.pop(day, None)
+
+    @staticmethod
+    def _key(datetime_str: str) -> Optional[int]:
+        parsed = parse_datetime(datetime_str)
+        return to_minutes(parsed) if parsed else None
@@ -0,0 +1,281 @@
+"""Patient search by id, phone, name prefix and fuzzy (trigram) name matching.
+
+Names are split into casefolded word tokens. Each distinct token maps to the
+ids of the patients whose name contains it, and the distinct tokens are kept
+sorted so a prefix is a bisect range. Fuzzy matching goes through a trigram
+index over the distinct tokens (not over patients), which stays small because
+names repeat.
+"""
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from models import Patient
+
+FUZZY_MIN_SIMILARITY = 0.2
+FUZZY_MAX_TOKENS = 20
+# upper bound on candidates checked per query, so search-as-you-type stays fast
+MAX_SCAN = 20_000
+# other query words narrow the scan through a pid set when they match at most this many patients
+INTERSECT_LIMIT = 100_000
+_MERGE_THRESHOLD = 64
+
+SCORE_ID = 100.0
+SCORE_PHONE = 90.0
+SCORE_NAME = 80.0
+SCORE_PREFIX = 60.0
+SCORE_WHOLE_WORDS = 10.0  # prefix matches rank higher when more query words are whole name words
+SCORE_FUZZY = 50.0
+
+_TOKEN = re.compile(r"\w+")
+_NON_DIGITS = re.compile(r"\D")
+_LETTER = re.compile(r"[^\W\d_]")
+
+
+def name_tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text.casefold())
+
+
+def phone_digits(phone: str) -> str:
+    return _NON_DIGITS.sub("", phone)
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@lru_cache(maxsize=1 << 16)
+def _trigram_count(token: str) -> int:
+    return len(trigrams(token))
+
+
+class SearchHit(NamedTuple):
+    pid: str
+    score: float
+    match: str  # "id", "phone", "name", "prefix" or "fuzzy"
+
+
+class PatientIndex:
+    """Search structures over a patients mapping, kept up to date by Clinic.
+
+    Anything with pid, name and phone works; Clinic keeps a second one over its doctors.
+    A lazily loaded mapping can pass ``rows`` of (pid, name, phone) instead: the
+    index then keeps the names itself and never reads a patient from ``patients``.
+    """
+
+    def __init__(self, patients: Mapping[str, Patient], rows: Optional[Iterable[Tuple[str, str, str]]] = None) -> None:
+        self.patients = patients
+        self._by_token: Dict[str, List[str]] = {}
+        self._sorted_tokens: List[str] = []
+        self._unsorted: Set[str] = set()  # tokens added since the last search
+        self._by_trigram: Dict[str, Set[str]] = {}
+        self._by_phone: Dict[str, List[str]] = {}
+        self._names: Optional[Dict[str, str]] = None  # pid -> name, when built from rows
+        if rows is None:
+            for patient in patients.values():
+                self.add(patient)
+        else:
+            self._names = {}
+            for pid, name, phone in rows:
+                self._add(pid, name, phone)
+
+    def add(self, patient: Patient) -> None:
+        self._add(patient.pid, patient.name, patient.phone)
+
+    def _add(self, pid: str, name: str, phone: str) -> None:
+        if self._names is not None:
+            self._names[pid] = name
+        for token in set(name_tokens(name)):
+            pids = self._by_token.get(token)
+            if pids is not None:
+                pids.append(pid)
+                continue
+            self._by_token[token] = [pid]
+            self._unsorted.add(token)
+            if _LETTER.search(token):
+                for trigram in trigrams(token):
+                    self._by_trigram.setdefault(trigram, set()).add(token)
+        self.add_phone(pid, phone)
+
+    def remove(self, patient: Patient) -> None:
+        for token in set(name_tokens(patient.name)):
+            pids = self._by_token.get(token)
+            if pids is None or patient.pid not in pids:
+                continue
+            pids.remove(patient.pid)
+            if pids:
+                continue
+            del self._by_token[token]
+            if token in self._unsorted:
+                self._unsorted.remove(token)
+            else:
+                del self._sorted_tokens[bisect_left(self._sorted_tokens, token)]
+            for trigram in trigrams(token):
+                tokens = self._by_trigram.get(trigram)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._by_trigram[trigram]
+        self.remove_phone(patient.pid, patient.phone)
+        if self._names is not None:
+            self._names.pop(patient.pid, None)
+
+    def add_phone(self, pid: str, phone: str) -> None:
+        self._by_phone.setdefault(phone_digits(phone), []).append(pid)
+
+    def remove_phone(self, pid: str, phone: str) -> None:
+        digits = phone_digits(phone)
+        pids = self._by_phone.get(digits)
+        if pids is not None and pid in pids:
+            pids.remove(pid)
+            if not pids:
+                del self._by_phone[digits]
+
+    def search(self, query: str, limit: int = 10) -> List[SearchHit]:
+        """Best matches first: exact id, phone, full name, name prefix, then fuzzy name."""
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+        hits: Dict[str, SearchHit] = {}
+
+        def offer(pid: str, score: float, match: str) -> None:
+            if self._name(pid) is not None and (pid not in hits or hits[pid].score < score):
+                hits[pid] = SearchHit(pid, score, match)
+
+        offer(query, SCORE_ID, "id")
+        digits = phone_digits(query)
+        if len(digits) >= 3 and not _LETTER.search(query):
+            for pid in self._by_phone.get(digits, ()):
+                offer(pid, SCORE_PHONE, "phone")
+
+        words = name_tokens(query)
+        if words:
+            self._merge_tokens()
+            self._search_names(words, limit, offer)
+
+        ranked = sorted(hits.values(), key=lambda hit: (-hit.score, self._name(hit.pid).casefold(), hit.pid))
+        return ranked[:limit]
+
+    def _search_names(self, words: List[str], limit: int, offer) -> None:
+        # each query word matches name tokens by prefix, or fuzzily when no token has that prefix
+        fuzzy: List[Optional[Dict[str, float]]] = []
+        matched: List[List[str]] = []
+        for word in words:
+            lo, hi = self._prefix_range(word)
+            if hi > lo:
+                fuzzy.append(None)
+                matched.append(self._sorted_tokens[lo:hi])
+                continue
+            matches = self._fuzzy_matches(word) if len(word) >= 3 else {}
+            if not matches:
+                return
+            fuzzy.append(matches)
+            matched.append(list(matches))  # best match first
+        sizes = [self._pid_count(tokens, INTERSECT_LIMIT) for tokens in matched]
+
+        # walk the patients of the most selective word. The other words, when they
+        # match few enough patients, narrow that list down first by set membership.
+        order = sorted(range(len(words)), key=sizes.__getitem__)
+        driver_pids: Iterable[str] = islice(chain.from_iterable(self._by_token[t] for t in matched[order[0]]), MAX_SCAN)
+        allowed: Optional[Set[str]] = None
+        for i in order[1:]:
+            if sizes[i] >= INTERSECT_LIMIT:
+                break
+            if allowed is None:
+                driver_pids = list(driver_pids)
+                allowed = set(driver_pids)
+            allowed = allowed.intersection(chain.from_iterable(map(self._by_token.__getitem__, matched[i])))
+        # cheap regex checks first: each word must start a name word, or be one of its fuzzy tokens
+        checks = []
+        for word, matches in zip(words, fuzzy):
+            pattern = re.escape(word) if matches is None else "(?:%s)\\b" % "|".join(map(re.escape, matches))
+            checks.append(re.compile(r"\b" + pattern).search)
+        fuzzy_words = [matches for matches in fuzzy if matches is not None]
+        full_query = " ".join(words)
+
+        def consider(pid: str) -> bool:
+            name = self._name(pid)
+            if name is None:
+                return False
+            name = name.casefold()
+            if not all(check(name) for check in checks):
+                return False
+            tokens = _TOKEN.findall(name)
+            if fuzzy_words:
+                weights = [max(matches.get(t, 0.0) for t in tokens) for matches in fuzzy_words]
+                weights += [1.0] * (len(words) - len(weights))
+                offer(pid, SCORE_FUZZY * sum(weights) / len(weights), "fuzzy")
+            elif " ".join(tokens) == full_query:
+                offer(pid, SCORE_NAME, "name")
+            else:
+                whole = sum(word in tokens for word in words) / len(words)
+                offer(pid, SCORE_PREFIX + SCORE_WHOLE_WORDS * whole, "prefix")
+            return True
+
+        # names holding every query word as a whole word (exact names among them) outrank all
+        # other prefix matches, so they are all scored before the scan below may stop early
+        found = 0
+        seen: Set[str] = set()
+        if not fuzzy_words and all(word in self._by_token for word in words):
+            whole_lists = sorted((self._by_token[word] for word in words), key=len)
+            others = [set(pids) for pids in whole_lists[1:]]
+            for pid in islice(whole_lists[0], MAX_SCAN):
+                if all(pid in pids for pids in others) and consider(pid):
+                    seen.add(pid)
+                    found += 1
+            if found >= limit:
+                return
+        for pid in driver_pids:
+            if pid in seen or (allowed is not None and pid not in allowed):
+                continue
+            if consider(pid):
+                found += 1
+                if found >= limit:
+                    return
+
+    def _name(self, pid: str) -> Optional[str]:
+        if self._names is not None:
+            return self._names.get(pid)
+        patient = self.patients.get(pid)
+        return None if patient is None else patient.name
+
+    def _pid_count(self, tokens: Iterable[str], cap: int) -> int:
+        total = 0
+        for token in tokens:
+            total += len(self._by_token[token])
+            if total >= cap:
+                break
+        return total
+
+    def _prefix_range(self, word: str) -> Tuple[int, int]:
+        tokens = self._sorted_tokens
+        lo = bisect_left(tokens, word)
+        return lo, bisect_left(tokens, word + "\U0010ffff", lo)
+
+    def _fuzzy_matches(self, word: str) -> Dict[str, float]:
+        grams = trigrams(word)
+        shared: Counter = Counter()
+        for trigram in grams:
+            shared.update(self._by_trigram.get(trigram, ()))
+        scored: List[Tuple[float, str]] = []
+        for token, common in shared.items():
+            similarity = common / (len(grams) + _trigram_count(token) - common)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, token))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return {token: similarity for similarity, token in scored[:FUZZY_MAX_TOKENS]}
+
+    def _merge_tokens(self) -> None:
+        if not self._unsorted:
+            return
+        if len(self._unsorted) <= _MERGE_THRESHOLD:
+            for token in self._unsorted:
+                insort(self._sorted_tokens, token)
+        else:
+            # timsort merges the already sorted run with the new tokens in linear-ish time
+            self._sorted_tokens = sorted(chain(self._sorted_tokens, self._unsorted))
+        self._unsorted.clear()
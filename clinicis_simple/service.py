@@ -0,0 +1,407 @@
+"""Local HTTP/JSON API over one Clinic, so several desks can share a store.
+
+Examples::
+
+    python service.py --port 8080 --journaled
+    curl -X POST localhost:8080/appointments \\
+         -d '{"patient_id": "p1", "doctor_id": "d1", "datetime": "2026-01-15 10:00"}'
+
+Endpoints (all JSON):
+
+    GET    /patients/search?q=...&limit=10
+    GET    /patients/<pid>/appointments
+    GET    /patients/<pid>/visits?start=0&limit=50
+    GET    /patients/<pid>/history?start=...&end=...   (archived appointments too)
+    GET    /free-slots?specialty=GP&count=5&start=...&days=7
+    GET    /appointments/<appt_id>
+    GET    /metrics                           (when metrics are enabled, see metrics.py)
+    POST   /appointments                      {[appt_id], patient_id, doctor_id, datetime}
+    POST   /appointments/<appt_id>/cancel
+    POST   /appointments/<appt_id>/reschedule {datetime}
+    POST   /appointments/<appt_id>/complete   {summary}
+    DELETE /appointments/<appt_id>
+
+Everything runs on one asyncio loop. Reads are answered from memory by the
+connection handlers, each on a worker thread holding the store lock shared.
+Mutations go through a queue to a single writer task, which applies whatever
+has queued up as one batch (on a worker thread, holding the lock
+exclusively) and persists it with one journal record / storage commit before
+answering. In plain JSON mode the answer goes out once the batch is applied,
+and a debounced background save writes the files shortly after.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import metrics
+from audit import JsonlFileSink, QueueSink, set_sink
+from clinic import Clinic
+from save_worker import SaveWorker
+from sqlite_storage import SqliteStorage
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 1 << 20
+MAX_BATCH = 256
+
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ClinicService:
+    def __init__(self, store: Clinic, max_batch: int = MAX_BATCH) -> None:
+        self.store = store
+        self.max_batch = max_batch
+        # plain JSON mode has nothing to append to, so the files are rewritten in the background
+        self.saver = SaveWorker(store) if store.journal is None and store.storage is None else None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.mutations = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop(), name="clinic-writer")
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop(self) -> None:
+        """Let queued mutations finish, then flush and close the store."""
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+            self._writer = None
+        if self.saver is not None:
+            self.saver.close()
+        self.store.close()
+
+    async def mutate(self, op: Callable[[], Any]) -> Any:
+        """Run ``op`` on the writer task and return its result once it is applied.
+
+        With a journal or storage backend the batch is persisted by then; in
+        plain JSON mode the SaveWorker writes it shortly after.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, future))
+        return await future
+
+    async def _write_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                # off the loop: waiting for the lock and the batch's write must not hold up reads
+                outcomes = await asyncio.to_thread(self._apply, batch)
+            except Exception as exc:
+                logger.exception("Persisting a batch of %d mutations failed", len(batch))
+                outcomes = [(future, None, exc) for _, future in batch]
+            if self.saver is not None:
+                self.saver.request()
+            self.batches += 1
+            self.mutations += len(batch)
+            for future, result, error in outcomes:
+                if not future.done():
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+                self._queue.task_done()
+
+    def _apply(
+        self, batch: List[Tuple[Callable[[], Any], asyncio.Future]]
+    ) -> List[Tuple[asyncio.Future, Any, Optional[BaseException]]]:
+        """Run one batch of mutations and persist it (on a worker thread; the futures are set by the loop)."""
+        outcomes: List[Tuple[asyncio.Future, Any, Optional[BaseException]]] = []
+        # the lock keeps a background snapshot from seeing half of the batch
+        with self.store.lock, self.store.batch():
+            for op, future in batch:
+                try:
+                    outcomes.append((future, op(), None))
+                except Exception as exc:
+                    outcomes.append((future, None, exc))
+        return outcomes
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "malformed request"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except ApiError as exc:
+                    status, payload = exc.status, {"error": str(exc)}
+                except ValueError as exc:
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": f"invalid request: {exc}"}
+                except Exception:
+                    logger.exception("%s %s failed", method, target)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"}
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: Any, keep_alive: bool) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+        if not keep_alive:
+            head += "Connection: close\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + data)
+        await writer.drain()
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[HTTPStatus, Any]:
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        data = json.loads(body) if body else {}
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "request body must be a JSON object")
+        for route_method, pattern, handler in ROUTES:
+            if route_method == method and len(pattern) == len(parts):
+                if all(want in ("*", part) for want, part in zip(pattern, parts)):
+                    return await handler(self, parts, query, data)
+        raise ApiError(HTTPStatus.NOT_FOUND, f"no route for {method} {url.path}")
+
+    # reads: answered on the connection's own task, never queued
+
+    async def read(self, op: Callable[[], Any]) -> Any:
+        """Run ``op`` on a worker thread with the store lock held shared, so no batch is half applied under it."""
+
+        def run() -> Any:
+            with self.store.lock.shared():
+                return op()
+
+        return await asyncio.to_thread(run)
+
+    async def search_patients(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        def op() -> List[Dict[str, Any]]:
+            hits = self.store.search_patients(query.get("q", ""), limit=_int(query, "limit", 10))
+            patients = self.store.patients
+            return [dict(patients[hit.pid].to_dict(), score=hit.score, match=hit.match) for hit in hits]
+
+        return HTTPStatus.OK, await self.read(op)
+
+    async def patient_appointments(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        pid = parts[1]
+
+        def op() -> List[Dict[str, Any]]:
+            if pid not in self.store.patients:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"no patient {pid}")
+            return [appt.to_dict() for appt in self.store.appointments.for_patient(pid)]
+
+        return HTTPStatus.OK, await self.read(op)
+
+    async def patient_history(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        pid = parts[1]
+
+        def op() -> List[Dict[str, Any]]:
+            if pid not in self.store.patients:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"no patient {pid}")
+            try:
+                appts = self.store.appointment_history(patient_id=pid, start=query.get("start"), end=query.get("end"))
+            except ValueError as exc:
+                raise ApiError(HTTPStatus.BAD_REQUEST, str(exc)) from exc
+            return [appt.to_dict() for appt in appts]
+
+        return HTTPStatus.OK, await self.read(op)
+
+    async def patient_visits(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        start, limit = _int(query, "start", 0), _int(query, "limit", 50)
+        if start < 0 or limit < 0:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "start and limit must not be negative")
+
+        def op() -> Dict[str, Any]:
+            patient = self.store.patients.get(parts[1])
+            if patient is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"no patient {parts[1]}")
+            return {"total": len(patient.visits), "visits": patient.get_history(start, limit)}
+
+        return HTTPStatus.OK, await self.read(op)
+
+    async def free_slots(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        specialty = query.get("specialty")
+        if not specialty:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "specialty is required")
+        count, days = _int(query, "count", 5), _int(query, "days", 7)
+
+        def op() -> List[Tuple[str, str]]:
+            try:
+                return self.store.find_free_slots(specialty, count=count, start=query.get("start"), days=days)
+            except ValueError as exc:
+                raise ApiError(HTTPStatus.BAD_REQUEST, str(exc)) from exc
+
+        slots = await self.read(op)
+        return HTTPStatus.OK, [{"datetime": when, "doctor_id": doctor_id} for when, doctor_id in slots]
+
+    async def get_metrics(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        current = metrics.registry()
+        if current is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "metrics are not enabled (set CLINIC_METRICS_PORT or CLINIC_METRICS)")
+        return HTTPStatus.OK, current.snapshot()
+
+    async def get_appointment(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        return HTTPStatus.OK, await self.read(lambda: self._appointment(parts[1]).to_dict())
+
+    # mutations: go through the writer task
+
+    async def schedule(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        fields = [str(data.get(name) or "").strip() for name in ("appt_id", "patient_id", "doctor_id", "datetime")]
+        if not all(fields[1:]):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "patient_id, doctor_id and datetime are required")
+
+        def op() -> Optional[Dict[str, Any]]:
+            appt = self.store.schedule_appointment(fields[0] or self.store.next_appt_id(), *fields[1:])
+            return appt.to_dict() if appt else None
+
+        appt = await self.mutate(op)
+        if appt is None:
+            raise ApiError(HTTPStatus.CONFLICT, "unable to schedule: time conflict or invalid data")
+        return HTTPStatus.CREATED, appt
+
+    async def cancel(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        return await self._change(parts[1], lambda: self.store.cancel_appointment(parts[1]))
+
+    async def reschedule(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        new_datetime = str(data.get("datetime") or "").strip()
+        if not new_datetime:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "datetime is required")
+        return await self._change(parts[1], lambda: self.store.reschedule_appointment(parts[1], new_datetime))
+
+    async def complete(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        summary = str(data.get("summary") or "").strip()
+        if not summary:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "summary is required")
+        return await self._change(parts[1], lambda: self.store.complete_appointment(parts[1], summary))
+
+    async def delete(self, parts: List[str], query: Dict[str, str], data: Dict[str, Any]):
+        self._appointment(parts[1])
+        if not await self.mutate(lambda: self.store.delete_appointment(parts[1])):
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no appointment {parts[1]}")
+        return HTTPStatus.OK, {"deleted": parts[1]}
+
+    async def _change(self, appt_id: str, op: Callable[[], bool]) -> Tuple[HTTPStatus, Any]:
+        self._appointment(appt_id)
+
+        def run() -> Optional[Dict[str, Any]]:
+            if not op():
+                return None
+            appt = self.store.appointments.get(appt_id)
+            return appt.to_dict() if appt else None
+
+        appt = await self.mutate(run)
+        if appt is None:
+            raise ApiError(HTTPStatus.CONFLICT, f"appointment {appt_id} cannot be changed that way")
+        return HTTPStatus.OK, appt
+
+    def _appointment(self, appt_id: str):
+        appt = self.store.appointments.get(appt_id)
+        if appt is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no appointment {appt_id}")
+        return appt
+
+
+Handler = Callable[[ClinicService, List[str], Dict[str, str], Dict[str, Any]], Awaitable[Tuple[HTTPStatus, Any]]]
+
+# (method, path pattern with "*" for an id, handler)
+ROUTES: List[Tuple[str, Tuple[str, ...], Handler]] = [
+    ("GET", ("patients", "search"), ClinicService.search_patients),
+    ("GET", ("patients", "*", "appointments"), ClinicService.patient_appointments),
+    ("GET", ("patients", "*", "visits"), ClinicService.patient_visits),
+    ("GET", ("patients", "*", "history"), ClinicService.patient_history),
+    ("GET", ("free-slots",), ClinicService.free_slots),
+    ("GET", ("appointments", "*"), ClinicService.get_appointment),
+    ("GET", ("metrics",), ClinicService.get_metrics),
+    ("POST", ("appointments",), ClinicService.schedule),
+    ("POST", ("appointments", "*", "cancel"), ClinicService.cancel),
+    ("POST", ("appointments", "*", "reschedule"), ClinicService.reschedule),
+    ("POST", ("appointments", "*", "complete"), ClinicService.complete),
+    ("DELETE", ("appointments", "*"), ClinicService.delete),
+]
+
+
+def _int(query: Dict[str, str], name: str, default: int) -> int:
+    try:
+        return int(query.get(name, default))
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer") from None
+
+
+async def serve(store: Clinic, host: str, port: int) -> None:
+    service = ClinicService(store)
+    server = await service.start(host, port)
+    print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+    try:
+        await stopping.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the clinic over a local HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data-dir", type=Path, default=None, help="defaults to ./data next to this script")
+    parser.add_argument("--journaled", action="store_true", help="append mutations to a journal")
+    parser.add_argument("--db", type=Path, default=None, help="use an SQLite database instead of the JSON files")
+    parser.add_argument("--audit-log", type=Path, default=None, help="defaults to audit.jsonl in the data folder")
+    args = parser.parse_args()
+
+    metrics.enable_from_env()
+    storage = SqliteStorage(args.db) if args.db else None
+    store = Clinic(data_dir=args.data_dir, journaled=args.journaled, storage=storage)
+    audit = QueueSink(JsonlFileSink(args.audit_log or store.data_dir / "audit.jsonl"))
+    set_sink(audit)
+    if storage is None:
+        store.load_from_files()
+    if store.journal is not None:
+        store.start_compactor()
+    try:
+        asyncio.run(serve(store, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        audit.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Entity files split into shards by a stable hash of the id (the "sharded" data format).
+
+``data_dir/<kind>/NNNN.json`` holds the rows of every id with
+``shard_of(id) == NNNN`` as compact JSON, and ``data_dir/shards.json``
+records the shard count the files were written with. A save rewrites only
+the shards that hold changed ids: the shard's rows are read back, the
+changed rows replaced (deleted ids dropped, new ids appended) and the file
+written again, so no shard membership has to be kept in memory.
+"""
+import json
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+from jsonstream import iter_records, write_records
+
+MANIFEST_FILE = "shards.json"
+DEFAULT_SHARDS = 256
+KEY_FIELDS = {"patients": "pid", "doctors": "pid", "appointments": "appt_id"}
+
+
+class ShardUpdate(NamedTuple):
+    key_field: str
+    rows: Dict[str, Optional[Dict[str, Any]]]  # id -> its new row, None if it was deleted
+
+
+def shard_of(key: str, count: int) -> int:
+    # crc32, not hash(): str hashes change between interpreter runs
+    return zlib.crc32(key.encode("utf-8")) % count
+
+
+def shard_name(kind: str, shard: int) -> str:
+    return f"{kind}/{shard:04d}.json"
+
+
+def read_manifest(data_dir: Path) -> Optional[int]:
+    """Shard count of the files in ``data_dir``; None if it holds no sharded data."""
+    try:
+        return int(json.loads((data_dir / MANIFEST_FILE).read_text(encoding="utf-8"))["shards"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def manifest_bytes(count: int) -> bytes:
+    return json.dumps({"version": 1, "shards": count}).encode("utf-8")
+
+
+def iter_shards(data_dir: Path, kind: str) -> Iterator[Dict[str, Any]]:
+    for path in sorted((data_dir / kind).glob("*.json")):
+        yield from iter_records(path)
+
+
+def merge_shard(path: Path, update: ShardUpdate, fsync: bool = True) -> None:
+    """Rewrite one shard file with ``update`` applied, keeping the order of the other rows."""
+    try:
+        old = list(iter_records(path))
+    except FileNotFoundError:
+        old = []
+    pending = dict(update.rows)
+
+    def merged() -> Iterator[Dict[str, Any]]:
+        for row in old:
+            key = row.get(update.key_field)
+            if key in pending:
+                row = pending.pop(key)
+                if row is None:
+                    continue
+            yield row
+        for row in pending.values():
+            if row is not None:
+                yield row
+
+    write_records(path, merged(), indent=None, fsync=fsync)
@@ -0,0 +1,452 @@
+"""SQLite storage backend for Clinic (stdlib sqlite3).
+
+Patients and appointments are read from the database on first access and
+cached afterwards, so opening a large clinic costs almost nothing. Doctors are
+few and are loaded eagerly together with their schedules.
+
+Migrate the JSON files once with::
+
+    python sqlite_storage.py --data-dir data --db data/clinic.db
+"""
+import argparse
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, MutableMapping, Optional, Tuple, Union
+
+from models import Appointment, Doctor, Patient, loaded_status
+from schedule import DEFAULT_SLOT_MINUTES
+from storage import StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    pid TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS visits (
+    pid TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    note TEXT NOT NULL,
+    PRIMARY KEY (pid, idx)
+);
+CREATE TABLE IF NOT EXISTS doctors (
+    pid TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    specialty TEXT NOT NULL,
+    slot_minutes INTEGER NOT NULL DEFAULT 30
+);
+CREATE TABLE IF NOT EXISTS doctor_slots (
+    doctor_id TEXT NOT NULL,
+    datetime_str TEXT NOT NULL,
+    PRIMARY KEY (doctor_id, datetime_str)
+);
+CREATE TABLE IF NOT EXISTS appointments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    appt_id TEXT NOT NULL UNIQUE,
+    patient_id TEXT NOT NULL,
+    doctor_id TEXT NOT NULL,
+    datetime_str TEXT NOT NULL,
+    status TEXT NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS appointments_patient_slot ON appointments (patient_id, datetime_str);
+CREATE INDEX IF NOT EXISTS appointments_doctor_slot ON appointments (doctor_id, datetime_str);
+"""
+
+# Statements are module constants with ? placeholders, so sqlite3's statement
+# cache compiles each of them once per connection.
+UPSERT_PATIENT = (
+    "INSERT INTO patients (pid, name, phone) VALUES (?, ?, ?) "
+    "ON CONFLICT(pid) DO UPDATE SET name = excluded.name, phone = excluded.phone"
+)
+UPSERT_DOCTOR = (
+    "INSERT INTO doctors (pid, name, phone, specialty, slot_minutes) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(pid) DO UPDATE SET name = excluded.name, phone = excluded.phone, "
+    "specialty = excluded.specialty, slot_minutes = excluded.slot_minutes"
+)
+UPSERT_APPT = (
+    "INSERT INTO appointments (appt_id, patient_id, doctor_id, datetime_str, status, summary) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(appt_id) DO UPDATE SET patient_id = excluded.patient_id, "
+    "doctor_id = excluded.doctor_id, datetime_str = excluded.datetime_str, status = excluded.status, "
+    "summary = excluded.summary"
+)
+APPT_COLUMNS = "appt_id, patient_id, doctor_id, datetime_str, status, summary"
+
+
+class SqliteStorage(StorageBackend):
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # the GUI saves from a worker thread, so every access goes through self.lock
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(doctors)")}
+        if "slot_minutes" not in columns:  # databases created before schedules had durations
+            self.conn.execute("ALTER TABLE doctors ADD COLUMN slot_minutes INTEGER NOT NULL DEFAULT 30")
+        self.lock = threading.RLock()
+        # thread inside transaction() (its writes sit in a savepoint) and the commits waiting for it
+        self._tx_thread: Optional[int] = None
+        self._tx_done = threading.Condition(self.lock)
+        self.patients: Optional[LazyPatients] = None
+        self.appointments: Optional[SqliteAppointmentStore] = None
+
+    def execute(self, sql: str, params: Tuple[Any, ...] = ()) -> sqlite3.Cursor:
+        with self.lock:
+            return self.conn.execute(sql, params)
+
+    def load(self) -> Tuple["LazyPatients", Dict[str, Doctor], "SqliteAppointmentStore"]:
+        self.patients = LazyPatients(self)
+        self.appointments = SqliteAppointmentStore(self)
+        doctors = {}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT pid, name, phone, specialty, slot_minutes FROM doctors ORDER BY rowid"
+            ).fetchall()
+            for pid, name, phone, specialty, slot_minutes in rows:
+                slots = self.conn.execute(
+                    "SELECT datetime_str FROM doctor_slots WHERE doctor_id = ? ORDER BY rowid", (pid,)
+                ).fetchall()
+                doctors[pid] = Doctor(pid, name, phone, specialty, [s for (s,) in slots], slot_minutes)
+        return self.patients, doctors, self.appointments
+
+    def record(self, changes: List[List[Any]]) -> None:
+        """Apply one Clinic mutation and commit it as a single transaction."""
+        with self._committing():
+            for change in changes:
+                self._apply(change)
+
+    def save(self, clinic: Any) -> None:
+        """Write back every object that was materialized (and may have been mutated directly)."""
+        with self._committing():
+            if self.patients is not None:
+                for patient in self.patients.cached():
+                    self._put_patient(patient.to_dict())
+            for doctor in clinic.doctors.values():
+                self._put_doctor(doctor.to_dict())
+            if self.appointments is not None:
+                self.conn.executemany(
+                    UPSERT_APPT, [_appt_row(a.to_dict()) for a in self.appointments.cached()]
+                )
+
+    def reset(self) -> None:
+        with self._committing():
+            for table in ("patients", "visits", "doctors", "doctor_slots", "appointments"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def patient_rows(self) -> List[Tuple[str, str, str]]:
+        return self.execute("SELECT pid, name, phone FROM patients ORDER BY rowid").fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Keep the writes made inside the block out of every commit until it ends.
+
+        The store and the lazy containers write to the connection as the Clinic
+        mutates them, so reads inside the block see its own changes. If the
+        block raises they are rolled back; otherwise they stay in the open
+        SQLite transaction for the group commit's record() to commit. When the
+        connection already holds writes of transactions queued for that commit,
+        only the block's savepoint is rolled back.
+        """
+        with self.lock:
+            began = not self.conn.in_transaction
+            if began:
+                self.conn.execute("BEGIN")
+            self.conn.execute("SAVEPOINT clinic_tx")
+            self._tx_thread = threading.get_ident()
+        try:
+            yield
+        except BaseException:
+            with self.lock:
+                if began:
+                    self.conn.rollback()
+                else:
+                    self.conn.execute("ROLLBACK TO clinic_tx")
+                    self.conn.execute("RELEASE clinic_tx")
+            raise
+        else:
+            with self.lock:
+                self.conn.execute("RELEASE clinic_tx")
+        finally:
+            with self.lock:
+                self._tx_thread = None
+                self._tx_done.notify_all()
+
+    @contextmanager
+    def _committing(self) -> Iterator[None]:
+        """Hold self.lock for writes that end in a commit.
+
+        Waits while another thread is inside transaction(), whose savepoint
+        would otherwise take these writes along if it rolls back, and leaves
+        the commit to the transaction when called from inside one.
+        """
+        with self.lock:
+            while self._tx_thread is not None and self._tx_thread != threading.get_ident():
+                self._tx_done.wait()  # lets go of self.lock meanwhile
+            yield
+            if self._tx_thread is None:
+                self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+    def _apply(self, change: List[Any]) -> None:
+        kind = change[0]
+        if kind == "patient":
+            self._put_patient(change[1])
+        elif kind == "doctor":
+            self._put_doctor(change[1])
+        elif kind == "appt":
+            self.conn.execute(UPSERT_APPT, _appt_row(change[1]))
+        elif kind == "appt_del":
+            self.conn.execute("DELETE FROM appointments WHERE appt_id = ?", (change[1],))
+        elif kind == "slot_add":
+            self.conn.execute("INSERT OR IGNORE INTO doctor_slots VALUES (?, ?)", (change[1], change[2]))
+        elif kind == "slot_del":
+            self.conn.execute(
+                "DELETE FROM doctor_slots WHERE doctor_id = ? AND datetime_str = ?", (change[1], change[2])
+            )
+        elif kind == "visit":
+            self.conn.execute("INSERT OR IGNORE INTO visits VALUES (?, ?, ?)", (change[1], change[2], change[3]))
+
+    def _put_patient(self, data: Dict[str, Any]) -> None:
+        self.conn.execute(UPSERT_PATIENT, (data["pid"], data["name"], data["phone"]))
+        self.conn.execute("DELETE FROM visits WHERE pid = ?", (data["pid"],))
+        self.conn.executemany(
+            "INSERT INTO visits VALUES (?, ?, ?)",
+            [(data["pid"], i, note) for i, note in enumerate(data.get("visits", []))],
+        )
+
+    def _put_doctor(self, data: Dict[str, Any]) -> None:
+        slot_minutes = data.get("slot_minutes", DEFAULT_SLOT_MINUTES)
+        self.conn.execute(UPSERT_DOCTOR, (data["pid"], data["name"], data["phone"], data["specialty"], slot_minutes))
+        self.conn.execute("DELETE FROM doctor_slots WHERE doctor_id = ?", (data["pid"],))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO doctor_slots VALUES (?, ?)",
+            [(data["pid"], dt) for dt in data.get("schedule", [])],
+        )
+
+
+def _appt_row(data: Dict[str, Any]) -> Tuple[str, ...]:
+    return (
+        data["appt_id"],
+        data["patient_id"],
+        data["doctor_id"],
+        data["datetime_str"],
+        data.get("status", "scheduled"),
+        data.get("summary", ""),
+    )
+
+
+class LazyPatients(MutableMapping[str, Patient]):
+    """Patients mapping that reads rows (and their visits) on first access."""
+
+    def __init__(self, storage: SqliteStorage) -> None:
+        self._storage = storage
+        self._cache: Dict[str, Patient] = {}
+        self.tracker = None  # handed to every patient read in (see Clinic._track)
+
+    def cached(self) -> List[Patient]:
+        return list(self._cache.values())
+
+    def __getitem__(self, pid: str) -> Patient:
+        patient = self._cache.get(pid)
+        if patient is None:
+            row = self._storage.execute("SELECT pid, name, phone FROM patients WHERE pid = ?", (pid,)).fetchone()
+            if row is None:
+                raise KeyError(pid)
+            patient = self._materialize(row)
+        return patient
+
+    def __setitem__(self, pid: str, patient: Patient) -> None:
+        self._cache[pid] = patient
+        with self._storage.lock:
+            self._storage._put_patient(patient.to_dict())
+
+    def __delitem__(self, pid: str) -> None:
+        if pid not in self:
+            raise KeyError(pid)
+        self._cache.pop(pid, None)
+        self._storage.execute("DELETE FROM patients WHERE pid = ?", (pid,))
+        self._storage.execute("DELETE FROM visits WHERE pid = ?", (pid,))
+
+    def __contains__(self, pid: object) -> bool:
+        if pid in self._cache:
+            return True
+        return self._storage.execute("SELECT 1 FROM patients WHERE pid = ?", (pid,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for (pid,) in self._storage.execute("SELECT pid FROM patients ORDER BY rowid").fetchall():
+            yield pid
+
+    def __len__(self) -> int:
+        return self._storage.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+
+    def values(self):  # one query instead of a lookup per key
+        rows = self._storage.execute("SELECT pid, name, phone FROM patients ORDER BY rowid").fetchall()
+        return [self._cache.get(row[0]) or self._materialize(row) for row in rows]
+
+    def _materialize(self, row: Tuple[str, str, str]) -> Patient:
+        pid, name, phone = row
+        visits = self._storage.execute("SELECT note FROM visits WHERE pid = ? ORDER BY idx", (pid,)).fetchall()
+        patient = Patient(pid, name, phone, [note for (note,) in visits])
+        patient._tracker = self.tracker
+        self._cache[pid] = patient
+        return patient
+
+
+class SqliteAppointmentStore:
+    """AppointmentStore look-alike whose indexes are the SQLite indexes."""
+
+    def __init__(self, storage: SqliteStorage) -> None:
+        self._storage = storage
+        self._cache: Dict[str, Appointment] = {}
+
+    def cached(self) -> List[Appointment]:
+        return list(self._cache.values())
+
+    def __len__(self) -> int:
+        return self._storage.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Appointment]:
+        rows = self._storage.execute(f"SELECT {APPT_COLUMNS} FROM appointments ORDER BY seq").fetchall()
+        for row in rows:
+            yield self._cache.get(row[0]) or self._materialize(row)
+
+    def __contains__(self, appt_id: object) -> bool:
+        return self.get(appt_id) is not None
+
+    def __getitem__(self, index: int) -> Appointment:
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("appointment index out of range")
+        return next(islice(iter(self), index, None))
+
+    def get(self, appt_id: str) -> Optional[Appointment]:
+        appt = self._cache.get(appt_id)
+        if appt is None:
+            row = self._storage.execute(
+                f"SELECT {APPT_COLUMNS} FROM appointments WHERE appt_id = ?", (appt_id,)
+            ).fetchone()
+            if row is not None:
+                appt = self._materialize(row)
+        return appt
+
+    def add(self, appt: Appointment) -> None:
+        self._cache[appt.appt_id] = appt
+        self._storage.execute(UPSERT_APPT, _appt_row(appt.to_dict()))
+
+    append = add
+
+    def remove(self, appt_id: str) -> Optional[Appointment]:
+        appt = self.get(appt_id)
+        if appt is not None:
+            self._cache.pop(appt_id, None)
+            self._storage.execute("DELETE FROM appointments WHERE appt_id = ?", (appt_id,))
+        return appt
+
+    def reschedule(self, appt: Appointment, new_datetime: str) -> None:
+        appt.reschedule(new_datetime)
+        self._storage.execute(
+            "UPDATE appointments SET datetime_str = ? WHERE appt_id = ?", (new_datetime, appt.appt_id)
+        )
+
+    def set_time(self, appt: Appointment, when: Union[int, str]) -> None:
+        """Put an appointment back at ``when`` (a slot_key) without the reschedule audit event."""
+        appt.datetime_str = when
+        self._storage.execute(
+            "UPDATE appointments SET datetime_str = ? WHERE appt_id = ?", (appt.datetime_str, appt.appt_id)
+        )
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._storage.execute("DELETE FROM appointments")
+
+    def patient_has_slot(self, patient_id: str, datetime_str: str, exclude: Optional[str] = None) -> bool:
+        row = self._storage.execute(
+            "SELECT 1 FROM appointments WHERE patient_id = ? AND datetime_str = ? AND appt_id != ? LIMIT 1",
+            (patient_id, datetime_str, exclude or ""),
+        ).fetchone()
+        return row is not None
+
+    def at_doctor_slot(self, doctor_id: str, datetime_str: str) -> List[Appointment]:
+        rows = self._storage.execute(
+            f"SELECT {APPT_COLUMNS} FROM appointments WHERE doctor_id = ? AND datetime_str = ?",
+            (doctor_id, datetime_str),
+        ).fetchall()
+        return [self._cache.get(row[0]) or self._materialize(row) for row in rows]
+
+    def for_patient(self, patient_id: str) -> List[Appointment]:
+        return self._select("patient_id", patient_id)
+
+    def for_doctor(self, doctor_id: str) -> List[Appointment]:
+        return self._select("doctor_id", doctor_id)
+
+    def doctor_ids(self) -> List[str]:
+        """Doctors with at least one appointment."""
+        return [pid for (pid,) in self._storage.execute("SELECT DISTINCT doctor_id FROM appointments").fetchall()]
+
+    def patient_ids(self) -> List[str]:
+        """Patients with at least one appointment."""
+        return [pid for (pid,) in self._storage.execute("SELECT DISTINCT patient_id FROM appointments").fetchall()]
+
+    def _select(self, column: str, value: str) -> List[Appointment]:
+        rows = self._storage.execute(
+            f"SELECT {APPT_COLUMNS} FROM appointments WHERE {column} = ? ORDER BY seq", (value,)
+        ).fetchall()
+        return [self._cache.get(row[0]) or self._materialize(row) for row in rows]
+
+    def _materialize(self, row: Tuple[str, ...]) -> Appointment:
+        appt_id, patient_id, doctor_id, datetime_str, status, summary = row
+        appt = Appointment(appt_id, patient_id, doctor_id, datetime_str, loaded_status(status, appt_id), summary)
+        self._cache[appt.appt_id] = appt
+        return appt
+
+
+def migrate_json(data_dir: Path, db_path: Path) -> Dict[str, int]:
+    """Copy patients/doctors/appointments.json into a fresh SQLite database."""
+    from clinic import Clinic
+
+    # visits stay in the rows (so to_dict() carries them) and nothing is written to data_dir
+    source = Clinic(data_dir=data_dir, visit_log=False)
+    source.load_from_files()
+    storage = SqliteStorage(db_path)
+    try:
+        storage.reset()
+        with storage.lock:
+            for patient in source.patients.values():
+                storage._put_patient(patient.to_dict())
+            for doctor in source.doctors.values():
+                storage._put_doctor(doctor.to_dict())
+            storage.conn.executemany(UPSERT_APPT, [_appt_row(a.to_dict()) for a in source.appointments])
+            storage.conn.commit()
+    finally:
+        storage.close()
+    return {
+        "patients": len(source.patients),
+        "doctors": len(source.doctors),
+        "appointments": len(source.appointments),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate the Clinic JSON files to SQLite")
+    parser.add_argument("--data-dir", type=Path, default=Path(__file__).parent / "data")
+    parser.add_argument("--db", type=Path, default=Path(__file__).parent / "data" / "clinic.db")
+    args = parser.parse_args()
+    counts = migrate_json(args.data_dir, args.db)
+    print(f"Migrated {counts['patients']} patients, {counts['doctors']} doctors, "
+          f"{counts['appointments']} appointments into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, MutableMapping, Optional, Tuple
+
+from models import Doctor, Patient
+
+
+class StorageBackend(ABC):
+    """Persistence backend a Clinic can use instead of the JSON files in data/.
+
+    ``load`` hands the Clinic its three containers. They only need to behave like
+    the in-memory ones (a patients mapping, a doctors mapping and an
+    AppointmentStore-like object), so a backend is free to fill them lazily.
+    ``record`` receives the same change lists the journal stores (see journal.py).
+    """
+
+    @abstractmethod
+    def load(self) -> Tuple[MutableMapping[str, Patient], Dict[str, Doctor], Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def record(self, changes: List[List[Any]]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, clinic: Any) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset(self) -> None:
+        raise NotImplementedError
+
+    def patient_rows(self) -> Optional[Iterable[Tuple[str, str, str]]]:
+        """(pid, name, phone) of every patient, for the search index; None reads the patients mapping."""
+        return None
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Scope of one Clinic.transaction(): writes the backend makes inside it are undone if it raises."""
+        yield
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import audit  # noqa: E402
+from clinic import Clinic  # noqa: E402
+from sqlite_storage import SqliteStorage  # noqa: E402
+
+MODES = ["json", "binary", "sharded", "journal", "sqlite"]
+
+
+@pytest.fixture(autouse=True)
+def quiet_audit():
+    audit.set_sink(audit.NullSink())
+    yield
+
+
+@pytest.fixture(params=MODES)
+def open_clinic(request, tmp_path):
+    """Open (or reopen) a Clinic on tmp_path in every storage mode; all are closed at the end."""
+    opened = []
+
+    def open_(fresh_start: bool = False) -> Clinic:
+        if request.param == "sqlite":
+            clinic = Clinic(data_dir=tmp_path, storage=SqliteStorage(tmp_path / "clinic.db"), fresh_start=fresh_start)
+        elif request.param == "journal":
+            clinic = Clinic(data_dir=tmp_path, journaled=True, fsync=False, fresh_start=fresh_start)
+        else:
+            clinic = Clinic(data_dir=tmp_path, data_format=request.param, fsync=False, fresh_start=fresh_start)
+        if not fresh_start:
+            clinic.load_from_files()
+        opened.append(clinic)
+        return clinic
+
+    yield open_
+    for clinic in opened:
+        clinic.close()
@@ -0,0 +1,57 @@
+import pytest
+
+import archive
+from clinic import Clinic
+from models import Doctor, Patient
+from sqlite_storage import SqliteStorage
+
+MODES = ["json", "binary", "sharded", "journal", "sqlite"]
+
+
+def open_mode(mode, data_dir, fresh_start=False):
+    if mode == "sqlite":
+        return Clinic(data_dir=data_dir, storage=SqliteStorage(data_dir / "clinic.db"), fresh_start=fresh_start)
+    if mode == "journal":
+        clinic = Clinic(data_dir=data_dir, journaled=True, fsync=False, fresh_start=fresh_start)
+    else:
+        clinic = Clinic(data_dir=data_dir, data_format=mode, fsync=False, fresh_start=fresh_start)
+    if not fresh_start:
+        clinic.load_from_files()
+    return clinic
+
+
+def cli_args(mode, data_dir):
+    args = ["--data-dir", str(data_dir), "--keep-days", "30", "--now", "2026-06-01 00:00"]
+    if mode == "sqlite":
+        return args + ["--db", str(data_dir / "clinic.db")]
+    if mode == "journal":
+        return args + ["--journaled"]
+    return args + ["--format", mode]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_archive_cli_uses_the_configured_storage(tmp_path, mode, capsys):
+    clinic = open_mode(mode, tmp_path, fresh_start=True)
+    clinic.add_patient(Patient("p1", "Alice", "050-1111111"))
+    clinic.add_doctor(Doctor("d1", "Dr. Green", "03-1111111", "GP"))
+    clinic.schedule_appointment("a1", "p1", "d1", "2026-01-15 10:00")
+    clinic.schedule_appointment("a2", "p1", "d1", "2026-01-16 10:00")
+    clinic.schedule_appointment("a3", "p1", "d1", "2026-05-30 10:00")
+    clinic.cancel_appointment("a1")
+    clinic.complete_appointment("a2", "checkup")
+    clinic.cancel_appointment("a3")
+    clinic.save_to_files()
+    clinic.close()
+
+    archive.main(cli_args(mode, tmp_path))
+    assert "Archived 2 appointments; 1 stay live" in capsys.readouterr().out
+
+    clinic = open_mode(mode, tmp_path)
+    assert [appt.appt_id for appt in clinic.appointments] == ["a3"]
+    assert [appt.appt_id for appt in clinic.appointment_history(patient_id="p1")] == ["a1", "a2", "a3"]
+    clinic.close()
+
+
+def test_archive_cli_rejects_format_with_db(tmp_path):
+    with pytest.raises(SystemExit):
+        archive.main(["--data-dir", str(tmp_path), "--format", "binary", "--db", str(tmp_path / "clinic.db")])
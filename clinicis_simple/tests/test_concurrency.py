@@ -0,0 +1,70 @@
+import random
+import sys
+from collections import Counter
+
+import pytest
+
+from benchmarks.booking import BOOKING_START, slot_time
+from benchmarks.concurrency import build_clinic, double_bookings, run_threads
+from clinic import Clinic
+
+THREADS = 8
+
+
+@pytest.fixture(autouse=True)
+def frequent_switches():
+    # switch threads far more often than every 5 ms, so the workers really interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_contended_bookings_never_double_book(tmp_path):
+    store = build_clinic(THREADS * 2, 2, tmp_path)
+    store.journal.fsync = False
+    slots = [(f"d{d}", slot_time(BOOKING_START, s)) for d in range(2) for s in range(10)]
+    booked = [0] * THREADS
+
+    def worker(w):
+        rng = random.Random(w)
+        mine = []
+        for i in range(300):
+            roll = rng.random()
+            if roll < 0.6 or not mine:
+                doctor_id, when = rng.choice(slots)
+                if store.schedule_appointment(f"t{w}-{i}", f"p{rng.randrange(THREADS * 2)}", doctor_id, when):
+                    mine.append(f"t{w}-{i}")
+                    booked[w] += 1
+            elif roll < 0.85:
+                store.reschedule_appointment(rng.choice(mine), rng.choice(slots)[1])
+            else:
+                store.cancel_appointment(mine.pop(rng.randrange(len(mine))))
+
+    run_threads(THREADS, worker)
+    taken = Counter((a.doctor_id, a.datetime_str) for a in store.appointments if a.status == "scheduled")
+    assert sum(booked) > 0
+    assert max(taken.values(), default=0) <= 1
+    assert double_bookings(store) == []
+    store.close()
+    reloaded = Clinic(data_dir=tmp_path, journaled=True)
+    reloaded.load_from_files()
+    assert double_bookings(reloaded) == []
+    reloaded.close()
+
+
+def test_allocated_ids_are_unique(tmp_path):
+    # two stores on one data folder stand in for two processes
+    stores = [Clinic(data_dir=tmp_path, fresh_start=True, fsync=False), Clinic(data_dir=tmp_path, fsync=False)]
+    ids = [[] for _ in range(THREADS)]
+
+    def worker(w):
+        for _ in range(500):
+            ids[w].append(stores[w % 2].next_appt_id())
+
+    run_threads(THREADS, worker)
+    allocated = [appt_id for chunk in ids for appt_id in chunk]
+    assert len(allocated) == THREADS * 500
+    assert len(set(allocated)) == len(allocated)
+    for store in stores:
+        store.close()
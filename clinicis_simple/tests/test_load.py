@@ -0,0 +1,31 @@
+import json
+import logging
+
+from clinic import Clinic
+from sqlite_storage import SqliteStorage
+
+
+def test_unknown_status_loads_as_scheduled(tmp_path, caplog):
+    rows = [
+        {"appt_id": "a1", "patient_id": "p1", "doctor_id": "d1", "datetime_str": "2026-01-15 10:00", "status": "no-show"},
+        {"appt_id": "a2", "patient_id": "p1", "doctor_id": "d1", "datetime_str": "2026-01-15 11:00", "status": "completed"},
+    ]
+    for name, content in (("patients.json", []), ("doctors.json", []), ("appointments.json", rows)):
+        (tmp_path / name).write_text(json.dumps(content), encoding="utf-8")
+    clinic = Clinic(data_dir=tmp_path, fsync=False)
+    with caplog.at_level(logging.WARNING):
+        clinic.load_from_files()
+    assert {a.appt_id: a.status for a in clinic.appointments} == {"a1": "scheduled", "a2": "completed"}
+    assert "unknown status 'no-show'" in caplog.text
+    clinic.close()
+
+
+def test_unknown_status_in_sqlite_loads_as_scheduled(tmp_path):
+    storage = SqliteStorage(tmp_path / "clinic.db")
+    storage.execute(
+        "INSERT INTO appointments (appt_id, patient_id, doctor_id, datetime_str, status, summary) VALUES (?, ?, ?, ?, ?, ?)",
+        ("a1", "p1", "d1", "2026-01-15 10:00", "no-show", ""),
+    )
+    clinic = Clinic(data_dir=tmp_path, storage=storage)
+    assert clinic.appointments.get("a1").status == "scheduled"
+    clinic.close()
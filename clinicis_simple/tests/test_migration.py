@@ -0,0 +1,48 @@
+import json
+import sys
+
+import binary_snapshot
+from binary_snapshot import read_snapshot
+from clinic import Clinic
+from models import Doctor, Patient
+from sqlite_storage import SqliteStorage, migrate_json
+
+
+def source_folder(path):
+    """A data folder with one patient's visits in visits.log and another's still in the JSON rows."""
+    clinic = Clinic(data_dir=path, fresh_start=True, fsync=False)
+    clinic.add_patient(Patient("p1", "Alice", "111"))
+    clinic.add_doctor(Doctor("d1", "Dr. Green", "999", "GP"))
+    clinic.schedule_appointment("a1", "p1", "d1", "2026-01-15 10:00")
+    clinic.complete_appointment("a1", "checkup")
+    clinic.save_to_files()
+    clinic.close()
+    rows = json.loads((path / "patients.json").read_text(encoding="utf-8"))
+    rows.append({"pid": "p2", "name": "Bob", "phone": "222", "visits": ["old note"]})
+    (path / "patients.json").write_text(json.dumps(rows), encoding="utf-8")
+    return {f.name: f.read_bytes() for f in path.iterdir()}
+
+
+def test_migrate_json_keeps_visits_and_leaves_source_alone(tmp_path):
+    src = tmp_path / "src"
+    before = source_folder(src)
+    counts = migrate_json(src, tmp_path / "db" / "clinic.db")
+    assert counts == {"patients": 2, "doctors": 1, "appointments": 1}
+    assert {f.name: f.read_bytes() for f in src.iterdir()} == before
+    migrated = Clinic(data_dir=tmp_path / "db", storage=SqliteStorage(tmp_path / "db" / "clinic.db"))
+    try:
+        assert list(migrated.patients["p1"].visits) == ["checkup"]
+        assert list(migrated.patients["p2"].visits) == ["old note"]
+    finally:
+        migrated.close()
+
+
+def test_snapshot_out_keeps_visits_and_leaves_source_alone(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    before = source_folder(src)
+    out = tmp_path / "clinic.snap"
+    monkeypatch.setattr(sys, "argv", ["binary_snapshot.py", "--data-dir", str(src), "--out", str(out)])
+    binary_snapshot.main()
+    assert {f.name: f.read_bytes() for f in src.iterdir()} == before
+    patients, _, _ = read_snapshot(out)
+    assert {p.pid: list(p.visits) for p in patients.values()} == {"p1": ["checkup"], "p2": ["old note"]}
@@ -0,0 +1,36 @@
+import pytest
+
+from models import Appointment, Doctor, Patient
+from schedule import Schedule
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_jobs(open_clinic, tmp_path, workers):
+    clinic = open_clinic(fresh_start=True)
+    for i in range(4):
+        clinic.add_patient(Patient(f"p{i}", f"Patient {i}", f"050-000000{i}"))
+        clinic.add_doctor(Doctor(f"d{i}", f"Dr. {i}", f"03-000000{i}", "GP"))
+    for i in range(12):
+        clinic.schedule_appointment(f"a{i}", f"p{i % 4}", f"d{i % 3}", f"2026-01-{15 + i // 4} {9 + i % 4:02d}:00")
+    clinic.cancel_appointment("a0")
+    # booked straight into the store, past the checks: d1 twice at once, and p1 with it
+    clinic.appointments.add(Appointment("x1", "p1", "d1", "2026-01-15 10:00"))
+
+    conflicts = clinic.validate_appointments(workers=workers)
+    assert sorted((c.kind, c.owner, c.first, c.second) for c in conflicts) == [
+        ("doctor", "d1", "a1", "x1"),
+        ("patient", "p1", "a1", "x1"),
+    ]
+
+    clinic.doctors["d2"].schedule = Schedule()
+    assert clinic.rebuild_schedules(workers=workers) == 1
+    assert clinic.doctors["d2"].schedule.to_list() == [
+        "2026-01-15 11:00",
+        "2026-01-16 10:00",
+        "2026-01-17 09:00",
+        "2026-01-17 12:00",
+    ]
+
+    rows = clinic.export_agendas(tmp_path / "agendas", workers=workers)
+    assert rows == {"d0": 3, "d1": 5, "d2": 4}
+    assert (tmp_path / "agendas" / "d1.csv").read_text(encoding="utf-8").count("\n") == 6
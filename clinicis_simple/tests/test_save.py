@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from clinic import Clinic
+from models import Doctor, Patient
+
+
+@pytest.mark.parametrize("data_format", ["json", "binary", "sharded"])
+def test_saves_honour_fsync_false(tmp_path, monkeypatch, data_format):
+    calls = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: calls.append(fd) or real_fsync(fd))
+    clinic = Clinic(data_dir=tmp_path, data_format=data_format, fsync=False, fresh_start=True)
+    clinic.add_patient(Patient("p1", "Alice", "111"))
+    clinic.add_doctor(Doctor("d1", "Dr. Green", "999", "GP"))
+    clinic.schedule_appointment("a1", "p1", "d1", "2026-01-15 10:00")
+    clinic.save_to_files()
+    clinic.cancel_appointment("a1")
+    clinic.write_snapshot(clinic.snapshot())
+    clinic.close()
+    assert calls == []
+    reopened = Clinic(data_dir=tmp_path, data_format=data_format, fsync=False)
+    reopened.load_from_files()
+    assert reopened.appointments.get("a1").status == "cancelled"
+    reopened.close()
@@ -0,0 +1,27 @@
+from clinic import Clinic
+from history_store import read_histories
+from models import Doctor, Patient
+from save_worker import SaveWorker
+
+
+def test_visit_notes_are_written_by_the_worker(tmp_path):
+    clinic = Clinic(data_dir=tmp_path, fresh_start=True, fsync=False)
+    clinic.add_patient(Patient("p1", "Alice", "111"))
+    clinic.add_doctor(Doctor("d1", "Dr. Green", "999", "GP"))
+    clinic.schedule_appointment("a1", "p1", "d1", "2026-01-15 10:00")
+    clinic.schedule_appointment("a2", "p1", "d1", "2026-01-15 11:00")
+    clinic.complete_appointment("a1", "first")
+    saver = SaveWorker(clinic, delay=60)
+    try:
+        clinic.complete_appointment("a2", "second")
+        # queued for the worker, but already part of the patient's history
+        assert read_histories(tmp_path) == {"p1": ["first"]}
+        assert list(clinic.patients["p1"].visits) == ["first", "second"]
+        assert clinic.patients["p1"].get_history(1, 5) == ["second"]
+        saver.request()
+        assert saver.flush(timeout=10)
+        assert read_histories(tmp_path) == {"p1": ["first", "second"]}
+        assert list(clinic.patients["p1"].visits) == ["first", "second"]
+    finally:
+        saver.close(timeout=10)
+        clinic.close()
@@ -0,0 +1,30 @@
+from models import Doctor, Patient
+from search_index import PatientIndex
+
+
+def test_phone_lookup_after_update_phone(open_clinic):
+    clinic = open_clinic(fresh_start=True)
+    clinic.add_patient(Patient("p1", "Alice", "050-1111111"))
+    clinic.add_patient(Patient("p2", "Bob", "050-2222222"))
+    clinic.add_doctor(Doctor("d1", "Dr. Green", "03-1111111", "GP"))
+    assert [hit.pid for hit in clinic.search_patients("0501111111")] == ["p1"]
+    clinic.search_doctors("green")
+
+    clinic.patients["p1"].update_phone("052-9999999")
+    clinic.update_phone("p2", "052-8888888")
+    clinic.doctors["d1"].update_phone("03-7777777")
+
+    assert [hit.pid for hit in clinic.search_patients("0529999999")] == ["p1"]
+    assert [hit.pid for hit in clinic.search_patients("0528888888")] == ["p2"]
+    assert not clinic.search_patients("0501111111")
+    assert not clinic.search_patients("0502222222")
+    assert [hit.pid for hit in clinic.search_doctors("037777777")] == ["d1"]
+    assert not clinic.search_doctors("031111111")
+
+
+def test_exact_name_beats_prefix_match():
+    patients = {pid: Patient(pid, name, "0") for pid, name in [("p1", "Bob Smith"), ("p2", "Bob"), ("p3", "Bobby Lee")]}
+    index = PatientIndex(patients)
+    assert [(hit.pid, hit.match) for hit in index.search("bob", 1)] == [("p2", "name")]
+    assert [hit.pid for hit in index.search("bob", 3)] == ["p2", "p1", "p3"]
+    assert [(hit.pid, hit.match) for hit in index.search("bob smith", 1)] == [("p1", "name")]
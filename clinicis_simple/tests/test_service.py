@@ -0,0 +1,39 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+from clinic import Clinic
+from models import Doctor, Patient
+from service import ClinicService
+
+
+def test_reads_alongside_write_batches(tmp_path):
+    store = Clinic(data_dir=tmp_path, fresh_start=True, fsync=False)
+    for i in range(20):
+        store.add_patient(Patient(f"p{i}", f"Patient {i}", f"050-{i:07d}"))
+    store.add_doctor(Doctor("d1", "Dr. Green", "03-0000000", "GP"))
+    service = ClinicService(store)
+
+    async def scenario():
+        server = await service.start(port=0)
+        try:
+            bookings = [
+                {"patient_id": f"p{i}", "doctor_id": "d1", "datetime": f"2026-01-15 {8 + i // 2:02d}:{30 * (i % 2):02d}"}
+                for i in range(20)
+            ]
+            writes = [service.dispatch("POST", "/appointments", json.dumps(body).encode()) for body in bookings]
+            reads = [service.dispatch("GET", f"/patients/p{i}/appointments", b"") for i in range(20)]
+            reads += [
+                service.dispatch("GET", "/free-slots?specialty=GP&start=2026-01-15%2008:00&days=1", b"") for _ in range(5)
+            ]
+            results = await asyncio.gather(*writes, *reads)
+            after = await service.dispatch("GET", "/patients/p3/appointments", b"")
+        finally:
+            server.close()
+            await service.stop()
+        return results, after
+
+    results, after = asyncio.run(scenario())
+    assert [status for status, _ in results[:20]] == [HTTPStatus.CREATED] * 20
+    assert all(status == HTTPStatus.OK for status, _ in results[20:])
+    assert [appt["datetime_str"] for appt in after[1]] == ["2026-01-15 09:30"]
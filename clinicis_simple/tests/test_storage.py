@@ -0,0 +1,39 @@
+import pytest
+
+from clinic import Clinic
+from models import Patient
+from sqlite_storage import SqliteStorage
+from storage import StorageBackend
+
+
+def test_incomplete_backend_fails_on_construction():
+    class NoReset(StorageBackend):
+        def load(self):
+            return {}, {}, None
+
+        def record(self, changes):
+            pass
+
+        def save(self, clinic):
+            pass
+
+    with pytest.raises(TypeError, match="reset"):
+        NoReset()
+
+
+def test_sqlite_search_index_does_not_load_patients(tmp_path):
+    clinic = Clinic(data_dir=tmp_path, storage=SqliteStorage(tmp_path / "clinic.db"), fresh_start=True)
+    for i, name in enumerate(["Alice Cohen", "Bob Levi", "Carol Cohen"]):
+        clinic.add_patient(Patient(f"p{i}", name, f"050-000000{i}"))
+    clinic.close()
+
+    clinic = Clinic(data_dir=tmp_path, storage=SqliteStorage(tmp_path / "clinic.db"))
+    clinic.build_search_indexes()
+    assert clinic.patients.cached() == []
+    assert [hit.pid for hit in clinic.search_patients("cohen")] == ["p0", "p2"]
+    assert [hit.pid for hit in clinic.search_patients("0500000001")] == ["p1"]
+    assert clinic.patients.cached() == []
+
+    clinic.add_patient(Patient("p3", "Dana Cohen", "050-0000003"))
+    assert [hit.pid for hit in clinic.search_patients("dana")] == ["p3"]
+    clinic.close()
@@ -0,0 +1,54 @@
+import pytest
+
+from models import Doctor, Patient
+from transactions import TransactionError
+
+
+def seeded(open_clinic):
+    clinic = open_clinic(fresh_start=True)
+    clinic.add_patient(Patient("p1", "Alice", "111"))
+    clinic.add_patient(Patient("p2", "Bob", "222"))
+    clinic.add_doctor(Doctor("d1", "Dr. Green", "999", "GP"))
+    clinic.schedule_appointment("a1", "p1", "d1", "2026-01-15 10:00")
+    clinic.schedule_appointment("a2", "p2", "d1", "2026-01-15 11:00")
+    clinic.save_to_files()
+    return clinic
+
+
+def booked(clinic):
+    return sorted((a.appt_id, a.datetime_str, a.status) for a in clinic.appointments)
+
+
+def test_rollback_after_reschedule(open_clinic):
+    clinic = seeded(open_clinic)
+    before = booked(clinic)
+    with pytest.raises(TransactionError):
+        with clinic.transaction() as tx:
+            tx.reschedule_appointment("a1", "2026-01-15 12:00")
+            tx.cancel_appointment("a2")
+            tx.schedule_appointment("a3", "p2", "d1", "2026-01-15 12:00")  # a1 took the slot
+    assert booked(clinic) == before
+    assert clinic.doctors["d1"].schedule.to_list() == ["2026-01-15 10:00", "2026-01-15 11:00"]
+    assert not clinic.appointments.patient_has_slot("p1", "2026-01-15 12:00")
+    # the slot a1 was moved away from is taken again
+    assert clinic.schedule_appointment("a4", "p2", "d1", "2026-01-15 10:00") is None
+    clinic.save_to_files()
+    reopened = open_clinic()
+    assert booked(reopened) == before
+    assert reopened.doctors["d1"].schedule.to_list() == ["2026-01-15 10:00", "2026-01-15 11:00"]
+
+
+def test_commit_after_rollback(open_clinic):
+    clinic = seeded(open_clinic)
+    with pytest.raises(TransactionError):
+        with clinic.transaction() as tx:
+            tx.reschedule_appointment("a1", "2026-01-15 12:00")
+            tx.cancel_appointment("missing")
+    with clinic.transaction() as tx:
+        tx.reschedule_appointment("a2", "2026-01-15 13:00")
+        tx.complete_appointment("a1", "ok")
+    after = booked(clinic)
+    assert after == [("a1", "2026-01-15 10:00", "completed"), ("a2", "2026-01-15 13:00", "scheduled")]
+    reopened = open_clinic()
+    assert booked(reopened) == after
+    assert list(reopened.patients["p1"].visits) == ["ok"]
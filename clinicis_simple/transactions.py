@@ -0,0 +1,143 @@
+"""Clinic transactions: several mutations applied all-or-nothing and persisted in one write.
+
+``with clinic.transaction() as tx:`` holds the store lock exclusively while
+the block runs. The first time a mutation inside it touches a patient,
+doctor or appointment (Clinic._locked), the entity's state is copied; if
+the block raises, every touched entity is put back from those copies and
+nothing is written. The changes the mutations record are kept back as
+well, and listeners and the disk only see them once the block succeeded.
+
+Commits are group commits: a finished transaction releases the store lock,
+queues its changes and waits until they are written. Whoever finds no
+write in progress writes everything queued so far (one journal record, one
+storage commit or one save of the changed files), so transactions finishing
+while a write is under way share the next one and its fsyncs. Visit notes
+kept in a HistoryStore are the exception: they are appended (and synced)
+by each transaction as it commits.
+"""
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import Appointment, Doctor, Patient
+
+Change = List[Any]
+
+
+class TransactionError(Exception):
+    """A step of a transaction was rejected; everything done in the transaction is undone."""
+
+
+class _Group:
+    """Changes of the transactions that will be written together."""
+
+    __slots__ = ("changes", "done", "error")
+
+    def __init__(self) -> None:
+        self.changes: List[Change] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommit:
+    """Write the changes of concurrently finishing transactions with one call of ``write``."""
+
+    def __init__(self, write: Callable[[List[Change]], None]) -> None:
+        self.write = write
+        self._cond = threading.Condition()
+        self._open = _Group()
+        self._writing = False
+        self.writes = 0  # calls of ``write`` so far
+
+    def submit(self, changes: List[Change]) -> _Group:
+        """Queue ``changes`` (call while holding the store lock, so groups keep the order of the commits)."""
+        with self._cond:
+            group = self._open
+            group.changes.extend(changes)
+            return group
+
+    def wait(self, group: _Group) -> None:
+        """Return once ``group`` is written, writing it here if no other thread is; raises what the write raised."""
+        with self._cond:
+            while not group.done:
+                if self._writing:
+                    self._cond.wait()
+                    continue
+                # nobody is writing, so ``group`` is still the open one: write it
+                self._writing = True
+                self._open = _Group()
+                self.writes += 1
+                self._cond.release()
+                try:
+                    self.write(group.changes)
+                except BaseException as exc:
+                    group.error = exc
+                finally:
+                    self._cond.acquire()
+                    self._writing = False
+                    group.done = True
+                    self._cond.notify_all()
+        if group.error is not None:
+            raise group.error
+
+
+class Transaction:
+    """Handle of one ``with clinic.transaction() as tx:`` block.
+
+    Plain Clinic calls inside the block are part of the transaction and keep
+    their False / None results. The methods here make the same calls but
+    raise TransactionError when one is rejected, which rolls back the whole
+    block.
+    """
+
+    def __init__(self, clinic: Any) -> None:
+        self.clinic = clinic
+        self.changes: List[Change] = []
+        # visit notes for a HistoryStore, which cannot take a note back: written on commit
+        self.visits: List[Tuple[Patient, str]] = []
+        # ("patient" | "doctor" | "appt", id) -> state before the first change, in first-touch order
+        self.images: Dict[Tuple[str, str], Any] = {}
+
+    def touch(self, keys: Tuple[Tuple[str, str], ...]) -> None:
+        for key in keys:
+            if key not in self.images:
+                self.images[key] = self.clinic._image(*key)
+
+    def rollback(self) -> None:
+        for key, image in reversed(list(self.images.items())):
+            self.clinic._restore(*key, image)
+        self.changes.clear()
+        self.visits.clear()
+        self.images.clear()
+
+    def add_patient(self, patient: Patient) -> None:
+        self.clinic.add_patient(patient)
+
+    def add_doctor(self, doctor: Doctor) -> None:
+        self.clinic.add_doctor(doctor)
+
+    def update_phone(self, pid: str, new_phone: str) -> None:
+        _require(self.clinic.update_phone(pid, new_phone), f"no patient {pid}")
+
+    def schedule_appointment(self, appt_id: str, patient_id: str, doctor_id: str, datetime_str: str) -> Appointment:
+        return _require(
+            self.clinic.schedule_appointment(appt_id, patient_id, doctor_id, datetime_str),
+            f"cannot book {appt_id} for {patient_id} with {doctor_id} at {datetime_str}",
+        )
+
+    def cancel_appointment(self, appt_id: str) -> None:
+        _require(self.clinic.cancel_appointment(appt_id), f"cannot cancel {appt_id}")
+
+    def reschedule_appointment(self, appt_id: str, new_datetime: str) -> None:
+        _require(self.clinic.reschedule_appointment(appt_id, new_datetime), f"cannot move {appt_id} to {new_datetime}")
+
+    def complete_appointment(self, appt_id: str, summary: str) -> None:
+        _require(self.clinic.complete_appointment(appt_id, summary), f"cannot complete {appt_id}")
+
+    def delete_appointment(self, appt_id: str) -> None:
+        _require(self.clinic.delete_appointment(appt_id), f"cannot delete {appt_id}")
+
+
+def _require(result: Any, message: str) -> Any:
+    if not result:
+        raise TransactionError(message)
+    return result